@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Processamento de lotes de buscas PROJUDI API v4
+Recebe CSV/JSONL com milhares de buscas, processa pelo pool com taxa controlada,
+grava cada resultado em JSONL (checkpoint por item) e retoma após reinício
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+from pydantic import ValidationError
+
+from config import settings
+from api.models import BuscaRequest, BuscaResponse
+from api.projecao import Projecao
+from core.tracing import tracing
+
+@dataclass
+class Lote:
+    """Estado de um lote de buscas"""
+    id: str
+    total_itens: int
+    criado_em: str
+    nome_arquivo: str = ""
+    status: str = "pendente"  # pendente, processando, concluido, cancelado, erro
+    iniciado_em: Optional[str] = None
+    concluido_em: Optional[str] = None
+    itens_concluidos: int = 0
+    itens_sucesso: int = 0
+    itens_erro: int = 0
+    erro: str = ""
+    rastreamento: Optional[Dict[str, str]] = None  # traceparent da requisição que criou o lote
+
+class EntradaLoteInvalida(Exception):
+    """Arquivo de lote com formato ou linhas inválidas"""
+
+class GerenciadorLotes:
+    """Fila de lotes persistida em disco (entrada.jsonl, resultado.jsonl e estado.json por lote)"""
+
+    def __init__(self):
+        self.base_dir = Path(settings.lotes_dir)
+        self.paralelismo = max(1, settings.lotes_paralelismo)
+        self.taxa_por_minuto = settings.lotes_taxa_por_minuto
+        self.max_itens = settings.lotes_max_itens
+        self.lotes: Dict[str, Lote] = {}
+        self._tarefas: Dict[str, asyncio.Task] = {}
+        self._processador: Optional[Callable[[BuscaRequest, str], Awaitable[BuscaResponse]]] = None
+        self._semaforo = asyncio.Semaphore(self.paralelismo)
+        self._lock_taxa = asyncio.Lock()
+        self._proximo_inicio = 0.0
+
+    def configurar(self, processador: Callable[[BuscaRequest, str], Awaitable[BuscaResponse]]):
+        """Define a função que executa uma busca (ProjudiService.processar_busca_completa)"""
+        self._processador = processador
+
+    # ---- Caminhos ----
+
+    def _dir_lote(self, lote_id: str) -> Path:
+        return self.base_dir / lote_id
+
+    def caminho_resultado(self, lote_id: str) -> Path:
+        return self._dir_lote(lote_id) / "resultado.jsonl"
+
+    # ---- Criação ----
+
+    async def criar_lote(self, conteudo: bytes, formato: str, nome_arquivo: str = "") -> Lote:
+        """Valida o arquivo, grava a entrada normalizada e inicia o processamento"""
+        buscas = await asyncio.to_thread(self._interpretar_entrada, conteudo, formato)
+        if not buscas:
+            raise EntradaLoteInvalida("Arquivo sem buscas")
+        if len(buscas) > self.max_itens:
+            raise EntradaLoteInvalida(f"Máximo de {self.max_itens} buscas por lote")
+
+        lote = Lote(
+            id=str(uuid.uuid4()),
+            total_itens=len(buscas),
+            criado_em=datetime.now().isoformat(),
+            nome_arquivo=nome_arquivo,
+            rastreamento=tracing.contexto_propagacao() or None
+        )
+        await asyncio.to_thread(self._gravar_entrada, lote.id, buscas)
+        await self._salvar_estado(lote)
+        self.lotes[lote.id] = lote
+        logger.info(f"📦 Lote {lote.id} criado com {lote.total_itens} buscas ({nome_arquivo or formato})")
+
+        self._iniciar(lote)
+        return lote
+
+    @staticmethod
+    def _interpretar_entrada(conteudo: bytes, formato: str) -> List[str]:
+        """Converte CSV/JSONL em linhas JSON de BuscaRequest validadas"""
+        texto = conteudo.decode("utf-8-sig", errors="replace")
+
+        if formato == "csv":
+            amostra = texto[:4096]
+            try:
+                dialeto = csv.Sniffer().sniff(amostra.splitlines()[0] if amostra else ",", delimiters=",;\t")
+            except csv.Error:
+                dialeto = csv.excel
+            linhas = [
+                {k.strip(): v.strip() for k, v in linha.items() if k and v and v.strip()}
+                for linha in csv.DictReader(io.StringIO(texto), dialect=dialeto)
+            ]
+            numero_inicial = 2  # linha 1 é o cabeçalho
+        else:
+            linhas = []
+            numero_inicial = 1
+            for numero, linha in enumerate(texto.splitlines(), 1):
+                if not linha.strip():
+                    continue
+                try:
+                    linhas.append(json.loads(linha))
+                except json.JSONDecodeError as e:
+                    raise EntradaLoteInvalida(f"Linha {numero}: JSON inválido ({e.msg})")
+
+        buscas = []
+        erros = []
+        for numero, dados in enumerate(linhas, numero_inicial):
+            if not dados:
+                continue
+            try:
+                busca = BuscaRequest(**dados)
+                if not busca.valor.strip():
+                    raise ValueError("valor vazio")
+                # A entrada fica gravada em disco até o lote terminar (e é relida na retomada)
+                if busca.usuario or busca.senha:
+                    raise ValueError("usuario/senha não são aceitos em lotes; use as credenciais da configuração")
+                buscas.append(busca.model_dump_json(exclude_none=True))
+            except ValidationError as e:
+                erro = e.errors()[0]
+                campo = ".".join(str(p) for p in erro.get("loc", ()))
+                erros.append(f"Linha {numero}: {campo} {erro.get('msg', '')}".strip())
+            except (ValueError, TypeError) as e:
+                erros.append(f"Linha {numero}: {e}")
+            if len(erros) >= 20:
+                break
+
+        if erros:
+            raise EntradaLoteInvalida("; ".join(erros))
+        return buscas
+
+    def _gravar_entrada(self, lote_id: str, buscas: List[str]):
+        diretorio = self._dir_lote(lote_id)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        with open(diretorio / "entrada.jsonl", "w", encoding="utf-8") as f:
+            f.write("\n".join(buscas) + "\n")
+
+    # ---- Estado ----
+
+    async def _salvar_estado(self, lote: Lote):
+        await asyncio.to_thread(self._salvar_estado_sync, lote)
+
+    def _salvar_estado_sync(self, lote: Lote):
+        diretorio = self._dir_lote(lote.id)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        temporario = diretorio / "estado.json.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(asdict(lote), f, ensure_ascii=False)
+        os.replace(temporario, diretorio / "estado.json")
+
+    def obter(self, lote_id: str) -> Optional[Lote]:
+        return self.lotes.get(lote_id)
+
+    def listar(self) -> List[Lote]:
+        return sorted(self.lotes.values(), key=lambda l: l.criado_em, reverse=True)
+
+    def progresso(self, lote: Lote) -> Dict:
+        """Estado do lote com percentual e estimativa de término"""
+        dados = asdict(lote)
+        dados["percentual"] = round(lote.itens_concluidos / lote.total_itens * 100, 2) if lote.total_itens else 0
+        dados["estimativa_restante_segundos"] = None
+        if lote.status == "processando" and lote.iniciado_em and lote.itens_concluidos:
+            decorrido = (datetime.now() - datetime.fromisoformat(lote.iniciado_em)).total_seconds()
+            por_item = decorrido / lote.itens_concluidos
+            dados["estimativa_restante_segundos"] = round(por_item * (lote.total_itens - lote.itens_concluidos), 1)
+        return dados
+
+    # ---- Retomada ----
+
+    async def retomar_pendentes(self):
+        """Carrega os lotes do disco e retoma os que não terminaram"""
+        if not self.base_dir.exists():
+            return
+        for estado_path in sorted(self.base_dir.glob("*/estado.json")):
+            try:
+                dados = json.loads(await asyncio.to_thread(estado_path.read_text, encoding="utf-8"))
+                lote = Lote(**dados)
+            except Exception as e:
+                logger.warning(f"⚠️ Estado de lote ilegível {estado_path}: {e}")
+                continue
+            self.lotes[lote.id] = lote
+            if lote.status in ("pendente", "processando"):
+                logger.info(f"🔁 Retomando lote {lote.id} ({lote.itens_concluidos}/{lote.total_itens})")
+                self._iniciar(lote)
+
+    def _recuperar_resultados(self, lote: Lote) -> Set[int]:
+        """Lê o resultado.jsonl (descartando linha final incompleta) e recalcula os contadores"""
+        caminho = self.caminho_resultado(lote.id)
+        concluidos: Set[int] = set()
+        sucesso = erro = 0
+        if caminho.exists():
+            with open(caminho, "rb+") as f:
+                dados = f.read()
+                fim_valido = dados.rfind(b"\n") + 1
+                if fim_valido < len(dados):
+                    f.truncate(fim_valido)
+                    dados = dados[:fim_valido]
+            for linha in dados.splitlines():
+                try:
+                    registro = json.loads(linha)
+                except json.JSONDecodeError:
+                    continue
+                if registro["indice"] in concluidos:
+                    continue
+                concluidos.add(registro["indice"])
+                if registro["resultado"].get("status") == "success":
+                    sucesso += 1
+                else:
+                    erro += 1
+        lote.itens_concluidos = len(concluidos)
+        lote.itens_sucesso = sucesso
+        lote.itens_erro = erro
+        return concluidos
+
+    # ---- Processamento ----
+
+    def _iniciar(self, lote: Lote):
+        tarefa = self._tarefas.get(lote.id)
+        if tarefa and not tarefa.done():
+            return
+        self._tarefas[lote.id] = asyncio.create_task(self._processar_lote(lote))
+
+    async def _aguardar_taxa(self):
+        """Espaça o início das buscas conforme LOTES_TAXA_POR_MINUTO (compartilhado entre lotes)"""
+        if self.taxa_por_minuto <= 0:
+            return
+        async with self._lock_taxa:
+            espera = self._proximo_inicio - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            self._proximo_inicio = time.monotonic() + 60.0 / self.taxa_por_minuto
+
+    async def _processar_lote(self, lote: Lote):
+        if self._processador is None:
+            logger.error(f"❌ Lote {lote.id} sem processador configurado")
+            return
+
+        try:
+            concluidos = await asyncio.to_thread(self._recuperar_resultados, lote)
+            entrada = await asyncio.to_thread(
+                (self._dir_lote(lote.id) / "entrada.jsonl").read_text, encoding="utf-8"
+            )
+            buscas = [linha for linha in entrada.splitlines() if linha.strip()]
+            pendentes = iter([i for i in range(len(buscas)) if i not in concluidos])
+
+            lote.status = "processando"
+            lote.iniciado_em = lote.iniciado_em or datetime.now().isoformat()
+            await self._salvar_estado(lote)
+
+            arquivo = await asyncio.to_thread(open, self.caminho_resultado(lote.id), "a", encoding="utf-8")
+            lock_arquivo = asyncio.Lock()
+
+            async def worker():
+                for indice in pendentes:
+                    async with self._semaforo:
+                        await self._aguardar_taxa()
+                        busca = BuscaRequest.model_validate_json(buscas[indice])
+                        try:
+                            # Cada item vira um span filho do trace da requisição que criou o lote
+                            with tracing.span(
+                                "lote_item", {"projudi.lote": lote.id, "projudi.item": indice}, pai=lote.rastreamento
+                            ):
+                                resultado = await self._processador(busca, f"lote_{lote.id[:8]}_{indice}")
+                        except Exception as e:
+                            logger.error(f"❌ Erro no item {indice} do lote {lote.id}: {e}")
+                            resultado = BuscaResponse(
+                                status="error",
+                                request_id="",
+                                tipo_busca=busca.tipo_busca,
+                                valor_busca=busca.valor,
+                                erro=str(e)
+                            )
+
+                    registro = (
+                        f'{{"indice":{indice},"busca_id":"busca_{indice}",'
+                        f'"resultado":{resultado.model_dump_json(exclude=Projecao.da_busca(busca).filtro_exclusao())}}}'
+                    )
+                    async with lock_arquivo:
+                        await asyncio.to_thread(self._anexar_linha, arquivo, registro)
+                        lote.itens_concluidos += 1
+                        if resultado.status == "success":
+                            lote.itens_sucesso += 1
+                        else:
+                            lote.itens_erro += 1
+                        await self._salvar_estado(lote)
+
+            try:
+                await asyncio.gather(*[worker() for _ in range(self.paralelismo)])
+            finally:
+                await asyncio.to_thread(arquivo.close)
+
+            lote.status = "concluido"
+            lote.concluido_em = datetime.now().isoformat()
+            await self._salvar_estado(lote)
+            logger.info(
+                f"✅ Lote {lote.id} concluído: {lote.itens_sucesso} sucesso, {lote.itens_erro} erro "
+                f"de {lote.total_itens}"
+            )
+
+        except asyncio.CancelledError:
+            # Cancelamento pelo usuário já gravou o status; no desligamento o lote fica
+            # como "processando" para ser retomado na próxima inicialização
+            if lote.status == "cancelado":
+                await self._salvar_estado(lote)
+            raise
+        except Exception as e:
+            logger.error(f"❌ Erro no lote {lote.id}: {e}")
+            lote.status = "erro"
+            lote.erro = str(e)
+            await self._salvar_estado(lote)
+
+    @staticmethod
+    def _anexar_linha(arquivo, linha: str):
+        """Checkpoint do item: a linha só conta como concluída depois de gravada em disco"""
+        arquivo.write(linha + "\n")
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+    async def cancelar(self, lote_id: str) -> Optional[Lote]:
+        lote = self.lotes.get(lote_id)
+        if not lote:
+            return None
+        if lote.status in ("pendente", "processando"):
+            lote.status = "cancelado"
+            lote.concluido_em = datetime.now().isoformat()
+            tarefa = self._tarefas.get(lote_id)
+            if tarefa and not tarefa.done():
+                tarefa.cancel()
+            await self._salvar_estado(lote)
+            logger.info(f"🛑 Lote {lote_id} cancelado em {lote.itens_concluidos}/{lote.total_itens}")
+        return lote
+
+    async def shutdown(self):
+        """Interrompe os lotes em andamento (retomados na próxima inicialização)"""
+        tarefas = [t for t in self._tarefas.values() if not t.done()]
+        for tarefa in tarefas:
+            tarefa.cancel()
+        if tarefas:
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            logger.info(f"🔄 {len(tarefas)} lotes interrompidos; serão retomados na próxima inicialização")
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas dos lotes"""
+        return {
+            "paralelismo": self.paralelismo,
+            "taxa_por_minuto": self.taxa_por_minuto,
+            "lotes_total": len(self.lotes),
+            "lotes_em_andamento": sum(1 for l in self.lotes.values() if l.status == "processando")
+        }
+
+# Instância global do gerenciador de lotes
+gerenciador_lotes = GerenciadorLotes()
@@ -4,31 +4,57 @@ API Principal PROJUDI v4 com FastAPI e Playwright
 """
 
 import asyncio
+import hashlib
 import os
 import uuid
 import time
-from contextlib import asynccontextmanager
-from typing import Dict, List, Optional, Union
+from urllib.parse import quote
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple, Union
+from dataclasses import asdict
 from datetime import datetime, timedelta
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Depends
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Depends, Query, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from loguru import logger
+from pydantic import ValidationError
 
 from config import settings
-from core.session_manager import session_manager, get_session
+from core.session_manager import Credenciais, session_manager, get_session
 from core.cache_manager import cache_manager
 from core.concurrency_manager import concurrency_manager
-from nivel_1.busca import busca_manager, TipoBusca, ResultadoBusca, LoginManager
-from nivel_2.processo import processo_manager, DadosProcesso
-from nivel_3.anexos import anexos_manager
+from core.http_client import http_client_manager
+from core.serializacao import RespostaJSON, dumps_str
+from core.compressao import MiddlewareCompressao
+from core.metricas import metricas
+from core.tracing import tracing, MiddlewareTracing, SPAN_HTTP_NATIVO
+from core.traces_playwright import traces_playwright
+from core.perfil_rpc import perfil_rpc
+from core.perfilador import perfilador, PerfilEmAndamento
+from core.rate_limiter import limitador_taxa
+from core.cronometro import Cronometro, cronometro_requisicao, cronometro_processo
+from core.logging_config import configurar_logging, contexto_requisicao
+from core.fluxo_busca import (
+    executar_fluxo_busca, ParametrosBusca, EventoBusca, EventoErro,
+    EventoProcessosEncontrados, EventoProcessoDetalhado
+)
+from nivel_1.busca import ProcessoEncontrado
+from nivel_2.processo import processo_manager, DadosProcesso, ParteEnvolvida
+from nivel_3.anexos import anexos_manager, AnexoInfo, AnexoProcessado
+from nivel_3.extrator_pdf import extrator_pdf
 
+from api.lotes import gerenciador_lotes, EntradaLoteInvalida
+from api.projecao import Projecao
 from api.models import (
     BuscaRequest, BuscaRequestN8N, BuscaMultiplaRequest, BuscaResponse, BuscaMultiplaResponse,
+    BuscaMultiplaAceitaResponse,
     StatusResponse, HealthResponse, ProcessoDetalhadoResponse,
-    MovimentacaoResponse, ParteEnvolvidaResponse, AnexoResponse, ProcessoSimples
+    MovimentacaoResponse, ParteEnvolvidaResponse, AnexoResponse, AnexoTextoResponse, ProcessoSimples
 )
 
+configurar_logging()
+
 # Inicialização da aplicação
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -36,15 +62,22 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("🚀 Iniciando PROJUDI API v4...")
     await session_manager.initialize()
+    gerenciador_lotes.configurar(ProjudiService.processar_busca_completa)
+    await gerenciador_lotes.retomar_pendentes()
     logger.info("✅ API inicializada com sucesso")
     
     yield
     
     # Shutdown
     logger.info("🔄 Finalizando PROJUDI API v4...")
+    await gerenciador_lotes.shutdown()
     await session_manager.shutdown()
+    await http_client_manager.shutdown()
     anexos_manager.limpar_arquivos_temporarios()
+    extrator_pdf.shutdown()
+    tracing.shutdown()
     logger.info("✅ API finalizada")
+    await logger.complete()
 
 # Criar aplicação FastAPI
 app = FastAPI(
@@ -63,9 +96,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão negociada (brotli/gzip) de respostas grandes; streams e arquivos passam direto
+if settings.compressao_habilitada:
+    app.add_middleware(
+        MiddlewareCompressao,
+        minimo_bytes=settings.compressao_minimo_bytes,
+        nivel_gzip=settings.compressao_nivel_gzip,
+        nivel_brotli=settings.compressao_nivel_brotli
+    )
+
+# Span por requisição HTTP (continua o traceparent recebido de outros nós)
+if tracing.habilitado and not SPAN_HTTP_NATIVO:
+    app.add_middleware(MiddlewareTracing)
+
 # Armazenamento de requisições em andamento
 requisicoes_ativas: Dict[str, Dict] = {}
 
+# Downloads de anexos sob demanda em andamento, por (processo, arquivo)
+anexos_em_andamento: Dict[tuple, asyncio.Task] = {}
+
 class ProjudiService:
     """Serviço principal da API"""
     
@@ -75,234 +124,71 @@ class ProjudiService:
         request_id: str
     ) -> BuscaResponse:
         """Processa uma busca completa com todos os níveis"""
+        with contexto_requisicao(request_id), cronometro_requisicao() as cronometro, tracing.span(
+            "busca", {"projudi.request_id": request_id, "projudi.tipo_busca": request.tipo_busca}
+        ) as span:
+            response = await ProjudiService._montar_resposta_busca(request, request_id)
+            if response.status == "error":
+                tracing.marcar_falha(span, response.erro or "")
+            tracing.anotar({"projudi.processos_encontrados": response.total_processos_encontrados})
+        metricas.registrar_busca(request.tipo_busca, response.status, response.tempo_execucao)
+        ProjudiService._registrar_timings(request_id, response.tempo_execucao, cronometro)
+        if cronometro.traces and request_id in requisicoes_ativas:
+            requisicoes_ativas[request_id]["traces_playwright"] = [f"/traces/{nome}" for nome in cronometro.traces]
+        if request.incluir_timings:
+            response.timings = cronometro.resumo()
+        return response
+    
+    @staticmethod
+    def _registrar_timings(request_id: str, tempo_execucao: float, cronometro: Cronometro):
+        """Loga o detalhamento por etapa (INFO para buscas lentas) para correlacionar com o request_id"""
+        nivel = "INFO" if tempo_execucao >= settings.timings_log_lento_segundos else "DEBUG"
+        logger.log(nivel, f"⏱️ Busca {request_id} em {tempo_execucao:.2f}s: {cronometro.resumo_log()}")
+    
+    @staticmethod
+    async def _montar_resposta_busca(request: BuscaRequest, request_id: str) -> BuscaResponse:
+        """Executa o fluxo e consolida os eventos em uma BuscaResponse"""
         start_time = time.time()
+        processos_simples: List[ProcessoSimples] = []
+        processos_detalhados: List[ProcessoDetalhadoResponse] = []
+        detalhar = Projecao.da_busca(request).inclui("processos_detalhados")
         
         try:
-            logger.info(f"🔍 Processando busca {request_id}: {request.tipo_busca} = {request.valor}")
-            
-            # Aplicar credenciais customizadas se fornecidas
-            credenciais_originais = {}
-            if request.usuario or request.senha or request.serventia:
-                credenciais_originais = ProjudiService._aplicar_credenciais_customizadas(request)
-            
-            # Nível 1: Busca (ou busca direta para processo específico)
-            async with get_session() as session:
-                # Detectar automaticamente se é busca por processo específico
-                # Se o valor não parece ser CPF nem nome, tratar como processo
-                import re
-                cpf_pattern = r'^\d{3}\.\d{3}\.\d{3}-\d{2}$'
-                nome_pattern = r'^[A-Za-zÀ-ÿ\s]+$'
-                
-                is_processo_especifico = (
-                    request.tipo_busca == "processo" or
-                    (not re.match(cpf_pattern, request.valor) and 
-                     not re.match(nome_pattern, request.valor) and
-                     len(request.valor) > 10)  # Processos têm números longos
-                )
-                
-                if is_processo_especifico:
-                    logger.info(f"🔍 Busca por processo específico detectada: {request.valor}")
-                    
-                    # Buscar diretamente no nível 2
-                    dados_processo = await processo_manager.buscar_processo_especifico(
-                        session, 
-                        request.valor,
-                        request.limite_movimentacoes
-                    )
-                    
-                    if dados_processo:
-                        # Opcional: extração detalhada de partes no final
-                        if request.extrair_partes_detalhadas:
-                            try:
-                                logger.info("🧩 Executando extração de partes detalhada (opcional) no final do fluxo...")
-                                partes_det = await processo_manager.extrair_partes_detalhadas(session)
-                                dados_processo.partes_polo_ativo = partes_det.get('polo_ativo', dados_processo.partes_polo_ativo)
-                                dados_processo.partes_polo_passivo = partes_det.get('polo_passivo', dados_processo.partes_polo_passivo)
-                                dados_processo.outras_partes = partes_det.get('outros', dados_processo.outras_partes)
-                            except Exception as e:
-                                logger.warning(f"⚠️ Falha na extração detalhada opcional: {e}")
-                                # Converter para response (partes podem ser preenchidas depois apenas via detalhado)
-                        processo_detalhado = await ProjudiService._converter_dados_processo(
-                            dados_processo, 
-                            []  # Sem anexos por padrão
-                        )
-                        
-                        return BuscaResponse(
-                            status="success",
-                            request_id=request_id,
-                            tipo_busca=request.tipo_busca,
-                            valor_busca=request.valor,
-                            total_processos_encontrados=1,
-                            processos_simples=[
-                                ProcessoSimples(
-                                    numero=dados_processo.numero,
-                                    classe=dados_processo.classe,
-                                    assunto=dados_processo.assunto,
-                                    id_processo="processo_direto",
-                                    indice=1
-                                )
-                            ],
-                            processos_detalhados=[processo_detalhado],
-                            tempo_execucao=time.time() - start_time
-                        )
-                    else:
+            async with aclosing(ProjudiService.processar_busca_em_etapas(request, request_id)) as eventos:
+                async for evento in eventos:
+                    if isinstance(evento, EventoErro):
                         return BuscaResponse(
                             status="error",
                             request_id=request_id,
                             tipo_busca=request.tipo_busca,
                             valor_busca=request.valor,
-                            erro="Processo não encontrado",
+                            erro=evento.mensagem,
                             tempo_execucao=time.time() - start_time
                         )
-                
-                # Para CPF e NOME, usar método normal do nível 1
-                resultado_busca = await busca_manager.executar_busca(
-                    session, 
-                    TipoBusca(request.tipo_busca), 
-                    request.valor
-                )
-                
-                if not resultado_busca.sucesso:
-                    return BuscaResponse(
-                        status="error",
-                        request_id=request_id,
-                        tipo_busca=request.tipo_busca,
-                        valor_busca=request.valor,
-                        erro=resultado_busca.mensagem,
-                        tempo_execucao=time.time() - start_time
-                    )
-                
-                # Converter processos encontrados para response
-                processos_simples = [
-                    ProcessoSimples(
-                        numero=p.numero,
-                        classe=p.classe,
-                        assunto=p.assunto,
-                        id_processo=p.id_processo,
-                        indice=p.indice
-                    )
-                    for p in resultado_busca.processos
-                ]
-                
-                # Se o resultado veio de cache, precisamos posicionar a UI na página de resultados
-                try:
-                    if getattr(resultado_busca, 'from_cache', False) and resultado_busca.processos:
-                        # Garantir login antes de reposicionar a UI quando o resultado vier do cache (VPS com Redis)
-                        try:
-                            await LoginManager.fazer_login(session)
-                        except Exception as _login_err:
-                            logger.warning(f"⚠️ Falha no login antes do reposicionamento pós-cache: {_login_err}")
-
-                        await session.page.goto("https://projudi.tjgo.jus.br/BuscaProcesso",
-                                               wait_until='domcontentloaded', timeout=60000)
-                        if request.tipo_busca == "cpf":
-                            await busca_manager._buscar_por_cpf(session.page, request.valor)
-                        elif request.tipo_busca == "nome":
-                            await busca_manager._buscar_por_nome(session.page, request.valor)
-                        elif request.tipo_busca == "processo":
-                            await busca_manager._buscar_por_processo(session.page, request.valor)
-                        await asyncio.sleep(1)
-                except Exception as _cache_nav_err:
-                    logger.warning(f"⚠️ Não foi possível posicionar UI após cache: {_cache_nav_err}")
-
-                processos_detalhados = []
-                
-                # Nível 2 e 3: Processar cada processo encontrado (se movimentacoes = True)
-                if resultado_busca.processos and request.movimentacoes:
-                    for i, processo in enumerate(resultado_busca.processos):
-                        try:
-                            logger.info(f"📄 Processando processo {i+1}/{len(resultado_busca.processos)}: {processo.numero}")
-                            
-                            # Para processos após o primeiro, voltar à lista
-                            if i > 0:
-                                try:
-                                    await session.page.goto("https://projudi.tjgo.jus.br/BuscaProcesso", 
-                                                          wait_until='domcontentloaded', timeout=60000)
-                                    # Re-executar busca por CPF/nome/processo conforme tipo
-                                    if request.tipo_busca == "cpf":
-                                        await busca_manager._buscar_por_cpf(session.page, request.valor)
-                                    elif request.tipo_busca == "nome":
-                                        await busca_manager._buscar_por_nome(session.page, request.valor)
-                                    elif request.tipo_busca == "processo":
-                                        await busca_manager._buscar_por_processo(session.page, request.valor)
-                                    await asyncio.sleep(2)  # Aguardar estabilizar
-                                except Exception as nav_error:
-                                    logger.warning(f"⚠️ Erro na re-navegação: {nav_error}")
-                                    await asyncio.sleep(3)
-                            
-                            # Acessar processo
-                            if await processo_manager.acessar_processo(session, processo):
-                                
-                                # Extrair dados do processo (Nível 2)
-                                dados_processo = await processo_manager.extrair_dados_processo(
-                                    session, 
-                                    processo, 
-                                    request.limite_movimentacoes
-                                )
-                                
-                                # Extrair anexos se solicitado (Nível 3)
-                                anexos_processados = []
-                                if request.extrair_anexos and dados_processo.movimentacoes:
-                                    # Solicitar acesso aos anexos
-                                    await anexos_manager.solicitar_acesso_anexos(session)
-                                    
-                                    # Acessar página de navegação
-                                    if await anexos_manager.acessar_navegacao_arquivos(session):
-                                        anexos_processados = await anexos_manager.extrair_anexos_movimentacoes(
-                                            session,
-                                            dados_processo.movimentacoes,
-                                            limite=3  # Limitar a 3 anexos por padrão
-                                        )
-                                
-                                # Se solicitado, executar extração detalhada de partes no FINAL (única forma de extrair partes)
-                                if getattr(request, 'extrair_partes_detalhadas', False):
-                                    try:
-                                        logger.info("🧩 Executando extração de partes detalhada (opcional) no final do fluxo...")
-                                        partes_det = await processo_manager.extrair_partes_detalhadas(session)
-                                        # Substituir partes do dados_processo sem alterar restante da lógica
-                                        dados_processo.partes_polo_ativo = partes_det.get('polo_ativo', dados_processo.partes_polo_ativo)
-                                        dados_processo.partes_polo_passivo = partes_det.get('polo_passivo', dados_processo.partes_polo_passivo)
-                                        dados_processo.outras_partes = partes_det.get('outros', dados_processo.outras_partes)
-                                    except Exception as e:
-                                        logger.warning(f"⚠️ Falha na extração detalhada opcional: {e}")
-
-                                # Converter para response (partes podem ter sido preenchidas somente se detalhado estiver ativo)
-                                processo_detalhado = await ProjudiService._converter_dados_processo(
-                                    dados_processo,
-                                    anexos_processados
-                                )
-                                processos_detalhados.append(processo_detalhado)
-                                
-                        except Exception as e:
-                            logger.error(f"❌ Erro ao processar processo {processo.numero}: {e}")
-                            continue
-                
-                # Criar response final
-                response = BuscaResponse(
-                    request_id=request_id,
-                    tipo_busca=request.tipo_busca,
-                    valor_busca=request.valor,
-                    total_processos_encontrados=len(processos_simples),
-                    processos_simples=processos_simples,
-                    processos_detalhados=processos_detalhados,
-                    tempo_execucao=time.time() - start_time
-                )
-                
-                logger.info(f"✅ Busca {request_id} concluída em {response.tempo_execucao:.2f}s")
-                
-                # Restaurar credenciais originais se foram alteradas
-                if credenciais_originais:
-                    ProjudiService._restaurar_credenciais_originais(credenciais_originais)
-                
-                return response
+                    if isinstance(evento, EventoProcessosEncontrados):
+                        processos_simples = ProjudiService._converter_processos_simples(evento.processos)
+                    elif isinstance(evento, EventoProcessoDetalhado) and detalhar:
+                        processos_detalhados.append(
+                            await ProjudiService._converter_dados_processo(evento.dados, evento.anexos)
+                        )
+            
+            # Criar response final
+            response = BuscaResponse(
+                request_id=request_id,
+                tipo_busca=request.tipo_busca,
+                valor_busca=request.valor,
+                total_processos_encontrados=len(processos_simples),
+                processos_simples=processos_simples,
+                processos_detalhados=processos_detalhados,
+                tempo_execucao=time.time() - start_time
+            )
+            
+            logger.info(f"✅ Busca {request_id} concluída em {response.tempo_execucao:.2f}s")
+            return response
                 
         except Exception as e:
             logger.error(f"❌ Erro na busca {request_id}: {e}")
             
-            # Restaurar credenciais originais em caso de erro
-            if 'credenciais_originais' in locals() and credenciais_originais:
-                ProjudiService._restaurar_credenciais_originais(credenciais_originais)
-            
             return BuscaResponse(
                 status="error",
                 request_id=request_id,
@@ -312,16 +198,202 @@ class ProjudiService:
                 tempo_execucao=time.time() - start_time
             )
     
+    @staticmethod
+    async def processar_busca_em_etapas(request: BuscaRequest, request_id: str) -> AsyncIterator[EventoBusca]:
+        """Executa o fluxo de busca em uma sessão do pool, repassando cada evento assim que ocorre"""
+        logger.info(f"🔍 Processando busca {request_id}: {request.tipo_busca} = {request.valor}")
+        
+        async with get_session(ProjudiService._credenciais(request)) as session:
+            async with aclosing(executar_fluxo_busca(session, ProjudiService._parametros_busca(request))) as eventos:
+                async for evento in eventos:
+                    yield evento
+    
+    @staticmethod
+    def _parametros_busca(request: BuscaRequest) -> ParametrosBusca:
+        """Parâmetros do fluxo, sem as etapas cujos dados ficam fora da projeção pedida"""
+        return Projecao.da_busca(request).aplicar(ParametrosBusca(
+            tipo_busca=request.tipo_busca,
+            valor=request.valor,
+            limite_movimentacoes=request.limite_movimentacoes,
+            extrair_anexos=request.extrair_anexos,
+            limite_anexos=request.limite_anexos,
+            extrair_partes_detalhadas=request.extrair_partes_detalhadas,
+            movimentacoes=request.movimentacoes
+        ))
+    
+    @staticmethod
+    def _converter_processos_simples(processos: List[ProcessoEncontrado]) -> List[ProcessoSimples]:
+        """Converte processos encontrados no nível 1 para response"""
+        return [
+            ProcessoSimples.model_construct(
+                numero=p.numero,
+                classe=p.classe,
+                assunto=p.assunto,
+                id_processo=p.id_processo,
+                indice=p.indice
+            )
+            for p in processos
+        ]
+    
+    @staticmethod
+    def limite_paralelismo_lote() -> int:
+        """Quantas buscas de um lote podem rodar ao mesmo tempo (limitado pela capacidade do pool)"""
+        capacidade = max(1, min(settings.max_browsers, settings.max_concurrent_requests))
+        if settings.busca_multipla_paralelismo > 0:
+            return min(settings.busca_multipla_paralelismo, capacidade)
+        return capacidade
+    
+    @staticmethod
+    def agrupar_buscas(buscas: List[BuscaRequest]) -> List[List[int]]:
+        """Agrupa índices de buscas idênticas para executar cada uma apenas uma vez"""
+        grupos: Dict[str, List[int]] = {}
+        for i, busca in enumerate(buscas):
+            grupos.setdefault(busca.model_dump_json(), []).append(i)
+        return list(grupos.values())
+    
+    @staticmethod
+    async def executar_buscas(
+        buscas: List[BuscaRequest],
+        paralelo: bool = True,
+        prefixo: str = "batch"
+    ) -> AsyncIterator[Tuple[str, BuscaResponse]]:
+        """Executa as buscas com paralelismo limitado e produz (busca_id, resultado) na ordem de conclusão"""
+        grupos = ProjudiService.agrupar_buscas(buscas)
+        if len(grupos) < len(buscas):
+            logger.info(f"🔁 {len(buscas) - len(grupos)} buscas duplicadas no lote serão executadas uma única vez")
+        
+        limite = ProjudiService.limite_paralelismo_lote() if paralelo else 1
+        semaforo = asyncio.Semaphore(limite)
+        logger.info(f"🚀 Executando {len(grupos)} buscas com paralelismo {limite}")
+        
+        async def executar(indices: List[int]) -> Tuple[List[int], BuscaResponse]:
+            busca = buscas[indices[0]]
+            async with semaforo:
+                try:
+                    resultado = await ProjudiService.processar_busca_completa(busca, f"{prefixo}_{indices[0]}")
+                except Exception as e:
+                    logger.error(f"❌ Erro na busca_{indices[0]}: {e}")
+                    resultado = BuscaResponse(
+                        status="error",
+                        request_id="",
+                        tipo_busca=busca.tipo_busca,
+                        valor_busca=busca.valor,
+                        erro=str(e)
+                    )
+            return indices, resultado
+        
+        tarefas = [asyncio.create_task(executar(indices)) for indices in grupos]
+        try:
+            for proxima in asyncio.as_completed(tarefas):
+                indices, resultado = await proxima
+                for i in indices:
+                    yield f"busca_{i}", resultado
+        finally:
+            # Consumidor desistiu (ex.: cliente desconectou): não deixar buscas órfãs
+            for tarefa in tarefas:
+                tarefa.cancel()
+    
+    @staticmethod
+    def filtro_resposta_multipla(buscas: List[BuscaRequest]) -> Optional[Dict]:
+        """Filtro de exclusão de BuscaMultiplaResponse com a projeção de cada busca"""
+        filtros = {}
+        for i, busca in enumerate(buscas):
+            filtro = Projecao.da_busca(busca).filtro_exclusao()
+            if filtro:
+                filtros[f"busca_{i}"] = filtro
+        return {"resultados": filtros} if filtros else None
+    
+    @staticmethod
+    def montar_resposta_multipla(total_buscas: int, resultados: Dict[str, BuscaResponse], start_time: float) -> BuscaMultiplaResponse:
+        """Consolida os resultados de um lote de buscas"""
+        buscas_sucesso = sum(1 for r in resultados.values() if r.status == "success")
+        
+        if buscas_sucesso == total_buscas:
+            status = "success"
+        elif buscas_sucesso > 0:
+            status = "partial"
+        else:
+            status = "error"
+        
+        # Manter a ordem original das buscas na resposta
+        ordenados = dict(sorted(resultados.items(), key=lambda item: int(item[0].split("_")[1])))
+        
+        return BuscaMultiplaResponse(
+            status=status,
+            total_buscas=total_buscas,
+            buscas_concluidas=len(resultados),
+            resultados=ordenados,
+            tempo_total=time.time() - start_time
+        )
+    
+    @staticmethod
+    async def obter_anexo(numero_processo: str, id_arquivo: str) -> Optional[AnexoProcessado]:
+        """Obtém um anexo do store ou, se ainda não conhecido, baixa e extrai só ele"""
+        anexo = await anexos_manager.obter_anexo_armazenado(numero_processo, id_arquivo)
+        if anexo:
+            return anexo
+        
+        # Requisições simultâneas para o mesmo anexo compartilham um único download
+        chave = (numero_processo, id_arquivo)
+        tarefa = anexos_em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.create_task(ProjudiService._baixar_anexo_sob_demanda(numero_processo, id_arquivo))
+            anexos_em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda _: anexos_em_andamento.pop(chave, None))
+        return await asyncio.shield(tarefa)
+    
+    @staticmethod
+    async def _baixar_anexo_sob_demanda(numero_processo: str, id_arquivo: str) -> Optional[AnexoProcessado]:
+        """Abre o processo no PROJUDI e processa apenas o anexo pedido"""
+        logger.info(f"📎 Anexo {id_arquivo} do processo {numero_processo} solicitado sob demanda")
+        with cronometro_processo(numero_processo), metricas.medir_etapa("anexo_sob_demanda") as etapa:
+            etapa.anotar(anexo=id_arquivo)
+            return await ProjudiService._processar_anexo_sob_demanda(numero_processo, id_arquivo)
+    
+    @staticmethod
+    async def _processar_anexo_sob_demanda(numero_processo: str, id_arquivo: str) -> Optional[AnexoProcessado]:
+        async with get_session() as session:
+            dados_processo = await processo_manager.buscar_processo_especifico(session, numero_processo)
+            if not dados_processo or not dados_processo.movimentacoes:
+                return None
+            
+            await anexos_manager.solicitar_acesso_anexos(session)
+            if not await anexos_manager.acessar_navegacao_arquivos(session):
+                return None
+            
+            return await anexos_manager.obter_anexo_sob_demanda(
+                session,
+                dados_processo.movimentacoes,
+                id_arquivo
+            )
+    
+    @staticmethod
+    def _converter_partes(partes: List[ParteEnvolvida]) -> List[ParteEnvolvidaResponse]:
+        """Converte partes do nível 2 para response (sem revalidar: os dados vêm do próprio extrator)"""
+        return [
+            ParteEnvolvidaResponse.model_construct(
+                nome=p.nome,
+                tipo=p.tipo,
+                documento=p.documento,
+                endereco=p.endereco,
+                telefone=p.telefone,
+                email=p.email,
+                advogado=p.advogado,
+                oab=p.oab
+            )
+            for p in partes
+        ]
+    
     @staticmethod
     async def _converter_dados_processo(
         dados: DadosProcesso, 
-        anexos: List
+        anexos: List[AnexoInfo]
     ) -> ProcessoDetalhadoResponse:
         """Converte dados do processo para response"""
         
         # Converter movimentações
         movimentacoes = [
-            MovimentacaoResponse(
+            MovimentacaoResponse.model_construct(
                 numero=m.numero,
                 tipo=m.tipo,
                 descricao=m.descricao,
@@ -334,66 +406,26 @@ class ProjudiService:
         ]
         
         # Converter partes
-        partes_ativo = [
-            ParteEnvolvidaResponse(
-                nome=p.nome,
-                tipo=p.tipo,
-                documento=p.documento,
-                endereco=p.endereco,
-                telefone=p.telefone,
-                email=p.email,
-                advogado=p.advogado,
-                oab=p.oab
-            )
-            for p in dados.partes_polo_ativo
-        ]
-        
-        partes_passivo = [
-            ParteEnvolvidaResponse(
-                nome=p.nome,
-                tipo=p.tipo,
-                documento=p.documento,
-                endereco=p.endereco,
-                telefone=p.telefone,
-                email=p.email,
-                advogado=p.advogado,
-                oab=p.oab
-            )
-            for p in dados.partes_polo_passivo
-        ]
-        
-        outras_partes = [
-            ParteEnvolvidaResponse(
-                nome=p.nome,
-                tipo=p.tipo,
-                documento=p.documento,
-                endereco=p.endereco,
-                telefone=p.telefone,
-                email=p.email,
-                advogado=p.advogado,
-                oab=p.oab
-            )
-            for p in dados.outras_partes
-        ]
+        partes_ativo = ProjudiService._converter_partes(dados.partes_polo_ativo)
+        partes_passivo = ProjudiService._converter_partes(dados.partes_polo_passivo)
+        outras_partes = ProjudiService._converter_partes(dados.outras_partes)
         
-        # Converter anexos
-        anexos_response = [
-            AnexoResponse(
-                id_arquivo=a.anexo_info.id_arquivo,
-                nome_arquivo=a.anexo_info.nome_arquivo,
-                tipo_arquivo=a.anexo_info.tipo_arquivo,
-                tamanho_bytes=a.anexo_info.tamanho_bytes,
-                movimentacao_numero=a.anexo_info.movimentacao_numero,
-                conteudo_extraido=a.conteudo_extraido,
-                tamanho_conteudo=a.tamanho_conteudo,
-                metodo_extracao=a.metodo_extracao,
-                sucesso_processamento=a.sucesso_processamento,
-                tempo_processamento=a.tempo_processamento
-            )
-            for a in anexos
-        ]
+        # Converter anexos (apenas descritores; conteúdo via endpoint de anexo)
+        anexos_response = []
+        for a in anexos:
+            url_conteudo = f"/processos/{quote(a.numero_processo or dados.numero, safe='')}/anexos/{quote(a.id_arquivo, safe='')}"
+            anexos_response.append(AnexoResponse.model_construct(
+                id_arquivo=a.id_arquivo,
+                nome_arquivo=a.nome_arquivo,
+                tipo_arquivo=a.tipo_arquivo,
+                tamanho_bytes=a.tamanho_bytes,
+                movimentacao_numero=a.movimentacao_numero,
+                hash_conteudo=a.hash_conteudo or None,
+                url_conteudo=url_conteudo,
+                url_texto=f"{url_conteudo}/texto"
+            ))
         
-        return ProcessoDetalhadoResponse(
+        return ProcessoDetalhadoResponse.model_construct(
             numero=dados.numero,
             classe=dados.classe,
             assunto=dados.assunto,
@@ -414,40 +446,15 @@ class ProjudiService:
         )
     
     @staticmethod
-    def _aplicar_credenciais_customizadas(request: BuscaRequest) -> Dict[str, str]:
-        """Aplica credenciais customizadas temporariamente"""
-        credenciais_originais = {}
-        
+    def _credenciais(request: BuscaRequest) -> Optional[Credenciais]:
+        """Credenciais da requisição (login da sessão desta busca) ou None para as da configuração"""
+        if not (request.usuario or request.senha or request.serventia):
+            return None
         if request.usuario:
-            credenciais_originais['projudi_user'] = settings.projudi_user
-            settings.projudi_user = request.usuario
             logger.info(f"🔐 Usando usuário customizado: {request.usuario}")
-        
-        if request.senha:
-            credenciais_originais['projudi_pass'] = settings.projudi_pass
-            settings.projudi_pass = request.senha
-            logger.info("🔐 Usando senha customizada")
-        
         if request.serventia:
-            credenciais_originais['default_serventia'] = settings.default_serventia
-            settings.default_serventia = request.serventia
             logger.info(f"🏢 Usando serventia customizada: {request.serventia}")
-        
-        return credenciais_originais
-    
-    @staticmethod
-    def _restaurar_credenciais_originais(credenciais_originais: Dict[str, str]):
-        """Restaura as credenciais originais"""
-        if 'projudi_user' in credenciais_originais:
-            settings.projudi_user = credenciais_originais['projudi_user']
-        
-        if 'projudi_pass' in credenciais_originais:
-            settings.projudi_pass = credenciais_originais['projudi_pass']
-        
-        if 'default_serventia' in credenciais_originais:
-            settings.default_serventia = credenciais_originais['default_serventia']
-        
-        logger.info("🔄 Credenciais originais restauradas")
+        return Credenciais.customizadas(request.usuario, request.senha, request.serventia)
 
 # Endpoints da API
 
@@ -470,12 +477,30 @@ async def root():
             "/buscar": "Busca individual (POST)",
             "/buscar-n8n": "Busca compatível com N8N (POST)",
             "/buscar-multiplo": "Múltiplas buscas (POST)", 
+            "/buscar-multiplo/stream": "Múltiplas buscas com resultados em streaming NDJSON/SSE (POST)",
+            "/lotes": "Lote de buscas via upload CSV/JSONL, com progresso e retomada (POST/GET)",
+            "/processos/{numero}": "Dados de um processo com ETag e If-None-Match/304 (GET)",
+            "/processos/{numero}/anexos/{id}": "Arquivo de um anexo sob demanda, com Range (GET)",
+            "/processos/{numero}/anexos/{id}/texto": "Texto extraído de um anexo sob demanda (GET)",
+            "/metrics": "Métricas Prometheus (GET)",
+            "/traces": "Traces do Playwright gravados (buscas amostradas, lentas, com erro ou fallback) (GET)",
+            "/diagnostico/rpc": "Chamadas ao Playwright por local de chamada, ranqueadas por tempo ou quantidade (GET/DELETE)",
+            "/admin/perfil": "Perfil de CPU, tracemalloc e memória dos navegadores (requer ADMIN_API_KEY)",
             "/status": "Status da API (GET)",
             "/health": "Health check (GET)"
         },
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas no formato Prometheus (latência por etapa, pool de sessões, caches, HTTP do PROJUDI)"""
+    if not metricas.habilitado:
+        raise HTTPException(status_code=503, detail="Métricas desabilitadas (METRICAS_HABILITADAS ou prometheus_client ausente)")
+    metricas.atualizar_pool(session_manager.get_stats(), concurrency_manager.get_stats())
+    conteudo, tipo = metricas.gerar()
+    return Response(content=conteudo, media_type=tipo)
+
 @app.get("/status", response_model=StatusResponse)
 async def get_status():
     """Status da API"""
@@ -529,10 +554,138 @@ def _require_api_key(x_api_key: Optional[str] = Header(default=None)):
         if not x_api_key or x_api_key != settings.api_key:
             raise HTTPException(status_code=401, detail="API key inválida ou ausente")
 
+def _require_admin_key(x_admin_key: Optional[str] = Header(default=None)):
+    """Endpoints /admin exigem ADMIN_API_KEY (desabilitados quando não configurada)"""
+    if not settings.admin_api_key:
+        raise HTTPException(status_code=403, detail="Endpoints administrativos desabilitados (ADMIN_API_KEY)")
+    if x_admin_key != settings.admin_api_key:
+        raise HTTPException(status_code=401, detail="Chave administrativa inválida ou ausente")
+
+def _formato_stream(formato: Optional[str], http_request: Request) -> Optional[str]:
+    """Formato de streaming pedido (?formato=ndjson|sse ou header Accept); None = resposta JSON única"""
+    if formato is None:
+        accept = http_request.headers.get("accept", "")
+        if "text/event-stream" in accept:
+            formato = "sse"
+        elif "application/x-ndjson" in accept:
+            formato = "ndjson"
+        else:
+            return None
+    if formato not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="Formato inválido, use 'ndjson' ou 'sse'")
+    return formato
+
+def _registro_stream(formato: str, evento: str, dados: str) -> str:
+    """Formata um registro do stream como linha NDJSON ou evento SSE"""
+    if formato == "sse":
+        return f"event: {evento}\ndata: {dados}\n\n"
+    return f"{dados}\n"
+
+def _resposta_stream(gerador, formato: str) -> StreamingResponse:
+    return StreamingResponse(
+        gerador,
+        media_type="text/event-stream" if formato == "sse" else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # nginx: não segurar o stream em buffer
+        }
+    )
 
 @app.post("/buscar", response_model=BuscaResponse, dependencies=[Depends(_require_api_key)])
-async def buscar_processo(request: BuscaRequest, background_tasks: BackgroundTasks):
-    """Executa busca de processo"""
+async def buscar_processo(
+    request: BuscaRequest,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    formato: Optional[str] = None
+):
+    """Executa busca de processo (opcionalmente em streaming: lista do nível 1 e cada processo ao ficar pronto)"""
+    formato_stream = _formato_stream(formato, http_request)
+    if formato_stream:
+        if not request.valor.strip():
+            raise HTTPException(status_code=400, detail="Valor de busca não pode estar vazio")
+        return _resposta_stream(_gerar_busca_stream(request, formato_stream), formato_stream)
+    return RespostaJSON(
+        await _executar_busca(request, background_tasks),
+        excluir=Projecao.da_busca(request).filtro_exclusao()
+    )
+
+async def _gerar_busca_stream(request: BuscaRequest, formato: str):
+    """Emite processos_simples, cada processo detalhado e um resumo final"""
+    request_id = str(uuid.uuid4())
+    start_time = time.time()
+    requisicoes_ativas[request_id] = {
+        "status": "processing",
+        "start_time": start_time,
+        "request": request
+    }
+    total_encontrados = 0
+    total_detalhados = 0
+    erro = None
+    projecao = Projecao.da_busca(request)
+    filtro_processo = projecao.filtro_processo()
+    
+    try:
+        with contexto_requisicao(request_id), cronometro_requisicao() as cronometro:
+            try:
+                async with aclosing(ProjudiService.processar_busca_em_etapas(request, request_id)) as eventos:
+                    async for evento in eventos:
+                        if isinstance(evento, EventoErro):
+                            erro = evento.mensagem
+                            break
+                        if isinstance(evento, EventoProcessosEncontrados):
+                            processos_simples = ProjudiService._converter_processos_simples(evento.processos)
+                            total_encontrados = len(processos_simples)
+                            registro = {
+                                "tipo": "processos_simples",
+                                "request_id": request_id,
+                                "tipo_busca": request.tipo_busca,
+                                "valor_busca": request.valor,
+                                "total_processos_encontrados": total_encontrados,
+                                "processos_simples": [p.model_dump() for p in processos_simples]
+                            }
+                            for campo in ("tipo_busca", "valor_busca", "total_processos_encontrados", "processos_simples"):
+                                if not projecao.inclui(campo):
+                                    del registro[campo]
+                            yield _registro_stream(formato, "processos_simples", dumps_str(registro))
+                        elif isinstance(evento, EventoProcessoDetalhado) and projecao.inclui("processos_detalhados"):
+                            processo = await ProjudiService._converter_dados_processo(evento.dados, evento.anexos)
+                            total_detalhados += 1
+                            yield _registro_stream(
+                                formato,
+                                "processo",
+                                f'{{"tipo":"processo","indice":{evento.indice},"processo":{processo.model_dump_json(exclude=filtro_processo)}}}'
+                            )
+            except Exception as e:
+                logger.error(f"❌ Erro na busca {request_id}: {e}")
+                erro = str(e)
+    
+        resumo = {
+            "tipo": "resumo",
+            "status": "error" if erro else "success",
+            "request_id": request_id,
+            "total_processos_encontrados": total_encontrados,
+            "total_processos_detalhados": total_detalhados,
+            "tempo_execucao": time.time() - start_time,
+            "erro": erro,
+            "timestamp": datetime.now().isoformat()
+        }
+        if request.incluir_timings:
+            resumo["timings"] = cronometro.resumo()
+        requisicoes_ativas[request_id]["status"] = "error" if erro else "completed"
+        if cronometro.traces:
+            requisicoes_ativas[request_id]["traces_playwright"] = [f"/traces/{nome}" for nome in cronometro.traces]
+        metricas.registrar_busca(request.tipo_busca, resumo["status"], resumo["tempo_execucao"])
+        ProjudiService._registrar_timings(request_id, resumo["tempo_execucao"], cronometro)
+        logger.info(f"✅ Busca {request_id} em streaming concluída em {resumo['tempo_execucao']:.2f}s")
+        yield _registro_stream(formato, "resumo", dumps_str(resumo))
+    finally:
+        # Cliente desconectado (GeneratorExit/cancelamento em um yield): a busca não fica "processing" para sempre
+        if requisicoes_ativas.get(request_id, {}).get("status") == "processing":
+            requisicoes_ativas[request_id].update(status="error", error="Cliente desconectou durante o streaming")
+        asyncio.create_task(limpar_requisicao_ativa(request_id, delay=300))
+
+async def _executar_busca(request: BuscaRequest, background_tasks: BackgroundTasks) -> BuscaResponse:
+    """Executa a busca completa e registra em requisicoes_ativas"""
     try:
         request_id = str(uuid.uuid4())
         
@@ -587,7 +740,10 @@ async def buscar_processo_n8n_legacy(request: Union[BuscaRequestN8N, BuscaReques
             busca_request = request.to_busca_request()
         else:
             busca_request = request
-        return await buscar_processo(busca_request, background_tasks)
+        return RespostaJSON(
+            await _executar_busca(busca_request, background_tasks),
+            excluir=Projecao.da_busca(busca_request).filtro_exclusao()
+        )
     except ValueError as e:
         logger.error(f"❌ Erro de validação N8N: {e}")
         raise HTTPException(status_code=400, detail=f"Erro de validação: {str(e)}")
@@ -605,7 +761,10 @@ async def buscar_processo_n8n_v2(request: Union[BuscaRequestN8N, BuscaRequest],
         else:
             busca_request = request
 
-        return await buscar_processo(busca_request, background_tasks)
+        return RespostaJSON(
+            await _executar_busca(busca_request, background_tasks),
+            excluir=Projecao.da_busca(busca_request).filtro_exclusao()
+        )
     except ValueError as e:
         logger.error(f"❌ Erro de validação N8N v2: {e}")
         raise HTTPException(status_code=400, detail=f"Erro de validação: {str(e)}")
@@ -613,82 +772,183 @@ async def buscar_processo_n8n_v2(request: Union[BuscaRequestN8N, BuscaRequest],
         logger.error(f"❌ Erro no endpoint /buscar-n8n-v2: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/buscar-multiplo", response_model=BuscaMultiplaResponse, dependencies=[Depends(_require_api_key)])
-async def buscar_multiplo(request: BuscaMultiplaRequest):
+@app.post(
+    "/buscar-multiplo",
+    response_model=Union[BuscaMultiplaResponse, BuscaMultiplaAceitaResponse],
+    dependencies=[Depends(_require_api_key)]
+)
+async def buscar_multiplo(request: BuscaMultiplaRequest, background_tasks: BackgroundTasks):
     """Executa múltiplas buscas"""
     try:
         if not request.buscas:
             raise HTTPException(status_code=400, detail="Lista de buscas não pode estar vazia")
         
-        if len(request.buscas) > 10:
-            raise HTTPException(status_code=400, detail="Máximo de 10 buscas simultâneas")
+        if len(request.buscas) > settings.busca_multipla_max_buscas:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Máximo de {settings.busca_multipla_max_buscas} buscas por lote"
+            )
+        
+        if request.assincrono:
+            # Responder já e processar em segundo plano; progresso em /requisicoes/{request_id}
+            request_id = str(uuid.uuid4())
+            requisicoes_ativas[request_id] = {
+                "status": "processing",
+                "start_time": time.time(),
+                "total_buscas": len(request.buscas),
+                "buscas_concluidas": 0
+            }
+            background_tasks.add_task(executar_busca_multipla_em_segundo_plano, request_id, request)
+            
+            return JSONResponse(
+                status_code=202,
+                content=BuscaMultiplaAceitaResponse(
+                    request_id=request_id,
+                    total_buscas=len(request.buscas),
+                    buscas_unicas=len(ProjudiService.agrupar_buscas(request.buscas)),
+                    paralelismo=ProjudiService.limite_paralelismo_lote() if request.paralelo else 1,
+                    url_status=f"/requisicoes/{request_id}"
+                ).model_dump(mode="json")
+            )
         
         start_time = time.time()
         resultados = {}
+        prefixo = f"{'batch' if request.paralelo else 'seq'}_{int(time.time())}"
         
-        if request.paralelo:
-            # Executar em paralelo
-            tasks = []
-            for i, busca in enumerate(request.buscas):
-                request_id = f"batch_{int(time.time())}_{i}"
-                task = ProjudiService.processar_busca_completa(busca, request_id)
-                tasks.append((f"busca_{i}", task))
-            
-            # Aguardar todas as tasks
-            for busca_id, task in tasks:
-                try:
-                    resultado = await task
-                    resultados[busca_id] = resultado
-                except Exception as e:
-                    logger.error(f"❌ Erro na {busca_id}: {e}")
-                    resultados[busca_id] = BuscaResponse(
-                        status="error",
-                        request_id="",
-                        tipo_busca="",
-                        valor_busca="",
-                        erro=str(e)
-                    )
-        else:
-            # Executar sequencialmente
-            for i, busca in enumerate(request.buscas):
-                try:
-                    request_id = f"seq_{int(time.time())}_{i}"
-                    resultado = await ProjudiService.processar_busca_completa(busca, request_id)
-                    resultados[f"busca_{i}"] = resultado
-                except Exception as e:
-                    logger.error(f"❌ Erro na busca {i}: {e}")
-                    resultados[f"busca_{i}"] = BuscaResponse(
-                        status="error",
-                        request_id="",
-                        tipo_busca="",
-                        valor_busca="",
-                        erro=str(e)
-                    )
+        async for busca_id, resultado in ProjudiService.executar_buscas(request.buscas, request.paralelo, prefixo):
+            resultados[busca_id] = resultado
+        
+        return RespostaJSON(
+            ProjudiService.montar_resposta_multipla(len(request.buscas), resultados, start_time),
+            excluir=ProjudiService.filtro_resposta_multipla(request.buscas)
+        )
         
-        # Determinar status geral
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erro no endpoint /buscar-multiplo: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/buscar-multiplo/stream", dependencies=[Depends(_require_api_key)])
+async def buscar_multiplo_stream(
+    request: BuscaMultiplaRequest,
+    http_request: Request,
+    formato: Optional[str] = None
+):
+    """Executa múltiplas buscas emitindo cada resultado assim que termina (NDJSON ou SSE)"""
+    if not request.buscas:
+        raise HTTPException(status_code=400, detail="Lista de buscas não pode estar vazia")
+    
+    if len(request.buscas) > settings.busca_multipla_max_buscas:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {settings.busca_multipla_max_buscas} buscas por lote"
+        )
+    
+    # Formato: ?formato=sse|ndjson ou Accept: text/event-stream (padrão NDJSON)
+    formato = _formato_stream(formato, http_request) or "ndjson"
+    
+    async def gerar():
+        start_time = time.time()
         total_buscas = len(request.buscas)
-        buscas_sucesso = sum(1 for r in resultados.values() if r.status == "success")
+        concluidas = 0
+        sucesso = 0
+        prefixo = f"stream_{int(time.time())}"
+        filtros = {
+            f"busca_{i}": Projecao.da_busca(busca).filtro_exclusao()
+            for i, busca in enumerate(request.buscas)
+        }
         
-        if buscas_sucesso == total_buscas:
+        # Apenas contadores ficam em memória; cada resultado é enviado e descartado
+        async for busca_id, resultado in ProjudiService.executar_buscas(request.buscas, request.paralelo, prefixo):
+            concluidas += 1
+            if resultado.status == "success":
+                sucesso += 1
+            yield _registro_stream(
+                formato,
+                "resultado",
+                f'{{"tipo":"resultado","busca_id":"{busca_id}","resultado":{resultado.model_dump_json(exclude=filtros[busca_id])}}}'
+            )
+        
+        if sucesso == total_buscas:
             status = "success"
-        elif buscas_sucesso > 0:
+        elif sucesso > 0:
             status = "partial"
         else:
             status = "error"
         
-        return BuscaMultiplaResponse(
-            status=status,
-            total_buscas=total_buscas,
-            buscas_concluidas=len(resultados),
-            resultados=resultados,
-            tempo_total=time.time() - start_time
-        )
-        
-    except HTTPException:
-        raise
+        resumo = {
+            "tipo": "resumo",
+            "status": status,
+            "total_buscas": total_buscas,
+            "buscas_concluidas": concluidas,
+            "buscas_sucesso": sucesso,
+            "tempo_total": time.time() - start_time,
+            "timestamp": datetime.now().isoformat()
+        }
+        logger.info(f"✅ Lote em streaming concluído: {sucesso}/{total_buscas} em {resumo['tempo_total']:.2f}s")
+        yield _registro_stream(formato, "resumo", dumps_str(resumo))
+    
+    return _resposta_stream(gerar(), formato)
+
+@app.post("/lotes", status_code=202, dependencies=[Depends(_require_api_key)])
+async def criar_lote(arquivo: UploadFile = File(...), formato: Optional[str] = None):
+    """Recebe um CSV/JSONL de buscas e inicia o processamento em segundo plano"""
+    nome_arquivo = arquivo.filename or ""
+    if formato is None:
+        tipo = (arquivo.content_type or "").lower()
+        formato = "csv" if nome_arquivo.lower().endswith(".csv") or "csv" in tipo else "jsonl"
+    if formato not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Formato inválido, use 'csv' ou 'jsonl'")
+    
+    try:
+        lote = await gerenciador_lotes.criar_lote(await arquivo.read(), formato, nome_arquivo)
+    except EntradaLoteInvalida as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"❌ Erro no endpoint /buscar-multiplo: {e}")
+        logger.error(f"❌ Erro ao criar lote: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        **gerenciador_lotes.progresso(lote),
+        "url_progresso": f"/lotes/{lote.id}",
+        "url_resultado": f"/lotes/{lote.id}/resultado"
+    }
+
+@app.get("/lotes", dependencies=[Depends(_require_api_key)])
+async def listar_lotes():
+    """Lista os lotes conhecidos com seu progresso"""
+    return {
+        "lotes": [gerenciador_lotes.progresso(lote) for lote in gerenciador_lotes.listar()],
+        "stats": gerenciador_lotes.get_stats()
+    }
+
+@app.get("/lotes/{lote_id}", dependencies=[Depends(_require_api_key)])
+async def obter_lote(lote_id: str):
+    """Progresso de um lote"""
+    lote = gerenciador_lotes.obter(lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    return gerenciador_lotes.progresso(lote)
+
+@app.get("/lotes/{lote_id}/resultado", dependencies=[Depends(_require_api_key)])
+async def obter_resultado_lote(lote_id: str):
+    """Resultados já gravados do lote (JSONL, um BuscaResponse por linha; parcial enquanto processa)"""
+    lote = gerenciador_lotes.obter(lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    caminho = gerenciador_lotes.caminho_resultado(lote_id)
+    if not caminho.exists():
+        return Response(content=b"", media_type="application/x-ndjson")
+    return FileResponse(caminho, media_type="application/x-ndjson", filename=f"lote_{lote_id}.jsonl")
+
+@app.post("/lotes/{lote_id}/cancelar", dependencies=[Depends(_require_api_key)])
+async def cancelar_lote(lote_id: str):
+    """Cancela um lote em andamento (resultados já gravados são mantidos)"""
+    lote = await gerenciador_lotes.cancelar(lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote não encontrado")
+    return gerenciador_lotes.progresso(lote)
 
 @app.get("/requisicoes/{request_id}")
 async def get_requisicao_status(request_id: str):
@@ -698,6 +958,192 @@ async def get_requisicao_status(request_id: str):
     
     return requisicoes_ativas[request_id]
 
+@app.get("/traces", dependencies=[Depends(_require_api_key)])
+async def listar_traces():
+    """Traces do Playwright disponíveis (mais recentes primeiro)"""
+    return {**traces_playwright.get_stats(), "traces": await asyncio.to_thread(traces_playwright.listar)}
+
+@app.get("/traces/{nome}", dependencies=[Depends(_require_api_key)])
+async def baixar_trace(nome: str):
+    """Arquivo .zip do trace (abrir em https://trace.playwright.dev ou `playwright show-trace`)"""
+    arquivo = traces_playwright.caminho(nome)
+    if not arquivo:
+        raise HTTPException(status_code=404, detail="Trace não encontrado")
+    return FileResponse(arquivo, media_type="application/zip", filename=nome)
+
+@app.get("/diagnostico/rpc", dependencies=[Depends(_require_api_key)])
+async def relatorio_rpc(
+    ordenar: Literal["tempo", "chamadas"] = "tempo",
+    agrupar: Literal["linha", "funcao"] = "linha",
+    limite: int = Query(default=50, ge=1, le=1000)
+):
+    """Locais do código que mais chamam o navegador (idas e voltas ao Playwright) desde o último reset"""
+    return perfil_rpc.relatorio(ordenar=ordenar, agrupar=agrupar, limite=limite)
+
+@app.delete("/diagnostico/rpc", dependencies=[Depends(_require_api_key)])
+async def limpar_relatorio_rpc():
+    """Zera o acumulado (ex.: antes de medir uma mudança)"""
+    perfil_rpc.limpar()
+    return {"status": "ok"}
+
+@app.post("/admin/perfil/cpu", dependencies=[Depends(_require_admin_key)])
+async def iniciar_perfil_cpu(
+    segundos: float = Query(default=30, gt=0, le=600),
+    intervalo_ms: float = Query(default=10, ge=1, le=1000)
+):
+    """Amostra as pilhas de todas as threads por N segundos; o arquivo .folded sai em /admin/perfis"""
+    try:
+        return perfilador.iniciar_cpu(segundos, intervalo_ms)
+    except PerfilEmAndamento as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.get("/admin/perfil/cpu", dependencies=[Depends(_require_admin_key)])
+async def status_perfil_cpu():
+    return perfilador.status_cpu()
+
+@app.post("/admin/perfil/cpu/parar", dependencies=[Depends(_require_admin_key)])
+async def parar_perfil_cpu():
+    return await asyncio.to_thread(perfilador.parar_cpu)
+
+@app.post("/admin/perfil/memoria/iniciar", dependencies=[Depends(_require_admin_key)])
+async def iniciar_perfil_memoria(quadros: int = Query(default=10, ge=1, le=100)):
+    """Liga o tracemalloc (custo de memória/CPU enquanto ativo)"""
+    return perfilador.iniciar_memoria(quadros)
+
+@app.post("/admin/perfil/memoria/snapshot", dependencies=[Depends(_require_admin_key)])
+async def snapshot_perfil_memoria(
+    limite: int = Query(default=50, ge=1, le=1000),
+    agrupar: Literal["lineno", "filename", "traceback"] = "lineno"
+):
+    """Grava o top de alocações e a diferença para o snapshot anterior"""
+    try:
+        return await asyncio.to_thread(perfilador.snapshot_memoria, limite, agrupar)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/perfil/memoria/parar", dependencies=[Depends(_require_admin_key)])
+async def parar_perfil_memoria():
+    return perfilador.parar_memoria()
+
+@app.get("/admin/perfil/processos", dependencies=[Depends(_require_admin_key)])
+async def memoria_processos():
+    """RSS do worker e do Chromium (processo principal + filhos) de cada sessão"""
+    try:
+        return await asyncio.to_thread(perfilador.memoria_processos, dict(session_manager.sessions))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/admin/perfis", dependencies=[Depends(_require_admin_key)])
+async def listar_perfis():
+    return {"perfis": await asyncio.to_thread(perfilador.listar)}
+
+@app.get("/admin/perfis/{nome}", dependencies=[Depends(_require_admin_key)])
+async def baixar_perfil(nome: str):
+    arquivo = perfilador.caminho(nome)
+    if not arquivo:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return FileResponse(arquivo, media_type="text/plain; charset=utf-8", filename=nome)
+
+async def _obter_anexo_ou_404(numero_processo: str, id_arquivo: str) -> AnexoProcessado:
+    try:
+        anexo = await ProjudiService.obter_anexo(numero_processo, id_arquivo)
+    except Exception as e:
+        logger.error(f"❌ Erro ao obter anexo {id_arquivo} do processo {numero_processo}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if not anexo:
+        raise HTTPException(status_code=404, detail="Anexo não encontrado")
+    return anexo
+
+@app.get(
+    "/processos/{numero_processo}",
+    response_model=ProcessoDetalhadoResponse,
+    dependencies=[Depends(_require_api_key)]
+)
+async def obter_processo(
+    numero_processo: str,
+    request: Request,
+    limite_movimentacoes: Optional[int] = None,
+    extrair_anexos: bool = False,
+    extrair_partes_detalhadas: bool = False,
+    campos: Optional[str] = None,
+    excluir: Optional[str] = None
+):
+    """Dados detalhados de um processo com ETag (hash do conteúdo); If-None-Match igual responde 304"""
+    try:
+        busca = BuscaRequest(
+            tipo_busca="processo",
+            valor=numero_processo,
+            limite_movimentacoes=limite_movimentacoes,
+            extrair_anexos=extrair_anexos,
+            extrair_partes_detalhadas=extrair_partes_detalhadas,
+            # Projeção relativa ao processo (ex.: campos=numero,movimentacoes)
+            campos=[f"processos_detalhados.{c.strip()}" for c in campos.split(",") if c.strip()] if campos else None,
+            excluir=[f"processos_detalhados.{c.strip()}" for c in excluir.split(",") if c.strip()] if excluir else None
+        )
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=e.errors()[0].get("msg", str(e)))
+    
+    projecao = Projecao.da_busca(busca)
+    filtro = projecao.filtro_processo()
+    parametros = asdict(ProjudiService._parametros_busca(busca))
+    chave = "processo:" + hashlib.sha256(dumps_str([parametros, filtro]).encode("utf-8")).hexdigest()[:32]
+    
+    em_cache = await cache_manager.get(chave) if settings.processo_cache_ttl > 0 else None
+    if em_cache:
+        etag, corpo = em_cache["etag"], em_cache["corpo"]
+    else:
+        resultado = await ProjudiService.processar_busca_completa(busca, str(uuid.uuid4()))
+        if resultado.status != "success" and resultado.erro != "Processo não encontrado":
+            raise HTTPException(status_code=500, detail=resultado.erro)
+        if not resultado.processos_detalhados:
+            raise HTTPException(status_code=404, detail="Processo não encontrado")
+        
+        processo = resultado.processos_detalhados[0]
+        # Projeções diferentes do mesmo conteúdo têm ETags diferentes
+        sufixo = f"-{hashlib.sha256(dumps_str(filtro).encode('utf-8')).hexdigest()[:8]}" if filtro else ""
+        conteudo = hashlib.sha256(processo.model_dump_json().encode("utf-8")).hexdigest()[:32]
+        etag = f'"{conteudo}{sufixo}"'
+        corpo = processo.model_dump_json(exclude=filtro)
+        if settings.processo_cache_ttl > 0:
+            await cache_manager.set(chave, {"etag": etag, "corpo": corpo}, expire=settings.processo_cache_ttl)
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_corresponde(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
+
+@app.get("/processos/{numero_processo}/anexos/{id_arquivo}", dependencies=[Depends(_require_api_key)])
+async def baixar_anexo(numero_processo: str, id_arquivo: str, request: Request):
+    """Retorna o arquivo original de um anexo (baixado sob demanda, com suporte a Range)"""
+    anexo = await _obter_anexo_ou_404(numero_processo, id_arquivo)
+    if not anexo.arquivo_baixado or not os.path.exists(anexo.arquivo_baixado):
+        raise HTTPException(status_code=404, detail="Arquivo do anexo indisponível")
+    return _resposta_arquivo_anexo(anexo, request)
+
+@app.get(
+    "/processos/{numero_processo}/anexos/{id_arquivo}/texto",
+    response_model=AnexoTextoResponse,
+    dependencies=[Depends(_require_api_key)]
+)
+async def obter_texto_anexo(numero_processo: str, id_arquivo: str):
+    """Retorna o texto extraído de um anexo (baixado e extraído sob demanda)"""
+    anexo = await _obter_anexo_ou_404(numero_processo, id_arquivo)
+    info = anexo.anexo_info
+    return AnexoTextoResponse(
+        numero_processo=numero_processo,
+        id_arquivo=info.id_arquivo,
+        nome_arquivo=info.nome_arquivo,
+        tipo_arquivo=info.tipo_arquivo,
+        tamanho_bytes=info.tamanho_bytes,
+        movimentacao_numero=info.movimentacao_numero,
+        hash_conteudo=info.hash_conteudo or None,
+        conteudo_extraido=anexo.conteudo_extraido,
+        tamanho_conteudo=anexo.tamanho_conteudo,
+        metodo_extracao=anexo.metodo_extracao,
+        sucesso_processamento=anexo.sucesso_processamento,
+        tempo_processamento=anexo.tempo_processamento
+    )
+
 @app.post("/cleanup")
 async def cleanup():
     """Limpa recursos da API"""
@@ -777,6 +1223,7 @@ async def get_concurrency_stats():
         return {
             "status": "success",
             "stats": stats,
+            "rate_limit": limitador_taxa.get_stats(),
             "timestamp": datetime.now().isoformat()
         }
         
@@ -800,6 +1247,27 @@ async def reset_concurrency_stats():
         raise HTTPException(status_code=500, detail=f"Erro ao resetar estatísticas: {str(e)}")
 
 # Funções auxiliares
+async def executar_busca_multipla_em_segundo_plano(request_id: str, request: BuscaMultiplaRequest):
+    """Processa um lote assíncrono, registrando o progresso em requisicoes_ativas"""
+    start_time = time.time()
+    resultados = {}
+    try:
+        async for busca_id, resultado in ProjudiService.executar_buscas(request.buscas, request.paralelo, f"lote_{request_id[:8]}"):
+            resultados[busca_id] = resultado
+            requisicoes_ativas[request_id]["buscas_concluidas"] = len(resultados)
+        
+        requisicoes_ativas[request_id]["status"] = "completed"
+        requisicoes_ativas[request_id]["response"] = ProjudiService.montar_resposta_multipla(
+            len(request.buscas), resultados, start_time
+        )
+        logger.info(f"✅ Lote {request_id} concluído em {time.time() - start_time:.2f}s")
+    except Exception as e:
+        logger.error(f"❌ Erro no lote {request_id}: {e}")
+        requisicoes_ativas[request_id]["status"] = "error"
+        requisicoes_ativas[request_id]["error"] = str(e)
+    
+    await limpar_requisicao_ativa(request_id, delay=3600)
+
 async def limpar_requisicao_ativa(request_id: str, delay: int = 0):
     """Remove requisição da lista ativa após delay"""
     if delay > 0:
@@ -809,6 +1277,89 @@ async def limpar_requisicao_ativa(request_id: str, delay: int = 0):
         del requisicoes_ativas[request_id]
         logger.info(f"🧹 Requisição {request_id} removida da lista ativa")
 
+def _interpretar_range(valor: Optional[str], tamanho: int):
+    """Interpreta 'Range: bytes=...' (um único intervalo); None = arquivo inteiro, False = inválido"""
+    if not valor or not valor.startswith("bytes=") or "," in valor:
+        return None
+    inicio_txt, _, fim_txt = valor[6:].strip().partition("-")
+    try:
+        if not inicio_txt:
+            sufixo = int(fim_txt)
+            if sufixo <= 0:
+                return False
+            return max(0, tamanho - sufixo), tamanho - 1
+        inicio = int(inicio_txt)
+        fim = int(fim_txt) if fim_txt else tamanho - 1
+    except ValueError:
+        return None
+    if inicio >= tamanho or fim < inicio:
+        return False
+    return inicio, min(fim, tamanho - 1)
+
+async def _ler_intervalo(caminho: str, inicio: int, fim: int, tamanho_bloco: int = 256 * 1024):
+    """Lê o intervalo [inicio, fim] do arquivo em blocos, fora do event loop"""
+    arquivo = await asyncio.to_thread(open, caminho, 'rb')
+    try:
+        await asyncio.to_thread(arquivo.seek, inicio)
+        restante = fim - inicio + 1
+        while restante > 0:
+            bloco = await asyncio.to_thread(arquivo.read, min(tamanho_bloco, restante))
+            if not bloco:
+                break
+            restante -= len(bloco)
+            yield bloco
+    finally:
+        await asyncio.to_thread(arquivo.close)
+
+def _etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara If-None-Match (lista, `*` e validadores fracos) com o ETag atual"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidatos = {t.strip().removeprefix("W/").strip('"') for t in if_none_match.split(",")}
+    return etag.strip('"') in candidatos
+
+def _resposta_arquivo_anexo(anexo: AnexoProcessado, request: Request) -> Response:
+    """Monta a resposta do arquivo do anexo com ETag (hash do conteúdo) e Range"""
+    info = anexo.anexo_info
+    tamanho = os.path.getsize(anexo.arquivo_baixado)
+    media_type = "application/pdf" if info.tipo_arquivo == "PDF" else "text/html; charset=utf-8"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(info.nome_arquivo or info.id_arquivo)}"
+    }
+    etag = f'"{info.hash_conteudo}"' if info.hash_conteudo else None
+    if etag:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "private, max-age=86400"
+        if _etag_corresponde(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    intervalo = _interpretar_range(request.headers.get("range"), tamanho)
+    if_range = request.headers.get("if-range")
+    if intervalo and if_range and if_range != etag:
+        intervalo = None
+    if intervalo is False:
+        headers["Content-Range"] = f"bytes */{tamanho}"
+        return Response(status_code=416, headers=headers)
+
+    if intervalo:
+        inicio, fim = intervalo
+        headers["Content-Range"] = f"bytes {inicio}-{fim}/{tamanho}"
+        status_code = 206
+    else:
+        inicio, fim = 0, tamanho - 1
+        status_code = 200
+    headers["Content-Length"] = str(fim - inicio + 1)
+
+    return StreamingResponse(
+        _ler_intervalo(anexo.arquivo_baixado, inicio, fim),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
+
 # Executar aplicação
 if __name__ == "__main__":
     import uvicorn
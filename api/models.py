@@ -4,7 +4,7 @@ Modelos Pydantic para a API PROJUDI v4
 """
 
 from typing import List, Optional, Literal, Dict, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime
 
 # Modelos de Request
@@ -26,10 +26,10 @@ class BuscaRequestN8N(BaseModel):
         if "parameters" in self.bodyParameters:
             for param in self.bodyParameters["parameters"]:
                 # Converter valores booleanos
-                if param.name in ["movimentacoes", "extrair_anexos", "extrair_partes_detalhadas"]:
+                if param.name in ["movimentacoes", "extrair_anexos", "extrair_partes_detalhadas", "incluir_timings"]:
                     params[param.name] = param.value.lower() in ["true", "1", "yes", "sim"]
                 # Converter valores numéricos
-                elif param.name == "limite_movimentacoes" and param.value:
+                elif param.name in ["limite_movimentacoes", "limite_anexos"] and param.value:
                     try:
                         params[param.name] = int(param.value)
                     except ValueError:
@@ -43,6 +43,7 @@ class BuscaRequestN8N(BaseModel):
             "extrair_anexos": False,
             "extrair_partes_detalhadas": False,
             "limite_movimentacoes": None,
+            "limite_anexos": None,
         }
         
         for key, default_value in defaults.items():
@@ -55,19 +56,41 @@ class BuscaRequest(BaseModel):
     tipo_busca: Literal["cpf", "nome", "processo"] = Field(..., description="Tipo de busca a ser realizada")
     valor: str = Field(..., description="Valor a ser buscado")
     limite_movimentacoes: Optional[int] = Field(default=None, description="Limite de movimentações a extrair")
-    extrair_anexos: bool = Field(default=False, description="Se deve extrair anexos")
+    extrair_anexos: bool = Field(default=False, description="Se deve listar os anexos (conteúdo sob demanda)")
+    limite_anexos: Optional[int] = Field(default=None, description="Limite de movimentações com anexo a listar")
     extrair_partes_detalhadas: bool = Field(default=False, description="Se deve extrair partes envolvidas com dados detalhados")
     movimentacoes: bool = Field(default=True, description="Se deve extrair movimentações")
     
+    # Projeção da resposta (caminhos com ponto); etapas cujos dados não serão retornados não são executadas
+    campos: Optional[List[str]] = Field(default=None, description="Campos a retornar, ex.: ['processos_detalhados.numero', 'processos_detalhados.movimentacoes']")
+    excluir: Optional[List[str]] = Field(default=None, description="Campos a omitir, ex.: ['processos_simples', 'processos_detalhados.partes_polo_ativo']")
+    
+    # Diagnóstico: tempo por etapa e por processo no campo `timings` da resposta
+    incluir_timings: bool = Field(default=False, description="Se deve incluir o detalhamento de tempo por etapa (fila, sessão, login, níveis 1/2/3) e o total de chamadas ao Playwright")
+    
     # Credenciais customizadas (opcional - usa .env como fallback)
     usuario: Optional[str] = Field(default=None, description="Usuário PROJUDI customizado")
     senha: Optional[str] = Field(default=None, description="Senha PROJUDI customizada")
     serventia: Optional[str] = Field(default=None, description="Serventia customizada")
+    
+    @field_validator("campos", "excluir", mode="before")
+    @classmethod
+    def _validar_caminhos(cls, valor):
+        """Aceita lista ou texto separado por vírgula (N8N/CSV) e rejeita campos inexistentes"""
+        if isinstance(valor, str):
+            valor = valor.split(",")
+        if isinstance(valor, list):
+            valor = [str(c).strip() for c in valor if str(c).strip()]
+        if valor:
+            from api.projecao import validar_caminhos
+            validar_caminhos(valor)
+        return valor or None
 
 class BuscaMultiplaRequest(BaseModel):
     """Request para múltiplas buscas"""
     buscas: List[BuscaRequest] = Field(..., description="Lista de buscas a serem realizadas")
     paralelo: bool = Field(default=True, description="Se deve executar em paralelo")
+    assincrono: bool = Field(default=False, description="Se deve responder imediatamente e processar em segundo plano (acompanhar em /requisicoes/{request_id})")
 
 # Modelos de Response
 class ProcessoSimples(BaseModel):
@@ -100,17 +123,35 @@ class ParteEnvolvidaResponse(BaseModel):
     oab: Optional[str] = None
 
 class AnexoResponse(BaseModel):
-    """Anexo processado"""
+    """Anexo do processo (descritor; conteúdo obtido sob demanda em url_conteudo)"""
     id_arquivo: str
     nome_arquivo: str
     tipo_arquivo: str
     tamanho_bytes: int
     movimentacao_numero: int
+    hash_conteudo: Optional[str] = None
+    url_conteudo: Optional[str] = None  # GET /processos/{numero}/anexos/{id_arquivo}
+    url_texto: Optional[str] = None  # GET /processos/{numero}/anexos/{id_arquivo}/texto
+    conteudo_extraido: Optional[str] = None
+    tamanho_conteudo: int = 0
+    metodo_extracao: Optional[str] = None
+    sucesso_processamento: bool = False
+    tempo_processamento: float = 0.0
+
+class AnexoTextoResponse(BaseModel):
+    """Texto extraído de um anexo"""
+    numero_processo: str
+    id_arquivo: str
+    nome_arquivo: str
+    tipo_arquivo: str
+    tamanho_bytes: int
+    movimentacao_numero: int
+    hash_conteudo: Optional[str] = None
     conteudo_extraido: str
     tamanho_conteudo: int
     metodo_extracao: str
     sucesso_processamento: bool
-    tempo_processamento: float
+    tempo_processamento: float = 0.0
 
 class ProcessoDetalhadoResponse(BaseModel):
     """Processo com dados detalhados"""
@@ -154,6 +195,7 @@ class BuscaResponse(BaseModel):
     
     # Metadados
     tempo_execucao: float = 0.0
+    timings: Optional[Dict[str, Any]] = None  # Preenchido quando incluir_timings=True
     timestamp: datetime = Field(default_factory=datetime.now)
     erro: Optional[str] = None
 
@@ -166,6 +208,16 @@ class BuscaMultiplaResponse(BaseModel):
     tempo_total: float
     timestamp: datetime = Field(default_factory=datetime.now)
 
+class BuscaMultiplaAceitaResponse(BaseModel):
+    """Response para múltiplas buscas aceitas para processamento em segundo plano"""
+    status: Literal["accepted"] = "accepted"
+    request_id: str
+    total_buscas: int
+    buscas_unicas: int
+    paralelismo: int
+    url_status: str
+    timestamp: datetime = Field(default_factory=datetime.now)
+
 class StatusResponse(BaseModel):
     """Status da API"""
     status: Literal["online", "offline", "maintenance"] = "online"
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Projeção de campos das respostas de busca PROJUDI API v4
+Converte `campos`/`excluir` (caminhos com ponto, ex.: "processos_detalhados.movimentacoes")
+em filtro de exclusão do Pydantic e desliga as etapas de extração cujos dados não serão retornados
+"""
+
+import dataclasses
+import types
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel
+
+from core.fluxo_busca import ParametrosBusca
+
+# Metadados mantidos mesmo quando `campos` não os menciona
+CAMPOS_SEMPRE_INCLUIDOS = {"status", "request_id", "erro"}
+
+# nome -> (subárvore ou None, é lista)
+Arvore = Dict[str, Tuple[Optional["Arvore"], bool]]
+
+def _submodelo(anotacao) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """Modelo aninhado de um campo (List[Modelo], Optional[Modelo] ou Modelo) e se é lista"""
+    origem = get_origin(anotacao)
+    if origem in (list, List):
+        modelo, _ = _submodelo(get_args(anotacao)[0])
+        return modelo, True
+    if origem in (Union, types.UnionType):
+        for argumento in get_args(anotacao):
+            modelo, lista = _submodelo(argumento)
+            if modelo:
+                return modelo, lista
+        return None, False
+    if isinstance(anotacao, type) and issubclass(anotacao, BaseModel):
+        return anotacao, False
+    return None, False
+
+def _arvore(modelo: Type[BaseModel]) -> Arvore:
+    arvore: Arvore = {}
+    for nome, campo in modelo.model_fields.items():
+        submodelo, lista = _submodelo(campo.annotation)
+        arvore[nome] = (_arvore(submodelo) if submodelo else None, lista)
+    return arvore
+
+@lru_cache(maxsize=1)
+def arvore_resposta() -> Arvore:
+    """Campos de BuscaResponse (import tardio: api.models valida caminhos com este módulo)"""
+    from api.models import BuscaResponse
+    return _arvore(BuscaResponse)
+
+def validar_caminhos(caminhos: List[str]):
+    """Garante que cada caminho existe em BuscaResponse"""
+    for caminho in caminhos:
+        arvore = arvore_resposta()
+        for parte in caminho.split("."):
+            if not arvore or parte not in arvore:
+                raise ValueError(f"Campo desconhecido: '{caminho}'")
+            arvore = arvore[parte][0]
+
+class Projecao:
+    """Campos pedidos pelo cliente para uma busca"""
+
+    def __init__(self, campos: Optional[List[str]] = None, excluir: Optional[List[str]] = None):
+        self.campos = [c.split(".") for c in campos] if campos else None
+        self.excluir = [c.split(".") for c in excluir or []]
+        self._filtro: Optional[Dict] = None
+        self._filtro_calculado = False
+
+    @classmethod
+    def da_busca(cls, busca) -> "Projecao":
+        return cls(getattr(busca, "campos", None), getattr(busca, "excluir", None))
+
+    @property
+    def ativa(self) -> bool:
+        return self.campos is not None or bool(self.excluir)
+
+    def inclui(self, caminho: str) -> bool:
+        """Se o caminho (ou parte dele) aparece na resposta"""
+        partes = caminho.split(".")
+        if any(partes[:len(e)] == e for e in self.excluir):
+            return False
+        if self.campos is None:
+            return True
+        return any(c[:len(partes)] == partes or partes[:len(c)] == c for c in self.campos)
+
+    def filtro_exclusao(self) -> Optional[Dict]:
+        """Filtro `exclude` para model_dump/model_dump_json de BuscaResponse (None = resposta completa)"""
+        if not self._filtro_calculado:
+            self._filtro = self._exclusao(arvore_resposta(), []) if self.ativa else None
+            self._filtro_calculado = True
+        return self._filtro
+
+    def filtro_processo(self) -> Optional[Dict]:
+        """Filtro de exclusão de um item de processos_detalhados"""
+        filtro = (self.filtro_exclusao() or {}).get("processos_detalhados")
+        return filtro.get("__all__") if isinstance(filtro, dict) else None
+
+    def _exclusao(self, arvore: Arvore, prefixo: List[str]) -> Optional[Dict]:
+        filtro = {}
+        for nome, (subarvore, lista) in arvore.items():
+            caminho = prefixo + [nome]
+            if not prefixo and nome in CAMPOS_SEMPRE_INCLUIDOS:
+                continue
+            if not self.inclui(".".join(caminho)):
+                filtro[nome] = True
+            elif subarvore:
+                subfiltro = self._exclusao(subarvore, caminho)
+                if subfiltro:
+                    filtro[nome] = {"__all__": subfiltro} if lista else subfiltro
+        return filtro or None
+
+    def aplicar(self, parametros: ParametrosBusca) -> ParametrosBusca:
+        """Desliga as etapas de extração que só produzem campos fora da projeção"""
+        if not self.ativa:
+            return parametros
+        extrair_anexos = parametros.extrair_anexos and (
+            self.inclui("processos_detalhados.anexos") or self.inclui("processos_detalhados.total_anexos")
+        )
+        partes_detalhadas = parametros.extrair_partes_detalhadas and any(
+            self.inclui(f"processos_detalhados.{campo}")
+            for campo in ("partes_polo_ativo", "partes_polo_passivo", "outras_partes", "total_partes")
+        )
+        # Anexos são listados a partir das movimentações
+        extrair_movimentacoes = extrair_anexos or (
+            self.inclui("processos_detalhados.movimentacoes") or
+            self.inclui("processos_detalhados.total_movimentacoes")
+        )
+        return dataclasses.replace(
+            parametros,
+            movimentacoes=parametros.movimentacoes and self.inclui("processos_detalhados"),
+            extrair_movimentacoes=parametros.extrair_movimentacoes and extrair_movimentacoes,
+            extrair_anexos=extrair_anexos,
+            extrair_partes_detalhadas=partes_detalhadas
+        )
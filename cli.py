@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+PROJUDI API v4 - CLI de lotes
+Executa buscas de um arquivo direto no motor (sessões Playwright + níveis 1/2/3),
+sem servidor HTTP, gravando um resultado JSONL por busca assim que concluída
+
+Uso:
+    python cli.py buscas.jsonl -o resultados.jsonl -c 4
+    python cli.py cpfs.txt --tipo cpf --sem-movimentacoes
+    python cli.py buscas.csv -o resultados.jsonl --retomar
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import re
+import sys
+import time
+from contextlib import aclosing
+from dataclasses import asdict, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Set, TextIO, Tuple
+
+from loguru import logger
+
+from config import settings
+from core.fluxo_busca import (
+    ParametrosBusca, EventoProcessosEncontrados, EventoProcessoDetalhado, EventoErro,
+    executar_fluxo_busca, eh_busca_por_processo, CPF_PATTERN
+)
+from core.concurrency_manager import concurrency_manager
+from core.serializacao import dumps_str
+from core.session_manager import session_manager, get_session
+from core.tracing import tracing
+from core.http_client import http_client_manager
+from nivel_2.processo import DadosProcesso
+from nivel_3.anexos import anexos_manager, AnexoInfo, AnexoProcessado
+from nivel_3.extrator_pdf import extrator_pdf
+
+CAMPOS_PARAMETROS = {f.name for f in fields(ParametrosBusca)}
+
+def _converter_valor(campo: str, valor):
+    """Converte valores vindos de CSV/TXT (strings) para o tipo do campo"""
+    if not isinstance(valor, str):
+        return valor
+    if campo in ("limite_movimentacoes", "limite_anexos"):
+        return int(valor) if valor.strip() else None
+    if campo in ("extrair_anexos", "baixar_anexos", "extrair_movimentacoes", "extrair_partes_detalhadas", "movimentacoes"):
+        return valor.strip().lower() in ("1", "true", "sim", "s", "yes")
+    return valor.strip()
+
+def _detectar_tipo(valor: str) -> str:
+    """Tipo de busca de um valor solto (linhas de arquivo .txt sem --tipo)"""
+    if re.match(CPF_PATTERN, valor):
+        return "cpf"
+    if eh_busca_por_processo(ParametrosBusca(tipo_busca="", valor=valor)):
+        return "processo"
+    return "nome"
+
+def ler_entradas(caminho: Path, padroes: Dict, tipo: Optional[str]) -> List[ParametrosBusca]:
+    """Lê buscas de JSONL, CSV (com cabeçalho) ou TXT (um valor por linha)"""
+    sufixo = caminho.suffix.lower()
+    registros: List[Dict] = []
+    with open(caminho, encoding="utf-8-sig") as f:
+        if sufixo == ".csv":
+            amostra = f.readline()
+            f.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=",;\t")
+            except csv.Error:
+                dialeto = csv.excel
+            registros = [
+                {k.strip(): v for k, v in linha.items() if k and v is not None and v.strip()}
+                for linha in csv.DictReader(f, dialect=dialeto)
+            ]
+        elif sufixo in (".jsonl", ".ndjson", ".json"):
+            for numero, linha in enumerate(f, 1):
+                if linha.strip():
+                    try:
+                        registros.append(json.loads(linha))
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"Linha {numero}: JSON inválido ({e.msg})")
+        else:
+            registros = [{"valor": linha.strip()} for linha in f if linha.strip()]
+
+    entradas = []
+    for numero, registro in enumerate(registros, 1):
+        dados = dict(padroes)
+        dados.update({k: _converter_valor(k, v) for k, v in registro.items() if k in CAMPOS_PARAMETROS})
+        if not dados.get("valor"):
+            raise ValueError(f"Registro {numero}: campo 'valor' ausente")
+        dados["tipo_busca"] = dados.get("tipo_busca") or tipo or _detectar_tipo(dados["valor"])
+        if dados["tipo_busca"] not in ("cpf", "nome", "processo"):
+            raise ValueError(f"Registro {numero}: tipo_busca inválido '{dados['tipo_busca']}'")
+        entradas.append(ParametrosBusca(**dados))
+    return entradas
+
+def indices_concluidos(saida: Path) -> Set[int]:
+    """Índices já gravados na saída (para --retomar); ignora linha final incompleta"""
+    concluidos: Set[int] = set()
+    if not saida.exists():
+        return concluidos
+    with open(saida, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                concluidos.add(json.loads(linha)["indice"])
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return concluidos
+
+def _processo_para_dict(dados: DadosProcesso, anexos: List[AnexoInfo], processados: List[AnexoProcessado]) -> Dict:
+    """Serializa os dataclasses do nível 2/3 sem o HTML bruto das movimentações"""
+    processo = asdict(dados)
+    for movimentacao in processo.get("movimentacoes") or []:
+        movimentacao.pop("html_completo", None)
+    processo["anexos"] = [asdict(a) for a in anexos]
+    if processados:
+        processo["anexos_processados"] = [asdict(a) for a in processados]
+    return processo
+
+async def executar_busca(indice: int, parametros: ParametrosBusca) -> Dict:
+    """Executa uma busca em uma sessão do pool e monta o registro de saída"""
+    inicio = time.time()
+    registro = {
+        "indice": indice,
+        "tipo_busca": parametros.tipo_busca,
+        "valor": parametros.valor,
+        "status": "success",
+        "erro": None,
+        "total_processos_encontrados": 0,
+        "processos_simples": [],
+        "processos_detalhados": []
+    }
+    try:
+        async with get_session() as session:
+            async with aclosing(executar_fluxo_busca(session, parametros)) as eventos:
+                async for evento in eventos:
+                    if isinstance(evento, EventoErro):
+                        registro["status"] = "error"
+                        registro["erro"] = evento.mensagem
+                        break
+                    if isinstance(evento, EventoProcessosEncontrados):
+                        registro["processos_simples"] = [asdict(p) for p in evento.processos]
+                        registro["total_processos_encontrados"] = len(evento.processos)
+                    elif isinstance(evento, EventoProcessoDetalhado):
+                        registro["processos_detalhados"].append(
+                            _processo_para_dict(evento.dados, evento.anexos, evento.anexos_processados)
+                        )
+    except Exception as e:
+        logger.error(f"❌ Erro na busca {indice} ({parametros.valor}): {e}")
+        registro["status"] = "error"
+        registro["erro"] = str(e)
+    registro["tempo_execucao"] = round(time.time() - inicio, 3)
+    return registro
+
+async def executar_lote(entradas: List[Tuple[int, ParametrosBusca]], saida: TextIO, concorrencia: int) -> Dict:
+    """Distribui as buscas entre N workers e grava cada resultado assim que termina"""
+    fila: asyncio.Queue = asyncio.Queue()
+    for item in entradas:
+        fila.put_nowait(item)
+
+    contadores = {"sucesso": 0, "erro": 0}
+    inicio = time.time()
+
+    async def worker():
+        while True:
+            try:
+                indice, parametros = fila.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            registro = await executar_busca(indice, parametros)
+            saida.write(dumps_str(registro) + "\n")
+            saida.flush()
+            contadores["sucesso" if registro["status"] == "success" else "erro"] += 1
+            feitos = contadores["sucesso"] + contadores["erro"]
+            logger.info(
+                f"📦 {feitos}/{len(entradas)} - busca {indice} ({parametros.valor}): "
+                f"{registro['status']} em {registro['tempo_execucao']:.1f}s"
+            )
+
+    await asyncio.gather(*(worker() for _ in range(min(concorrencia, len(entradas)))))
+    return {**contadores, "tempo_total": round(time.time() - inicio, 2)}
+
+def _argumentos(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Executa buscas PROJUDI em lote, sem o servidor HTTP"
+    )
+    parser.add_argument("entrada", type=Path, help="Arquivo .jsonl, .csv ou .txt (um valor por linha)")
+    parser.add_argument("-o", "--saida", type=Path, default=None,
+                        help="Arquivo JSONL de resultados (padrão: saída padrão)")
+    parser.add_argument("-c", "--concorrencia", type=int, default=settings.max_browsers,
+                        help=f"Buscas simultâneas, uma sessão por busca (padrão: {settings.max_browsers})")
+    parser.add_argument("--tipo", choices=["cpf", "nome", "processo"], default=None,
+                        help="Tipo de busca para registros sem tipo_busca (padrão: detectar pelo valor)")
+    parser.add_argument("--limite-movimentacoes", type=int, default=None)
+    parser.add_argument("--sem-movimentacoes", action="store_true",
+                        help="Apenas nível 1 (lista de processos)")
+    parser.add_argument("--extrair-anexos", action="store_true", help="Listar descritores de anexos")
+    parser.add_argument("--limite-anexos", type=int, default=None)
+    parser.add_argument("--baixar-anexos", action="store_true",
+                        help="Baixar e extrair o texto dos anexos listados (implica --extrair-anexos)")
+    parser.add_argument("--partes-detalhadas", action="store_true")
+    parser.add_argument("--retomar", action="store_true",
+                        help="Pular buscas já presentes no arquivo de saída")
+    parser.add_argument("--log-nivel", default="INFO")
+    return parser.parse_args(argv)
+
+async def main_async(args: argparse.Namespace) -> int:
+    padroes = {
+        "limite_movimentacoes": args.limite_movimentacoes,
+        "extrair_anexos": args.extrair_anexos or args.baixar_anexos,
+        "baixar_anexos": args.baixar_anexos,
+        "limite_anexos": args.limite_anexos,
+        "extrair_partes_detalhadas": args.partes_detalhadas,
+        "movimentacoes": not args.sem_movimentacoes
+    }
+    try:
+        entradas = list(enumerate(ler_entradas(args.entrada, padroes, args.tipo), 1))
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"❌ Entrada inválida: {e}")
+        return 2
+
+    if args.retomar and args.saida:
+        concluidos = indices_concluidos(args.saida)
+        entradas = [(i, p) for i, p in entradas if i not in concluidos]
+        logger.info(f"↩️ Retomando: {len(concluidos)} buscas já concluídas")
+
+    if not entradas:
+        logger.info("✅ Nada a processar")
+        return 0
+
+    # Processo dedicado: o pool pode usar tantos navegadores quanto a concorrência pedida
+    concorrencia = max(1, args.concorrencia)
+    settings.max_browsers = max(settings.max_browsers, concorrencia)
+    # O teto do ConcurrencyManager foi calculado na importação (min(MAX_CONCURRENT_REQUESTS, MAX_BROWSERS))
+    concurrency_manager.definir_maximo(concorrencia)
+    logger.info(f"🚀 Processando {len(entradas)} buscas com concorrência {concorrencia}")
+
+    saida = open(args.saida, "a" if args.retomar else "w", encoding="utf-8") if args.saida else sys.stdout
+    await session_manager.initialize()
+    try:
+        resumo = await executar_lote(entradas, saida, concorrencia)
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+        await session_manager.shutdown()
+        await http_client_manager.shutdown()
+        anexos_manager.limpar_arquivos_temporarios()
+        extrator_pdf.shutdown()
+        tracing.shutdown()
+
+    logger.info(
+        f"✅ Lote concluído em {resumo['tempo_total']:.1f}s: "
+        f"{resumo['sucesso']} sucesso, {resumo['erro']} erro"
+    )
+    return 0 if resumo["erro"] == 0 else 1
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _argumentos(argv)
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_nivel.upper())
+    try:
+        return asyncio.run(main_async(args))
+    except KeyboardInterrupt:
+        logger.warning("⚠️ Interrompido; use --retomar para continuar de onde parou")
+        return 130
+
+if __name__ == "__main__":
+    sys.exit(main())
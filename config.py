@@ -22,7 +22,12 @@ class Settings(BaseSettings):
     port: int = Field(default=8081, env="PORT")
     # Segurança e logging
     api_key: Optional[str] = Field(default=None, env="API_KEY")
+    admin_api_key: Optional[str] = Field(default=None, env="ADMIN_API_KEY")  # endpoints /admin (desabilitados sem ela)
     disable_access_log: bool = Field(default=False, env="DISABLE_ACCESS_LOG")
+    log_nivel: str = Field(default="INFO", env="LOG_NIVEL")  # DEBUG inclui o detalhe por linha/movimentação
+    log_niveis_modulos: str = Field(default="", env="LOG_NIVEIS_MODULOS")  # ex.: nivel_2=DEBUG,core.session_manager=WARNING
+    log_formato: str = Field(default="texto", env="LOG_FORMATO")  # texto ou json
+    log_arquivo: str = Field(default="logs/projudi_api.log", env="LOG_ARQUIVO")  # vazio = sem arquivo
     
     # Configurações do PROJUDI
     projudi_user: str = Field(default="*", env="PROJUDI_USER")
@@ -39,6 +44,10 @@ class Settings(BaseSettings):
     playwright_slow_mo: int = Field(default=0, env="PLAYWRIGHT_SLOW_MO")
     playwright_timeout: int = Field(default=60000, env="PLAYWRIGHT_TIMEOUT")  # Balanceado: 60s
     max_browsers: int = Field(default=10, env="MAX_BROWSERS")
+    # Medição de consumo das sessões e proteção de memória do host
+    sessao_monitor_intervalo: int = Field(default=30, env="SESSAO_MONITOR_INTERVALO")  # segundos
+    memoria_host_limite_percentual: float = Field(default=90.0, env="MEMORIA_HOST_LIMITE_PERCENTUAL")  # 0 = desligado
+    memoria_host_espera_segundos: int = Field(default=60, env="MEMORIA_HOST_ESPERA_SEGUNDOS")
     
     # Configurações Redis
     redis_url: str = Field(default="redis://localhost:6379", env="REDIS_URL")
@@ -49,10 +58,94 @@ class Settings(BaseSettings):
     # Configurações de arquivos
     temp_dir: str = Field(default="./temp", env="TEMP_DIR")
     downloads_dir: str = Field(default="./downloads", env="DOWNLOADS_DIR")
-    
+
+    # Configurações de download de anexos
+    anexo_max_bytes: int = Field(default=50 * 1024 * 1024, env="ANEXO_MAX_BYTES")
+    anexo_chunk_bytes: int = Field(default=256 * 1024, env="ANEXO_CHUNK_BYTES")
+    http_max_conexoes: int = Field(default=20, env="HTTP_MAX_CONEXOES")
+    anexos_workers: int = Field(default=4, env="ANEXOS_WORKERS")
+    anexos_prefetch: int = Field(default=2, env="ANEXOS_PREFETCH")
+    anexos_store_habilitado: bool = Field(default=True, env="ANEXOS_STORE_HABILITADO")
+    anexos_store_dir: str = Field(default="./anexos_store", env="ANEXOS_STORE_DIR")
+
+    # Configurações de extração de PDF
+    pdf_workers: int = Field(default=2, env="PDF_WORKERS")
+    pdf_max_paginas: int = Field(default=50, env="PDF_MAX_PAGINAS")
+    pdf_max_caracteres: int = Field(default=200000, env="PDF_MAX_CARACTERES")
+    pdf_cache_ttl: int = Field(default=86400, env="PDF_CACHE_TTL")
+
+    # Configurações de OCR (tesseract + poppler instalados localmente)
+    ocr_habilitado: bool = Field(default=True, env="OCR_HABILITADO")
+    ocr_idioma: str = Field(default="por", env="OCR_IDIOMA")
+    ocr_dpi: int = Field(default=200, env="OCR_DPI")
+    ocr_workers: int = Field(default=0, env="OCR_WORKERS")  # 0 = núcleos - 1
+    ocr_max_paginas: int = Field(default=20, env="OCR_MAX_PAGINAS")
+    ocr_max_jobs: int = Field(default=1, env="OCR_MAX_JOBS")
+    ocr_timeout_pagina: int = Field(default=120, env="OCR_TIMEOUT_PAGINA")
+
     # Configurações de processamento
     max_concurrent_requests: int = Field(default=10, env="MAX_CONCURRENT_REQUESTS")
     request_timeout: int = Field(default=300, env="REQUEST_TIMEOUT")
+    # Limite adaptativo (AIMD) entre CONCORRENCIA_MINIMA e min(MAX_CONCURRENT_REQUESTS, MAX_BROWSERS)
+    concorrencia_adaptativa: bool = Field(default=True, env="CONCORRENCIA_ADAPTATIVA")
+    concorrencia_minima: int = Field(default=1, env="CONCORRENCIA_MINIMA")
+    concorrencia_inicial: int = Field(default=0, env="CONCORRENCIA_INICIAL")  # 0 = começa no teto
+    concorrencia_latencia_alvo: float = Field(default=10.0, env="CONCORRENCIA_LATENCIA_ALVO")  # p90 das páginas (s)
+    concorrencia_fator_reducao: float = Field(default=0.5, env="CONCORRENCIA_FATOR_REDUCAO")
+    concorrencia_janela_segundos: float = Field(default=30.0, env="CONCORRENCIA_JANELA_SEGUNDOS")
+    # Limite de taxa ao PROJUDI por credencial, somando todos os nós (Redis; sem ele, por processo)
+    rate_limit_habilitado: bool = Field(default=True, env="RATE_LIMIT_HABILITADO")
+    rate_limit_navegacoes_por_minuto: float = Field(default=120.0, env="RATE_LIMIT_NAVEGACOES_POR_MINUTO")
+    rate_limit_rajada: int = Field(default=20, env="RATE_LIMIT_RAJADA")
+    rate_limit_logins_por_minuto: float = Field(default=6.0, env="RATE_LIMIT_LOGINS_POR_MINUTO")
+    rate_limit_rajada_logins: int = Field(default=2, env="RATE_LIMIT_RAJADA_LOGINS")
+    rate_limit_por_credencial: str = Field(default="", env="RATE_LIMIT_POR_CREDENCIAL")  # ex.: usuario1=30,usuario2=240
+    rate_limit_nos: int = Field(default=1, env="RATE_LIMIT_NOS")  # sem Redis, cada nó usa taxa / nós
+    busca_multipla_max_buscas: int = Field(default=200, env="BUSCA_MULTIPLA_MAX_BUSCAS")
+    busca_multipla_paralelismo: int = Field(default=0, env="BUSCA_MULTIPLA_PARALELISMO")  # 0 = capacidade do pool
+
+    # Configurações de lotes (upload CSV/JSONL)
+    lotes_dir: str = Field(default="./lotes", env="LOTES_DIR")
+    lotes_paralelismo: int = Field(default=2, env="LOTES_PARALELISMO")
+    lotes_taxa_por_minuto: int = Field(default=0, env="LOTES_TAXA_POR_MINUTO")  # 0 = sem limite
+    lotes_max_itens: int = Field(default=100000, env="LOTES_MAX_ITENS")
+
+    # Compressão de respostas (gzip; brotli se o pacote estiver instalado) e cache de processos
+    compressao_habilitada: bool = Field(default=True, env="COMPRESSAO_HABILITADA")
+    compressao_minimo_bytes: int = Field(default=1024, env="COMPRESSAO_MINIMO_BYTES")
+    compressao_nivel_gzip: int = Field(default=6, env="COMPRESSAO_NIVEL_GZIP")
+    compressao_nivel_brotli: int = Field(default=4, env="COMPRESSAO_NIVEL_BROTLI")
+    processo_cache_ttl: int = Field(default=300, env="PROCESSO_CACHE_TTL")  # GET /processos/{numero}; 0 = sem cache
+
+    # Métricas Prometheus em /metrics (requer prometheus_client)
+    metricas_habilitadas: bool = Field(default=True, env="METRICAS_HABILITADAS")
+    
+    # Buscas mais lentas que isto registram o detalhamento por etapa em nível INFO (demais em DEBUG)
+    timings_log_lento_segundos: float = Field(default=60.0, env="TIMINGS_LOG_LENTO_SEGUNDOS")
+    
+    # Local de cada chamada ao Playwright (arquivo:linha) em timings e GET /diagnostico/rpc
+    perfil_rpc_habilitado: bool = Field(default=True, env="PERFIL_RPC_HABILITADO")
+    
+    # Tracing OpenTelemetry (requer opentelemetry-api; exportador configurado se opentelemetry-sdk instalado)
+    tracing_habilitado: bool = Field(default=False, env="TRACING_HABILITADO")
+    tracing_exportador: str = Field(default="arquivo", env="TRACING_EXPORTADOR")  # otlp ou arquivo
+    tracing_endpoint: str = Field(default="", env="TRACING_ENDPOINT")  # vazio = OTEL_EXPORTER_OTLP_ENDPOINT / localhost:4318
+    tracing_arquivo: str = Field(default="./logs/spans.jsonl", env="TRACING_ARQUIVO")
+    tracing_servico: str = Field(default="projudi-api", env="TRACING_SERVICO")
+    tracing_amostragem: float = Field(default=1.0, env="TRACING_AMOSTRAGEM")  # fração de traces raiz gravados
+    
+    # Traces do Playwright (grava toda busca; mantém amostra, lentas, com erro e com fallback de movimentações)
+    playwright_trace_habilitado: bool = Field(default=False, env="PLAYWRIGHT_TRACE_HABILITADO")
+    playwright_trace_amostragem: float = Field(default=0.05, env="PLAYWRIGHT_TRACE_AMOSTRAGEM")
+    playwright_trace_lento_segundos: float = Field(default=120.0, env="PLAYWRIGHT_TRACE_LENTO_SEGUNDOS")
+    playwright_trace_screenshots: bool = Field(default=True, env="PLAYWRIGHT_TRACE_SCREENSHOTS")
+    playwright_trace_dir: str = Field(default="./traces", env="PLAYWRIGHT_TRACE_DIR")
+    playwright_trace_max_arquivos: int = Field(default=50, env="PLAYWRIGHT_TRACE_MAX_ARQUIVOS")
+    playwright_trace_max_horas: float = Field(default=72.0, env="PLAYWRIGHT_TRACE_MAX_HORAS")
+    
+    # Perfis de CPU/memória gerados pelos endpoints /admin/perfil
+    perfil_dir: str = Field(default="./perfis", env="PERFIL_DIR")
+    perfil_max_arquivos: int = Field(default=20, env="PERFIL_MAX_ARQUIVOS")
     
     class Config:
         env_file = ".env"
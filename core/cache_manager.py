@@ -9,6 +9,7 @@ from typing import Optional, Any, Dict
 from loguru import logger
 import redis.asyncio as redis
 from config import settings
+from core.metricas import metricas, nome_cache
 
 class CacheManager:
     """Gerenciador de cache com Redis"""
@@ -57,6 +58,7 @@ class CacheManager:
             
         try:
             value = await self.redis_client.get(key)
+            metricas.registrar_cache(nome_cache(key), bool(value))
             if value:
                 return json.loads(value)
             return None
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Compressão de respostas PROJUDI API v4
+Middleware ASGI que comprime respostas completas (não-streaming) com brotli ou gzip,
+conforme Accept-Encoding; streams NDJSON/SSE e arquivos passam sem alteração
+"""
+
+import asyncio
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+    BROTLI_DISPONIVEL = True
+except ImportError:
+    brotli = None
+    BROTLI_DISPONIVEL = False
+
+# Conteúdos já comprimidos ou que precisam chegar ao cliente sem buffer
+TIPOS_NAO_COMPRIMIDOS = (
+    "text/event-stream", "application/x-ndjson", "application/pdf", "application/zip",
+    "application/gzip", "image/", "audio/", "video/"
+)
+
+# Acima disso a compressão roda em thread para não bloquear o event loop
+LIMITE_COMPRESSAO_THREAD = 256 * 1024
+
+def escolher_codificacao(accept_encoding: str) -> Optional[str]:
+    """Melhor codificação aceita pelo cliente (br > gzip), respeitando q=0"""
+    aceitas = {}
+    for item in accept_encoding.lower().split(","):
+        partes = [p.strip() for p in item.split(";")]
+        if not partes[0]:
+            continue
+        q = 1.0
+        for parametro in partes[1:]:
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        aceitas[partes[0]] = q
+    curinga = aceitas.get("*", 0.0)
+    candidatas = (["br"] if BROTLI_DISPONIVEL else []) + ["gzip"]
+    melhor = max(candidatas, key=lambda c: aceitas.get(c, curinga))
+    return melhor if aceitas.get(melhor, curinga) > 0 else None
+
+def comprimir(corpo: bytes, codificacao: str, nivel_gzip: int = 6, nivel_brotli: int = 4) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=nivel_brotli)
+    return gzip.compress(corpo, compresslevel=nivel_gzip, mtime=0)
+
+class MiddlewareCompressao:
+    """Comprime respostas de corpo único maiores que `minimo_bytes`"""
+
+    def __init__(self, app: ASGIApp, minimo_bytes: int = 1024, nivel_gzip: int = 6, nivel_brotli: int = 4):
+        self.app = app
+        self.minimo_bytes = minimo_bytes
+        self.nivel_gzip = nivel_gzip
+        self.nivel_brotli = nivel_brotli
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""))
+        if not codificacao:
+            await self.app(scope, receive, send)
+            return
+
+        inicio: Optional[Message] = None
+
+        async def enviar(message: Message):
+            nonlocal inicio
+            if message["type"] == "http.response.start":
+                inicio = message  # segurar até saber se o corpo vem inteiro
+                return
+            if inicio is None:
+                await send(message)
+                return
+
+            mensagem_inicio, inicio = inicio, None
+            headers = MutableHeaders(raw=mensagem_inicio["headers"])
+            corpo = message.get("body", b"") if message["type"] == "http.response.body" else b""
+            if (message["type"] != "http.response.body" or message.get("more_body")
+                    or not self._comprimivel(mensagem_inicio["status"], headers, corpo)):
+                await send(mensagem_inicio)
+                await send(message)
+                return
+
+            if len(corpo) > LIMITE_COMPRESSAO_THREAD:
+                comprimido = await asyncio.to_thread(comprimir, corpo, codificacao, self.nivel_gzip, self.nivel_brotli)
+            else:
+                comprimido = comprimir(corpo, codificacao, self.nivel_gzip, self.nivel_brotli)
+            headers["Content-Encoding"] = codificacao
+            headers["Content-Length"] = str(len(comprimido))
+            headers.add_vary_header("Accept-Encoding")
+            await send(mensagem_inicio)
+            await send({"type": "http.response.body", "body": comprimido})
+
+        await self.app(scope, receive, enviar)
+
+    def _comprimivel(self, status: int, headers: MutableHeaders, corpo: bytes) -> bool:
+        if status < 200 or status in (204, 206, 304) or len(corpo) < self.minimo_bytes:
+            return False
+        if "content-encoding" in headers or "content-range" in headers:
+            return False
+        tipo = headers.get("content-type", "")
+        return not any(tipo.startswith(t) for t in TIPOS_NAO_COMPRIMIDOS)
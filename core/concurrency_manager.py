@@ -1,83 +1,191 @@
 #!/usr/bin/env python3
 """
 Gerenciador de Concorrência para PROJUDI API v4
+Limite adaptativo (AIMD): sobe uma vaga por janela enquanto a latência do PROJUDI está saudável
+e o limite está sendo usado; corta multiplicativamente em timeouts de navegação e respostas 5xx/429
 """
 
 import asyncio
 import time
-from typing import Optional, Callable, Any
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Callable, Any, AsyncIterator, Deque, Dict, List
 from loguru import logger
 from config import settings
+from core.metricas import metricas
 
 class ConcurrencyManager:
     """Gerenciador de concorrência e rate limiting com sistema de fila"""
-    
+
     def __init__(self):
-        self.max_concurrent = settings.max_concurrent_requests
+        # Teto: não adianta liberar mais buscas do que sessões no pool
+        self.max_concurrent = max(1, min(settings.max_concurrent_requests, settings.max_browsers))
+        self.min_concurrent = max(1, min(settings.concorrencia_minima, self.max_concurrent))
         self.request_timeout = settings.request_timeout
-        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.adaptativo = settings.concorrencia_adaptativa
+        inicial = settings.concorrencia_inicial if self.adaptativo and settings.concorrencia_inicial else self.max_concurrent
+        self.limite = float(max(self.min_concurrent, min(inicial, self.max_concurrent)))
         self.active_requests = 0
         self.total_requests = 0
         self.failed_requests = 0
-        self.queued_requests = 0
-        self.queue = asyncio.Queue()  # Fila para requests quando limite excedido
-        
+        self._fila: Deque[asyncio.Future] = deque()  # FIFO de quem aguarda vaga
+
+        # Estado do controle AIMD
+        self._latencias: List[float] = []
+        self._inicio_janela = time.monotonic()
+        self._ultima_reducao = 0.0
+        self._pico_janela = 0
+        self.latencia_p90: Optional[float] = None
+        self.aumentos = 0
+        self.reducoes = 0
+        self.congestionamentos: Dict[str, int] = {}
+
+    @property
+    def queued_requests(self) -> int:
+        return len(self._fila)
+
+    @property
+    def limite_efetivo(self) -> int:
+        return max(self.min_concurrent, int(self.limite))
+
+    async def _adquirir(self):
+        if self.active_requests < self.limite_efetivo and not self._fila:
+            self.active_requests += 1
+            self._pico_janela = max(self._pico_janela, self.active_requests)
+            return
+        futuro = asyncio.get_running_loop().create_future()
+        self._fila.append(futuro)
+        try:
+            await futuro  # a vaga é transferida por _despertar
+        except asyncio.CancelledError:
+            if futuro.done() and not futuro.cancelled():
+                self._liberar()
+            elif futuro in self._fila:
+                self._fila.remove(futuro)
+            raise
+
+    def _liberar(self):
+        self.active_requests -= 1
+        self._despertar()
+
+    def _despertar(self):
+        """Entrega vagas livres (ex.: após liberação ou aumento do limite) aos primeiros da fila"""
+        while self._fila and self.active_requests < self.limite_efetivo:
+            futuro = self._fila.popleft()
+            if not futuro.done():
+                self.active_requests += 1
+                self._pico_janela = max(self._pico_janela, self.active_requests)
+                futuro.set_result(None)
+
+    @asynccontextmanager
+    async def vaga(self) -> AsyncIterator[None]:
+        """Ocupa uma vaga do limite de concorrência enquanto o bloco executa (ex.: toda a busca)"""
+        if self._fila or self.active_requests >= self.limite_efetivo:
+            logger.info(f"🚦 Request entrando na fila. Fila atual: {self.queued_requests + 1}")
+
+        inicio_fila = time.perf_counter()
+        await self._adquirir()
+        metricas.observar_etapa("fila", time.perf_counter() - inicio_fila)
+        self.total_requests += 1
+        try:
+            yield
+        except Exception:
+            self.failed_requests += 1
+            raise
+        finally:
+            self._liberar()
+
     async def execute_with_limits(
-        self, 
-        func: Callable, 
-        *args, 
+        self,
+        func: Callable,
+        *args,
         **kwargs
     ) -> Any:
         """Executa função com limites de concorrência, timeout e sistema de fila"""
-        
-        # O semáforo já gerencia a fila automaticamente
-        # Apenas adicionamos logging para ver a fila em ação
-        if self.active_requests >= self.max_concurrent:
-            self.queued_requests += 1
-            logger.info(f"🚦 Request entrando na fila. Fila atual: {self.queued_requests}")
-            
-        async with self.semaphore:
-            # Se estava na fila, remover da contagem
-            if self.queued_requests > 0:
-                self.queued_requests -= 1
-                logger.info(f"🚀 Request saiu da fila. Fila atual: {self.queued_requests}")
-            
-            self.active_requests += 1
-            self.total_requests += 1
-            
+        async with self.vaga():
             start_time = time.time()
-            
             try:
                 # Executa com timeout
                 result = await asyncio.wait_for(
                     func(*args, **kwargs),
                     timeout=self.request_timeout
                 )
-                
+
                 execution_time = time.time() - start_time
                 logger.debug(f"✅ Request executado em {execution_time:.2f}s")
-                
+
                 return result
-                
+
             except asyncio.TimeoutError:
-                self.failed_requests += 1
                 execution_time = time.time() - start_time
                 logger.error(f"⏰ Timeout após {execution_time:.2f}s (limite: {self.request_timeout}s)")
                 raise
-                
+
             except Exception as e:
-                self.failed_requests += 1
                 execution_time = time.time() - start_time
                 logger.error(f"❌ Erro após {execution_time:.2f}s: {e}")
                 raise
-                
-            finally:
-                self.active_requests -= 1
-    
+
+    def definir_maximo(self, maximo: int):
+        """Redefine o teto (e o limite atual) após a inicialização, ex.: concorrência pedida na CLI"""
+        self.max_concurrent = max(1, maximo)
+        self.min_concurrent = min(self.min_concurrent, self.max_concurrent)
+        self.limite = float(self.max_concurrent)
+        self._despertar()
+
+    def registrar_latencia(self, segundos: float):
+        """Tempo de resposta de uma página do PROJUDI (sinal de saúde para o aumento aditivo)"""
+        self._latencias.append(segundos)
+        self._avaliar()
+
+    def registrar_congestionamento(self, motivo: str):
+        """Timeout de navegação ou resposta 5xx/429: corte multiplicativo (no máximo um por janela,
+        já que todas as sessões costumam falhar juntas quando o PROJUDI degrada)"""
+        self.congestionamentos[motivo] = self.congestionamentos.get(motivo, 0) + 1
+        metricas.registrar_congestionamento(motivo)
+        if not self.adaptativo:
+            return
+        agora = time.monotonic()
+        if agora - self._ultima_reducao < settings.concorrencia_janela_segundos:
+            return
+        anterior = self.limite_efetivo
+        self.limite = max(float(self.min_concurrent), self.limite * settings.concorrencia_fator_reducao)
+        self._ultima_reducao = agora
+        self._reiniciar_janela(agora)
+        self.reducoes += 1
+        logger.warning(f"📉 Limite de concorrência {anterior} → {self.limite_efetivo} ({motivo})")
+
+    def _reiniciar_janela(self, agora: float):
+        self._inicio_janela = agora
+        self._latencias = []
+        self._pico_janela = self.active_requests
+
+    def _avaliar(self):
+        """Ao fim de cada janela: +1 vaga se a latência ficou abaixo do alvo e o limite foi todo usado"""
+        agora = time.monotonic()
+        if not self.adaptativo or agora - self._inicio_janela < settings.concorrencia_janela_segundos:
+            return
+        latencias = sorted(self._latencias)
+        usou_limite = self._pico_janela >= self.limite_efetivo
+        self._reiniciar_janela(agora)
+        if not latencias:
+            return
+        self.latencia_p90 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.9))]
+        if self.latencia_p90 > settings.concorrencia_latencia_alvo or not usou_limite:
+            return
+        if self.limite_efetivo >= self.max_concurrent:
+            return
+        anterior = self.limite_efetivo
+        self.limite = min(float(self.max_concurrent), float(anterior + 1))
+        self.aumentos += 1
+        logger.info(f"📈 Limite de concorrência {anterior} → {self.limite_efetivo} (p90 {self.latencia_p90:.1f}s)")
+        self._despertar()
+
     def get_stats(self) -> dict:
         """Retorna estatísticas de concorrência"""
         return {
             "max_concurrent": self.max_concurrent,
+            "limite_atual": self.limite_efetivo,
             "active_requests": self.active_requests,
             "queued_requests": self.queued_requests,
             "total_requests": self.total_requests,
@@ -86,13 +194,22 @@ class ConcurrencyManager:
                 ((self.total_requests - self.failed_requests) / self.total_requests * 100)
                 if self.total_requests > 0 else 100
             ),
-            "request_timeout": self.request_timeout
+            "request_timeout": self.request_timeout,
+            "adaptativo": {
+                "habilitado": self.adaptativo,
+                "min_concurrent": self.min_concurrent,
+                "latencia_p90": round(self.latencia_p90, 3) if self.latencia_p90 is not None else None,
+                "latencia_alvo": settings.concorrencia_latencia_alvo,
+                "aumentos": self.aumentos,
+                "reducoes": self.reducoes,
+                "congestionamentos": dict(self.congestionamentos)
+            }
         }
-    
+
     def reset_stats(self):
         """Reseta estatísticas"""
         self.total_requests = 0
         self.failed_requests = 0
 
 # Instância global do gerenciador de concorrência
-concurrency_manager = ConcurrencyManager() 
\ No newline at end of file
+concurrency_manager = ConcurrencyManager()
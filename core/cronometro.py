@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cronômetro por requisição PROJUDI API v4
+Acumula a duração de cada etapa (fila, sessão, login, nível 1, cada processo, nível 3)
+e as chamadas ao Playwright (ver core.perfil_rpc) da busca em andamento, via contextvars:
+as etapas já medidas por metricas.medir_etapa entram no cronômetro ativo sem mudar os níveis
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+_cronometro_atual: ContextVar[Optional["Cronometro"]] = ContextVar("cronometro_atual", default=None)
+_processo_atual: ContextVar[Optional[str]] = ContextVar("processo_atual", default=None)
+
+# Locais de chamada ao Playwright listados no bloco timings (os mais custosos)
+LIMITE_RPC_RESUMO = 10
+
+class Cronometro:
+    """Tempos de uma busca: total por etapa e, separadamente, por processo detalhado"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas: Dict[str, float] = {}
+        self.contagens: Dict[str, int] = {}
+        self.processos: Dict[str, Dict[str, float]] = {}
+        self.chamadas_playwright = 0
+        self.tempo_playwright = 0.0
+        self.rpcs: Dict[str, List[float]] = {}  # "arquivo:linha função metodo" -> [chamadas, segundos]
+        self.marcadores: Set[str] = set()  # ex.: erro, fallback_movimentacoes (decidem a gravação de traces)
+        self.traces: List[str] = []
+
+    def registrar(self, etapa: str, segundos: float, processo: Optional[str] = None):
+        self.etapas[etapa] = self.etapas.get(etapa, 0.0) + segundos
+        self.contagens[etapa] = self.contagens.get(etapa, 0) + 1
+        if processo:
+            tempos = self.processos.setdefault(processo, {})
+            tempos[etapa] = tempos.get(etapa, 0.0) + segundos
+
+    def resumo(self) -> Dict[str, Any]:
+        """Bloco `timings` da resposta (segundos; etapas aninhadas, ex.: movimentacoes dentro de detalhe_processo)"""
+        return {
+            "total": round(time.perf_counter() - self.inicio, 3),
+            "etapas": {nome: round(segundos, 3) for nome, segundos in self.etapas.items()},
+            "execucoes": dict(self.contagens),
+            "processos": [
+                {"numero": numero, "etapas": {nome: round(s, 3) for nome, s in tempos.items()}}
+                for numero, tempos in self.processos.items()
+            ],
+            "chamadas_playwright": self.chamadas_playwright,
+            "tempo_playwright": round(self.tempo_playwright, 3),
+            "rpc_mais_custosas": [
+                {"local": local, "chamadas": int(chamadas), "tempo": round(segundos, 3)}
+                for local, (chamadas, segundos) in
+                sorted(self.rpcs.items(), key=lambda item: item[1][1], reverse=True)[:LIMITE_RPC_RESUMO]
+            ],
+            "marcadores": sorted(self.marcadores),
+            "traces_playwright": [f"/traces/{nome}" for nome in self.traces]
+        }
+
+    def registrar_rpc(self, local: str, segundos: float):
+        self.chamadas_playwright += 1
+        self.tempo_playwright += segundos
+        if local:
+            acumulado = self.rpcs.setdefault(local, [0, 0.0])
+            acumulado[0] += 1
+            acumulado[1] += segundos
+
+    def resumo_log(self) -> str:
+        """Uma linha com as etapas mais lentas, para correlacionar nos logs"""
+        principais = sorted(self.etapas.items(), key=lambda item: item[1], reverse=True)[:5]
+        etapas = ", ".join(f"{nome}={segundos:.1f}s" for nome, segundos in principais)
+        return f"{etapas} | {self.chamadas_playwright} chamadas Playwright ({self.tempo_playwright:.1f}s)"
+
+@contextmanager
+def cronometro_requisicao() -> Iterator[Cronometro]:
+    """Ativa um cronômetro para a busca em andamento (e as tarefas criadas a partir dela)"""
+    cronometro = Cronometro()
+    token = _cronometro_atual.set(cronometro)
+    try:
+        yield cronometro
+    finally:
+        try:
+            _cronometro_atual.reset(token)
+        except ValueError:
+            # Gerador de streaming encerrado em outro contexto (cliente desconectou)
+            _cronometro_atual.set(None)
+
+@contextmanager
+def cronometro_processo(numero: str) -> Iterator[None]:
+    """Atribui as etapas medidas dentro do bloco ao processo informado"""
+    token = _processo_atual.set(numero)
+    try:
+        yield
+    finally:
+        _processo_atual.reset(token)
+
+def cronometro_atual() -> Optional[Cronometro]:
+    return _cronometro_atual.get()
+
+def processo_atual() -> Optional[str]:
+    """Número do processo em detalhamento na busca atual (se houver)"""
+    return _processo_atual.get()
+
+def registrar_etapa(etapa: str, segundos: float):
+    """Soma a etapa ao cronômetro ativo (no-op fora de uma busca)"""
+    cronometro = _cronometro_atual.get()
+    if cronometro is not None:
+        cronometro.registrar(etapa, segundos, _processo_atual.get())
+
+def marcar(marcador: str):
+    """Sinaliza um evento da busca atual (ex.: fallback de movimentações)"""
+    cronometro = _cronometro_atual.get()
+    if cronometro is not None:
+        cronometro.marcadores.add(marcador)
+
+def marcadores_atuais() -> Set[str]:
+    cronometro = _cronometro_atual.get()
+    return cronometro.marcadores if cronometro is not None else set()
+
+def registrar_trace(nome: str):
+    """Trace do Playwright gravado para a busca atual"""
+    cronometro = _cronometro_atual.get()
+    if cronometro is not None:
+        cronometro.traces.append(nome)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Fluxo de busca PROJUDI API v4
+Executa os 3 níveis em uma sessão e produz eventos à medida que os dados ficam prontos
+(usado pela API, pelo streaming e pela CLI)
+"""
+
+import asyncio
+import re
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional, Union
+
+from loguru import logger
+
+from config import settings
+from core.metricas import metricas
+from core.cronometro import cronometro_processo, marcar
+from core.session_manager import Session
+from nivel_1.busca import busca_manager, TipoBusca, LoginManager, ProcessoEncontrado
+from nivel_2.processo import processo_manager, DadosProcesso
+from nivel_3.anexos import anexos_manager, AnexoInfo, AnexoProcessado
+
+@dataclass
+class ParametrosBusca:
+    """Parâmetros de uma busca, independentes do modelo HTTP"""
+    tipo_busca: str  # cpf, nome ou processo
+    valor: str
+    limite_movimentacoes: Optional[int] = None
+    extrair_anexos: bool = False
+    limite_anexos: Optional[int] = None
+    extrair_partes_detalhadas: bool = False
+    movimentacoes: bool = True  # acessar cada processo (nível 2)
+    extrair_movimentacoes: bool = True  # lista de movimentações do processo
+    baixar_anexos: bool = False  # conteúdo dos anexos listados (CLI); a API baixa sob demanda
+
+@dataclass
+class EventoProcessosEncontrados:
+    """Lista do nível 1 (processos encontrados na busca)"""
+    processos: List[ProcessoEncontrado] = field(default_factory=list)
+
+@dataclass
+class EventoProcessoDetalhado:
+    """Um processo com dados do nível 2 (e descritores de anexos do nível 3)"""
+    indice: int
+    dados: DadosProcesso
+    anexos: List[AnexoInfo] = field(default_factory=list)
+    anexos_processados: List[AnexoProcessado] = field(default_factory=list)
+
+@dataclass
+class EventoErro:
+    """Falha que encerra a busca"""
+    mensagem: str
+
+EventoBusca = Union[EventoProcessosEncontrados, EventoProcessoDetalhado, EventoErro]
+
+CPF_PATTERN = r'^\d{3}\.\d{3}\.\d{3}-\d{2}$'
+NOME_PATTERN = r'^[A-Za-zÀ-ÿ\s]+$'
+
+def eh_busca_por_processo(parametros: ParametrosBusca) -> bool:
+    """Detecta busca por processo específico (valor que não parece CPF nem nome)"""
+    return (
+        parametros.tipo_busca == "processo" or
+        (not re.match(CPF_PATTERN, parametros.valor) and
+         not re.match(NOME_PATTERN, parametros.valor) and
+         len(parametros.valor) > 10)  # Processos têm números longos
+    )
+
+async def executar_fluxo_busca(session: Session, parametros: ParametrosBusca) -> AsyncIterator[EventoBusca]:
+    """Executa a busca completa na sessão, produzindo a lista do nível 1 e cada processo detalhado assim que extraído"""
+    if eh_busca_por_processo(parametros):
+        async for evento in _fluxo_processo_especifico(session, parametros):
+            yield evento
+        return
+
+    # Para CPF e NOME, usar método normal do nível 1
+    with metricas.medir_etapa("busca_nivel1") as etapa:
+        resultado_busca = await busca_manager.executar_busca(
+            session,
+            TipoBusca(parametros.tipo_busca),
+            parametros.valor
+        )
+        if not resultado_busca.sucesso:
+            etapa.falhou()
+        etapa.anotar(cache=resultado_busca.from_cache, processos_encontrados=len(resultado_busca.processos))
+
+    if not resultado_busca.sucesso:
+        marcar("erro")
+        yield EventoErro(mensagem=resultado_busca.mensagem)
+        return
+
+    yield EventoProcessosEncontrados(processos=list(resultado_busca.processos))
+
+    # Se o resultado veio de cache, precisamos posicionar a UI na página de resultados
+    try:
+        if getattr(resultado_busca, 'from_cache', False) and resultado_busca.processos:
+            # Garantir login antes de reposicionar a UI quando o resultado vier do cache (VPS com Redis)
+            try:
+                await LoginManager.fazer_login(session)
+            except Exception as _login_err:
+                logger.warning(f"⚠️ Falha no login antes do reposicionamento pós-cache: {_login_err}")
+
+            await _refazer_busca(session, parametros, espera=1)
+    except Exception as _cache_nav_err:
+        logger.warning(f"⚠️ Não foi possível posicionar UI após cache: {_cache_nav_err}")
+
+    # Nível 2 e 3: Processar cada processo encontrado (se movimentacoes = True)
+    if not (resultado_busca.processos and parametros.movimentacoes):
+        return
+
+    for i, processo in enumerate(resultado_busca.processos):
+        try:
+            logger.info(f"📄 Processando processo {i+1}/{len(resultado_busca.processos)}: {processo.numero}")
+
+            # Etapas atribuídas ao processo no cronômetro da requisição (incluindo a re-navegação até ele)
+            with cronometro_processo(processo.numero):
+                # Para processos após o primeiro, voltar à lista
+                if i > 0:
+                    try:
+                        await _refazer_busca(session, parametros, espera=2)
+                    except Exception as nav_error:
+                        logger.warning(f"⚠️ Erro na re-navegação: {nav_error}")
+                        await asyncio.sleep(3)
+
+                # Acessar processo
+                with metricas.medir_etapa("acessar_processo") as etapa:
+                    acessou = await processo_manager.acessar_processo(session, processo)
+                    if not acessou:
+                        etapa.falhou()
+                if not acessou:
+                    continue
+
+                # Extrair dados do processo (Nível 2)
+                with metricas.medir_etapa("detalhe_processo"):
+                    dados_processo = await processo_manager.extrair_dados_processo(
+                        session,
+                        processo,
+                        parametros.limite_movimentacoes,
+                        extrair_movimentacoes=parametros.extrair_movimentacoes
+                    )
+
+                # Listar anexos se solicitado (Nível 3); o conteúdo só é baixado aqui com baixar_anexos (CLI)
+                anexos = await listar_anexos(session, dados_processo, parametros)
+                processados = await baixar_anexos(session, dados_processo, anexos, parametros)
+
+                # Se solicitado, executar extração detalhada de partes no FINAL (única forma de extrair partes)
+                await _extrair_partes_detalhadas(session, dados_processo, parametros)
+
+            yield EventoProcessoDetalhado(
+                indice=i + 1, dados=dados_processo, anexos=anexos, anexos_processados=processados
+            )
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar processo {processo.numero}: {e}")
+            continue
+
+async def _fluxo_processo_especifico(session: Session, parametros: ParametrosBusca) -> AsyncIterator[EventoBusca]:
+    """Busca direta no nível 2 para número de processo"""
+    logger.info(f"🔍 Busca por processo específico detectada: {parametros.valor}")
+
+    with cronometro_processo(parametros.valor), metricas.medir_etapa("detalhe_processo") as etapa:
+        dados_processo = await processo_manager.buscar_processo_especifico(
+            session,
+            parametros.valor,
+            parametros.limite_movimentacoes,
+            extrair_movimentacoes=parametros.extrair_movimentacoes
+        )
+        if not dados_processo:
+            etapa.falhou()
+
+    if not dados_processo:
+        marcar("erro")
+        yield EventoErro(mensagem="Processo não encontrado")
+        return
+
+    yield EventoProcessosEncontrados(processos=[
+        ProcessoEncontrado(
+            numero=dados_processo.numero,
+            classe=dados_processo.classe,
+            assunto=dados_processo.assunto,
+            id_processo="processo_direto",
+            indice=1
+        )
+    ])
+
+    # Opcional: extração detalhada de partes no final
+    with cronometro_processo(parametros.valor):
+        await _extrair_partes_detalhadas(session, dados_processo, parametros)
+        anexos = await listar_anexos(session, dados_processo, parametros)
+        processados = await baixar_anexos(session, dados_processo, anexos, parametros)
+
+    yield EventoProcessoDetalhado(indice=1, dados=dados_processo, anexos=anexos, anexos_processados=processados)
+
+async def listar_anexos(session: Session, dados_processo: DadosProcesso, parametros: ParametrosBusca) -> List[AnexoInfo]:
+    """Lista os descritores dos anexos do processo aberto na sessão"""
+    if not parametros.extrair_anexos or not dados_processo.movimentacoes:
+        return []
+
+    with metricas.medir_etapa("anexos") as etapa:
+        # Solicitar acesso aos anexos e acessar página de navegação
+        await anexos_manager.solicitar_acesso_anexos(session)
+        if not await anexos_manager.acessar_navegacao_arquivos(session):
+            etapa.falhou()
+            return []
+
+        return await anexos_manager.listar_anexos(
+            session,
+            dados_processo.movimentacoes,
+            limite=parametros.limite_anexos
+        )
+
+async def baixar_anexos(
+    session: Session,
+    dados_processo: DadosProcesso,
+    anexos: List[AnexoInfo],
+    parametros: ParametrosBusca
+) -> List[AnexoProcessado]:
+    """Baixa e extrai os anexos listados (CLI --baixar-anexos)"""
+    if not parametros.baixar_anexos or not anexos:
+        return []
+    with metricas.medir_etapa("anexos_conteudo"):
+        return await anexos_manager.baixar_anexos(session, dados_processo.movimentacoes, anexos)
+
+async def _extrair_partes_detalhadas(session: Session, dados_processo: DadosProcesso, parametros: ParametrosBusca):
+    """Extração detalhada de partes (opcional), substituindo as partes do processo"""
+    if not parametros.extrair_partes_detalhadas:
+        return
+    try:
+        logger.info("🧩 Executando extração de partes detalhada (opcional) no final do fluxo...")
+        with metricas.medir_etapa("partes"):
+            partes_det = await processo_manager.extrair_partes_detalhadas(session)
+        dados_processo.partes_polo_ativo = partes_det.get('polo_ativo', dados_processo.partes_polo_ativo)
+        dados_processo.partes_polo_passivo = partes_det.get('polo_passivo', dados_processo.partes_polo_passivo)
+        dados_processo.outras_partes = partes_det.get('outros', dados_processo.outras_partes)
+    except Exception as e:
+        logger.warning(f"⚠️ Falha na extração detalhada opcional: {e}")
+
+async def _refazer_busca(session: Session, parametros: ParametrosBusca, espera: float):
+    """Volta à página de busca e re-executa a busca por CPF/nome/processo conforme tipo"""
+    with metricas.medir_etapa("renavegacao"):
+        await session.navegar(f"{settings.projudi_base_url}/BuscaProcesso",
+                                wait_until='domcontentloaded', timeout=60000)
+        if parametros.tipo_busca == "cpf":
+            await busca_manager._buscar_por_cpf(session.page, parametros.valor)
+        elif parametros.tipo_busca == "nome":
+            await busca_manager._buscar_por_nome(session.page, parametros.valor)
+        elif parametros.tipo_busca == "processo":
+            await busca_manager._buscar_por_processo(session.page, parametros.valor)
+        await asyncio.sleep(espera)  # Aguardar estabilizar
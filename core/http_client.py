@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Clientes HTTP compartilhados para PROJUDI API v4
+"""
+
+import asyncio
+import hashlib
+import os
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import httpx
+from loguru import logger
+
+from config import settings
+from core.rate_limiter import limitador_taxa
+
+MAX_REDIRECIONAMENTOS = 10
+
+class DownloadExcedeuLimite(Exception):
+    """Download maior que o limite configurado"""
+
+@dataclass
+class ResultadoDownload:
+    """Arquivo baixado em streaming"""
+    caminho: str
+    tamanho_bytes: int
+    hash_conteudo: str
+    content_type: str = ""
+
+class HttpClientManager:
+    """Mantém um httpx.AsyncClient com pool de conexões por credencial (login PROJUDI da sessão)"""
+
+    def __init__(self):
+        self._clientes: Dict[str, httpx.AsyncClient] = {}
+        self._lock = asyncio.Lock()
+        self.max_bytes = settings.anexo_max_bytes
+        self.chunk_size = settings.anexo_chunk_bytes
+
+    async def get_client(self, credencial: str) -> httpx.AsyncClient:
+        """Obtém (ou cria) o cliente compartilhado da credencial"""
+        cliente = self._clientes.get(credencial)
+        if cliente and not cliente.is_closed:
+            return cliente
+
+        async with self._lock:
+            cliente = self._clientes.get(credencial)
+            if cliente is None or cliente.is_closed:
+                cliente = httpx.AsyncClient(
+                    timeout=httpx.Timeout(30.0, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=settings.http_max_conexoes,
+                        max_keepalive_connections=settings.http_max_conexoes
+                    ),
+                    # Redirecionamentos seguidos em _abrir, com o cookie jar de cada download
+                    follow_redirects=False,
+                    # Cookies vêm de cada sessão do navegador; o cliente não guarda Set-Cookie
+                    cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+                )
+                self._clientes[credencial] = cliente
+                logger.info(f"🌐 Cliente HTTP compartilhado criado para credencial {credencial}")
+            return cliente
+
+    @staticmethod
+    def _cookie_jar(cookies: List[Dict[str, Any]]) -> httpx.Cookies:
+        """Cookies do contexto do navegador (context.cookies()) com domínio e caminho de cada um"""
+        jar = httpx.Cookies()
+        for cookie in cookies:
+            jar.set(cookie["name"], cookie["value"], domain=cookie.get("domain", ""), path=cookie.get("path", "/"))
+        return jar
+
+    @staticmethod
+    async def _abrir(cliente: httpx.AsyncClient, url: str, jar: httpx.Cookies) -> httpx.Response:
+        """GET em streaming seguindo redirecionamentos; o Cookie de cada salto vem do jar do download
+        (o httpx descarta o cabeçalho Cookie ao redirecionar e o jar do cliente é compartilhado)"""
+        request = cliente.build_request("GET", url)
+        for _ in range(MAX_REDIRECIONAMENTOS + 1):
+            jar.set_cookie_header(request)
+            response = await cliente.send(request, stream=True)
+            if not response.is_redirect:
+                return response
+            jar.extract_cookies(response)
+            request = response.next_request
+            await response.aclose()
+        raise httpx.TooManyRedirects(f"Mais de {MAX_REDIRECIONAMENTOS} redirecionamentos", request=request)
+
+    async def baixar_para_arquivo(
+        self,
+        url: str,
+        destino: str,
+        credencial: str,
+        cookies: Optional[List[Dict[str, Any]]] = None,
+        max_bytes: Optional[int] = None
+    ) -> ResultadoDownload:
+        """Baixa em streaming para o disco, com limite de tamanho e escrita fora do event loop"""
+        cliente = await self.get_client(credencial)
+        await limitador_taxa.aguardar("navegacao", credencial)
+        limite = max_bytes or self.max_bytes
+        temporario = f"{destino}.part"
+        sha256 = hashlib.sha256()
+        tamanho = 0
+
+        response = await self._abrir(cliente, url, self._cookie_jar(cookies or []))
+        try:
+            response.raise_for_status()
+
+            tamanho_declarado = int(response.headers.get("content-length") or 0)
+            if tamanho_declarado > limite:
+                raise DownloadExcedeuLimite(f"{tamanho_declarado} bytes (limite {limite})")
+
+            arquivo = await asyncio.to_thread(open, temporario, 'wb')
+            try:
+                async for bloco in response.aiter_bytes(self.chunk_size):
+                    tamanho += len(bloco)
+                    if tamanho > limite:
+                        raise DownloadExcedeuLimite(f"mais de {limite} bytes")
+                    sha256.update(bloco)
+                    await asyncio.to_thread(arquivo.write, bloco)
+            except BaseException:
+                await asyncio.to_thread(arquivo.close)
+                await asyncio.to_thread(self._remover, temporario)
+                raise
+            await asyncio.to_thread(arquivo.close)
+        finally:
+            await response.aclose()
+
+        await asyncio.to_thread(os.replace, temporario, destino)
+        return ResultadoDownload(
+            caminho=destino,
+            tamanho_bytes=tamanho,
+            hash_conteudo=sha256.hexdigest(),
+            content_type=response.headers.get("content-type", "")
+        )
+
+    @staticmethod
+    def _remover(caminho: str):
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+    async def shutdown(self):
+        """Fecha todos os clientes"""
+        for cliente in list(self._clientes.values()):
+            try:
+                await cliente.aclose()
+            except Exception as e:
+                logger.warning(f"⚠️ Erro ao fechar cliente HTTP: {e}")
+        self._clientes.clear()
+        logger.info("🔄 Clientes HTTP finalizados")
+
+# Instância global dos clientes HTTP
+http_client_manager = HttpClientManager()
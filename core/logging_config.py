@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Configuração de logging PROJUDI API v4
+Sinks com escrita em thread de fundo (enqueue), formato texto ou JSON (uma linha por registro)
+com o request_id da busca em andamento e o trace_id, e nível por módulo (LOG_NIVEIS_MODULOS)
+"""
+
+import sys
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from loguru import logger
+
+from config import settings
+from core.serializacao import dumps_str
+from core.tracing import tracing
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_configurado = False
+
+FORMATO_TEXTO = (
+    "{time:YYYY-MM-DD HH:mm:ss} | {level} | {extra[request_id]} | {name}:{function}:{line} | {message}"
+)
+FORMATO_CONSOLE = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | "
+    "{extra[request_id]} | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+
+@contextmanager
+def contexto_requisicao(request_id: str) -> Iterator[None]:
+    """Logs emitidos dentro do bloco (e das tarefas criadas nele) levam o request_id"""
+    token = _request_id.set(request_id)
+    try:
+        yield
+    finally:
+        try:
+            _request_id.reset(token)
+        except ValueError:
+            # Gerador de streaming encerrado em outro contexto (cliente desconectou)
+            _request_id.set(None)
+
+def request_id_atual() -> Optional[str]:
+    return _request_id.get()
+
+def _patcher(record):
+    extra = record["extra"]
+    extra.setdefault("request_id", _request_id.get() or "-")
+    if tracing.habilitado:
+        extra.setdefault("trace_id", tracing.trace_id_atual())
+
+def _formato_json(record) -> str:
+    registro = {
+        "ts": record["time"].isoformat(),
+        "nivel": record["level"].name,
+        "modulo": record["name"],
+        "funcao": record["function"],
+        "linha": record["line"],
+        "mensagem": record["message"],
+        **{chave: valor for chave, valor in record["extra"].items() if chave != "_json" and valor not in ("", "-")}
+    }
+    if record["exception"] is not None:
+        tipo, valor, tb = record["exception"]
+        registro["excecao"] = "".join(traceback.format_exception(tipo, valor, tb))
+    # O texto já serializado vai para a fila; o disco é escrito pela thread do sink
+    record["extra"]["_json"] = dumps_str(registro)
+    return "{extra[_json]}\n"
+
+def niveis_por_modulo() -> Dict[str, str]:
+    """Filtro do loguru: "" é o nível geral; "nivel_2=DEBUG,core.session_manager=WARNING" ajusta módulos"""
+    niveis = {"": settings.log_nivel.upper()}
+    for item in settings.log_niveis_modulos.split(","):
+        modulo, _, nivel = item.strip().partition("=")
+        if modulo and nivel:
+            niveis[modulo.strip()] = nivel.strip().upper()
+    return niveis
+
+def configurar_logging():
+    """Substitui o sink padrão (síncrono) pelos sinks da API; chamadas repetidas não duplicam sinks"""
+    global _configurado
+    if _configurado:
+        return
+    _configurado = True
+
+    niveis = niveis_por_modulo()
+    nivel_minimo = min(logger.level(nivel).no for nivel in niveis.values())
+    json = settings.log_formato == "json"
+
+    logger.remove()
+    logger.configure(patcher=_patcher)
+    logger.add(
+        sys.stderr,
+        level=nivel_minimo,
+        filter=niveis,
+        format=_formato_json if json else FORMATO_CONSOLE,
+        colorize=not json and sys.stderr.isatty(),
+        enqueue=True
+    )
+    if settings.log_arquivo:
+        logger.add(
+            settings.log_arquivo,
+            rotation="1 day",
+            retention="30 days",
+            level=nivel_minimo,
+            filter=niveis,
+            format=_formato_json if json else FORMATO_TEXTO,
+            encoding="utf-8",
+            enqueue=True
+        )
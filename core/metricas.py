@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Métricas Prometheus PROJUDI API v4
+Histogramas de latência por etapa (login, busca, processo, movimentações, partes, anexos),
+gauges do pool de sessões, contadores de cache e de respostas HTTP do PROJUDI
+(requer prometheus_client; sem ele as chamadas viram no-op)
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Tuple
+
+from loguru import logger
+
+from config import settings
+from core.cronometro import processo_atual, registrar_etapa
+from core.tracing import tracing
+
+try:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+    )
+    PROMETHEUS_DISPONIVEL = True
+except ImportError:
+    PROMETHEUS_DISPONIVEL = False
+
+# Etapas levam de décimos de segundo (parsing) a minutos (busca com muitos processos)
+BUCKETS_SEGUNDOS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# Prefixos das chaves do cache_manager -> nome do cache nas métricas
+PREFIXOS_CACHE = ("login_status", "busca", "pdf_texto", "pdf_ocr", "processo")
+
+def nome_cache(chave: str) -> str:
+    return next((p for p in PREFIXOS_CACHE if chave.startswith(p)), "outro")
+
+class Etapa:
+    """Etapa em medição; o chamador pode marcar falha sem lançar exceção"""
+    __slots__ = ("nome", "resultado", "inicio", "span")
+
+    def __init__(self, nome: str, span=None):
+        self.nome = nome
+        self.resultado = "sucesso"
+        self.inicio = time.perf_counter()
+        self.span = span
+
+    def falhou(self, resultado: str = "falha"):
+        self.resultado = resultado
+        tracing.marcar_falha(self.span, resultado)
+
+    def anotar(self, **atributos):
+        """Atributos do span da etapa (prefixados com projudi.)"""
+        if self.span is not None:
+            self.span.set_attributes({f"projudi.{k}": v for k, v in atributos.items() if v is not None})
+
+class Metricas:
+    """Registro de métricas da API"""
+
+    def __init__(self):
+        self.habilitado = settings.metricas_habilitadas and PROMETHEUS_DISPONIVEL
+        if settings.metricas_habilitadas and not PROMETHEUS_DISPONIVEL:
+            logger.info("📊 prometheus_client não instalado; /metrics desabilitado")
+        if not self.habilitado:
+            return
+
+        self.registro = CollectorRegistry()
+        self.etapa_segundos = Histogram(
+            "projudi_etapa_segundos", "Duração de cada etapa da busca",
+            ["etapa", "resultado"], buckets=BUCKETS_SEGUNDOS, registry=self.registro
+        )
+        self.busca_segundos = Histogram(
+            "projudi_busca_segundos", "Duração total de uma busca",
+            ["tipo_busca", "resultado"], buckets=BUCKETS_SEGUNDOS, registry=self.registro
+        )
+        self.respostas_projudi = Counter(
+            "projudi_respostas_http_total", "Respostas HTTP recebidas do PROJUDI",
+            ["status"], registry=self.registro
+        )
+        self.cache_consultas = Counter(
+            "projudi_cache_consultas_total", "Consultas aos caches (acerto/falha)",
+            ["cache", "resultado"], registry=self.registro
+        )
+        self.sessoes = Gauge(
+            "projudi_sessoes", "Sessões Playwright por estado",
+            ["estado"], registry=self.registro
+        )
+        self.requisicoes_ativas = Gauge(
+            "projudi_requisicoes_ativas", "Requisições em execução no ConcurrencyManager",
+            registry=self.registro
+        )
+        self.fila_requisicoes = Gauge(
+            "projudi_fila_requisicoes", "Requisições aguardando vaga no ConcurrencyManager",
+            registry=self.registro
+        )
+        self.cache_taxa_acerto = Gauge(
+            "projudi_cache_taxa_acerto", "Taxa de acerto acumulada por cache (0-1)",
+            ["cache"], registry=self.registro
+        )
+        self.esperas_memoria = Counter(
+            "projudi_esperas_memoria_total", "Criações de sessão que aguardaram a memória do host (liberada, expirada)",
+            ["resultado"], registry=self.registro
+        )
+        self.concorrencia_limite = Gauge(
+            "projudi_concorrencia_limite", "Limite adaptativo de buscas simultâneas",
+            registry=self.registro
+        )
+        self.congestionamentos = Counter(
+            "projudi_congestionamentos_total", "Sinais de congestionamento do PROJUDI (timeout, http_5xx, http_429)",
+            ["motivo"], registry=self.registro
+        )
+        self.espera_taxa = Histogram(
+            "projudi_rate_limit_espera_segundos", "Espera pelo limite de taxa por navegação/login",
+            ["tipo", "origem"], buckets=(0, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60), registry=self.registro
+        )
+        self.memoria_host = Gauge(
+            "projudi_memoria_host_percentual", "Memória usada do host/contêiner (%)",
+            registry=self.registro
+        )
+        self._cache_totais: Dict[Tuple[str, str], int] = {}
+
+    @contextmanager
+    def medir_etapa(self, nome: str) -> Iterator[Etapa]:
+        """Mede a duração de uma etapa (histograma, cronômetro da requisição e span); exceções contam como 'erro'"""
+        with tracing.span(nome, {"projudi.processo": processo_atual()}) as span:
+            etapa = Etapa(nome, span)
+            try:
+                yield etapa
+            except BaseException:
+                etapa.resultado = "erro"
+                raise
+            finally:
+                self.observar_etapa(nome, time.perf_counter() - etapa.inicio, etapa.resultado)
+
+    def observar_etapa(self, nome: str, segundos: float, resultado: str = "sucesso"):
+        """Registra uma duração já medida (histograma e cronômetro da requisição em andamento)"""
+        registrar_etapa(nome, segundos)
+        if self.habilitado:
+            self.etapa_segundos.labels(nome, resultado).observe(segundos)
+
+    def registrar_busca(self, tipo_busca: str, resultado: str, segundos: float):
+        if self.habilitado:
+            self.busca_segundos.labels(tipo_busca, resultado).observe(segundos)
+
+    def registrar_resposta_projudi(self, status: int):
+        if self.habilitado:
+            self.respostas_projudi.labels(str(status)).inc()
+
+    def registrar_cache(self, cache: str, acerto: bool):
+        if not self.habilitado:
+            return
+        resultado = "acerto" if acerto else "falha"
+        self.cache_consultas.labels(cache, resultado).inc()
+        self._cache_totais[(cache, resultado)] = self._cache_totais.get((cache, resultado), 0) + 1
+
+    def registrar_congestionamento(self, motivo: str):
+        if self.habilitado:
+            self.congestionamentos.labels(motivo).inc()
+
+    def registrar_espera_taxa(self, tipo: str, origem: str, segundos: float):
+        if self.habilitado:
+            self.espera_taxa.labels(tipo, origem).observe(segundos)
+
+    def registrar_espera_memoria(self, resultado: str):
+        if self.habilitado:
+            self.esperas_memoria.labels(resultado).inc()
+
+    def atualizar_memoria_host(self, percentual: float):
+        if self.habilitado:
+            self.memoria_host.set(percentual)
+
+    def atualizar_pool(self, stats_sessoes: Dict, stats_concorrencia: Dict):
+        """Gauges lidos no momento da coleta (estado atual do pool e da fila)"""
+        if not self.habilitado:
+            return
+        self.sessoes.labels("ocupada").set(stats_sessoes.get("busy_sessions", 0))
+        self.sessoes.labels("livre").set(stats_sessoes.get("available_sessions", 0))
+        self.sessoes.labels("criando").set(stats_sessoes.get("creating_sessions", 0))
+        self.requisicoes_ativas.set(stats_concorrencia.get("active_requests", 0))
+        self.fila_requisicoes.set(stats_concorrencia.get("queued_requests", 0))
+        self.concorrencia_limite.set(stats_concorrencia.get("limite_atual", 0))
+        for cache in {c for c, _ in self._cache_totais}:
+            acertos = self._cache_totais.get((cache, "acerto"), 0)
+            total = acertos + self._cache_totais.get((cache, "falha"), 0)
+            self.cache_taxa_acerto.labels(cache).set(acertos / total if total else 0)
+
+    def gerar(self) -> Tuple[bytes, str]:
+        """Texto no formato de exposição do Prometheus"""
+        return generate_latest(self.registro), CONTENT_TYPE_LATEST
+
+# Instância global de métricas
+metricas = Metricas()
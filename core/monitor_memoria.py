@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Monitor de memória PROJUDI API v4
+Consumo de cada sessão (RSS do navegador e renderers via psutil, heap JS via CDP, navegações)
+e memória do host/contêiner (cgroup quando houver): novos navegadores esperam a memória baixar
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import settings
+from core.cronometro import registrar_etapa
+from core.metricas import metricas
+from core.perfilador import PSUTIL_DISPONIVEL, processos_por_sessao, rss_total
+
+if PSUTIL_DISPONIVEL:
+    import psutil
+
+CGROUP = Path("/sys/fs/cgroup")
+
+def _ler_inteiro(caminho: Path) -> Optional[int]:
+    try:
+        valor = caminho.read_text().strip()
+    except OSError:
+        return None
+    return int(valor) if valor.isdigit() else None
+
+def _memoria_cgroup() -> Optional[Dict[str, int]]:
+    """Limite e uso do contêiner (cgroup v2 ou v1); None fora de contêiner ou sem limite"""
+    limite = _ler_inteiro(CGROUP / "memory.max")
+    if limite is not None:
+        uso = _ler_inteiro(CGROUP / "memory.current")
+        estatisticas = CGROUP / "memory.stat"
+    else:
+        limite = _ler_inteiro(CGROUP / "memory" / "memory.limit_in_bytes")
+        uso = _ler_inteiro(CGROUP / "memory" / "memory.usage_in_bytes")
+        estatisticas = CGROUP / "memory" / "memory.stat"
+        # v1 sem limite informa um valor próximo de 2^63
+        if limite is not None and limite >= 1 << 60:
+            limite = None
+    if not limite or uso is None:
+        return None
+    # Cache de arquivos inativo é devolvido pelo kernel antes de um OOM
+    try:
+        for linha in estatisticas.read_text().splitlines():
+            chave, _, valor = linha.partition(" ")
+            if chave in ("inactive_file", "total_inactive_file"):
+                uso -= int(valor)
+                break
+    except (OSError, ValueError):
+        pass
+    return {"total_bytes": limite, "usado_bytes": max(uso, 0)}
+
+class MonitorMemoria:
+    """Mede as sessões e protege a memória do host"""
+
+    def __init__(self):
+        self.esperas = 0
+        self.recusadas = 0
+        self.host: Optional[Dict] = None
+        if settings.memoria_host_limite_percentual and not PSUTIL_DISPONIVEL and _memoria_cgroup() is None:
+            logger.info("🧠 psutil não instalado e sem limite de cgroup; proteção de memória do host desabilitada")
+
+    def memoria_host(self) -> Optional[Dict]:
+        """Uso de memória do contêiner (se limitado) ou do host (requer psutil)"""
+        memoria = _memoria_cgroup()
+        origem = "cgroup"
+        if memoria is None:
+            if not PSUTIL_DISPONIVEL:
+                return None
+            virtual = psutil.virtual_memory()
+            memoria = {"total_bytes": virtual.total, "usado_bytes": virtual.total - virtual.available}
+            origem = "host"
+        self.host = {
+            **memoria,
+            "origem": origem,
+            "percentual": round(memoria["usado_bytes"] / memoria["total_bytes"] * 100, 1)
+        }
+        metricas.atualizar_memoria_host(self.host["percentual"])
+        return self.host
+
+    def host_no_limite(self) -> bool:
+        """True quando abrir outro navegador arriscaria um OOM"""
+        if not settings.memoria_host_limite_percentual:
+            return False
+        host = self.memoria_host()
+        return host is not None and host["percentual"] >= settings.memoria_host_limite_percentual
+
+    async def aguardar_memoria_livre(self) -> bool:
+        """Espera (até MEMORIA_HOST_ESPERA_SEGUNDOS) a memória ficar abaixo do limite; False se não ficou"""
+        if not self.host_no_limite():
+            return True
+        self.esperas += 1
+        logger.warning(f"⚠️ Memória em {self.host['percentual']}%, aguardando para criar sessão")
+        inicio = time.monotonic()
+        liberada = False
+        while time.monotonic() - inicio < settings.memoria_host_espera_segundos:
+            await asyncio.sleep(1)
+            if not self.host_no_limite():
+                liberada = True
+                break
+        if not liberada:
+            self.recusadas += 1
+        metricas.registrar_espera_memoria("liberada" if liberada else "expirada")
+        registrar_etapa("memoria_host", time.monotonic() - inicio)
+        return liberada
+
+    async def medir(self, sessoes: List) -> None:
+        """Atualiza `session.recursos` de cada sessão (RSS em uma varredura de processos, heap JS por CDP)"""
+        por_sessao = await asyncio.to_thread(self._rss_por_sessao) if PSUTIL_DISPONIVEL else {}
+        for session in sessoes:
+            recursos = {"navegacoes": session.navegacoes, "medido_em": datetime.now().isoformat()}
+            if session.id in por_sessao:
+                recursos["rss_bytes"] = por_sessao[session.id]
+            heap = await self._heap_js(session)
+            if heap is not None:
+                recursos["heap_js_bytes"] = heap
+            session.recursos = recursos
+
+    @staticmethod
+    def _rss_por_sessao() -> Dict[str, int]:
+        return {session_id: rss_total(processos) for session_id, processos in processos_por_sessao().items()}
+
+    @staticmethod
+    async def _heap_js(session) -> Optional[int]:
+        if session.cdp is None:
+            return None
+        try:
+            uso = await asyncio.wait_for(session.cdp.send("Runtime.getHeapUsage"), timeout=5)
+            return int(uso["usedSize"])
+        except Exception as e:
+            logger.debug(f"Heap JS indisponível na sessão {session.id}: {e}")
+            return None
+
+    def get_stats(self, sessoes: Dict) -> Dict:
+        return {
+            "host": self.host,
+            "limite_percentual": settings.memoria_host_limite_percentual,
+            "espera_segundos": settings.memoria_host_espera_segundos,
+            "esperas": self.esperas,
+            "recusadas": self.recusadas,
+            "sessoes": {
+                session_id: {**session.recursos, "navegacoes": session.navegacoes}
+                for session_id, session in sessoes.items()
+            }
+        }
+
+# Instância global do monitor de memória
+monitor_memoria = MonitorMemoria()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Perfil de chamadas ao navegador PROJUDI API v4
+Proxy de Page/ElementHandle/Locator que conta e cronometra cada chamada aguardada ao Playwright
+(uma ida e volta ao navegador) por local de chamada (arquivo:linha função método),
+acumulando na busca atual (bloco timings) e em um relatório global para ranquear os trechos mais "tagarelas"
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import Frame, FrameLocator, JSHandle, Locator, TimeoutError as PlaywrightTimeoutError
+
+from config import settings
+from core.concurrency_manager import concurrency_manager
+from core.cronometro import Cronometro, cronometro_atual
+
+# Timeouts nestes métodos indicam PROJUDI lento (os de wait_for_selector e wait_for_load_state costumam ser
+# sondagens curtas de elementos opcionais ou de networkidle, que expiram de propósito)
+METODOS_NAVEGACAO = frozenset({"goto", "reload", "wait_for_navigation"})
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@lru_cache(maxsize=512)
+def _caminho_relativo(arquivo: str) -> str:
+    return os.path.relpath(arquivo, RAIZ_PROJETO) if arquivo.startswith(RAIZ_PROJETO) else os.path.basename(arquivo)
+
+# Módulos que só repassam chamadas ao Playwright (ex.: Session.navegar); o local é quem os chamou
+MODULOS_INTERMEDIARIOS = frozenset({__name__, "core.session_manager"})
+
+def _local_chamada() -> str:
+    """Primeiro frame fora dos intermediários (o código do projeto que chamou o Playwright)"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get("__name__") in MODULOS_INTERMEDIARIOS:
+        frame = frame.f_back
+    if frame is None:
+        return ""
+    return f"{_caminho_relativo(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+class PerfilRPC:
+    """Acumulado global de chamadas por (local, método)"""
+
+    def __init__(self):
+        self.habilitado = settings.perfil_rpc_habilitado
+        self.locais: Dict[Tuple[str, str], List[float]] = {}  # -> [chamadas, segundos, máximo]
+        self.desde = datetime.now()
+
+    def registrar(self, local: str, metodo: str, segundos: float, cronometro: Optional[Cronometro]):
+        chave = f"{local} {metodo}" if local else ""
+        if cronometro is not None:
+            cronometro.registrar_rpc(chave, segundos)
+        if not local:
+            return
+        acumulado = self.locais.get((local, metodo))
+        if acumulado is None:
+            self.locais[(local, metodo)] = [1, segundos, segundos]
+        else:
+            acumulado[0] += 1
+            acumulado[1] += segundos
+            acumulado[2] = max(acumulado[2], segundos)
+
+    def relatorio(self, ordenar: str = "tempo", agrupar: str = "linha", limite: int = 50) -> Dict[str, Any]:
+        """Locais de chamada ranqueados por tempo total ou número de chamadas
+        (agrupar="funcao" soma as linhas de uma mesma função)"""
+        grupos: Dict[Tuple[str, str], List[float]] = {}
+        for (local, metodo), (chamadas, segundos, maximo) in self.locais.items():
+            if agrupar == "funcao":
+                arquivo_linha, _, funcao = local.partition(" ")
+                chave = (f"{arquivo_linha.rsplit(':', 1)[0]} {funcao}", "*")
+            else:
+                chave = (local, metodo)
+            grupo = grupos.setdefault(chave, [0, 0.0, 0.0])
+            grupo[0] += chamadas
+            grupo[1] += segundos
+            grupo[2] = max(grupo[2], maximo)
+
+        total_chamadas = sum(g[0] for g in grupos.values())
+        tempo_total = sum(g[1] for g in grupos.values())
+        indice = 0 if ordenar == "chamadas" else 1
+        ordenados = sorted(grupos.items(), key=lambda item: item[1][indice], reverse=True)[:limite]
+        return {
+            "desde": self.desde.isoformat(),
+            "total_chamadas": int(total_chamadas),
+            "tempo_total": round(tempo_total, 3),
+            "locais": [
+                {
+                    "local": local,
+                    "metodo": metodo,
+                    "chamadas": int(chamadas),
+                    "tempo_total": round(segundos, 3),
+                    "tempo_medio_ms": round(segundos / chamadas * 1000, 2) if chamadas else 0,
+                    "tempo_maximo_ms": round(maximo * 1000, 2),
+                    "percentual_tempo": round(segundos / tempo_total * 100, 1) if tempo_total else 0
+                }
+                for (local, metodo), (chamadas, segundos, maximo) in ordenados
+            ]
+        }
+
+    def limpar(self):
+        self.locais.clear()
+        self.desde = datetime.now()
+
+# Instância global do perfil de chamadas
+perfil_rpc = PerfilRPC()
+
+# Objetos devolvidos pela página que também são instrumentados (query_selector, locator, frames)
+TIPOS_INSTRUMENTADOS = (JSHandle, Locator, Frame, FrameLocator)
+
+def _desembrulhar(valor: Any) -> Any:
+    """O Playwright só aceita os próprios objetos como argumento (ex.: evaluate com ElementHandle)"""
+    if isinstance(valor, Instrumentado):
+        return object.__getattribute__(valor, "_alvo")
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_desembrulhar(v) for v in valor)
+    return valor
+
+def _embrulhar(valor: Any) -> Any:
+    if isinstance(valor, TIPOS_INSTRUMENTADOS):
+        return Instrumentado(valor)
+    if isinstance(valor, list) and valor and isinstance(valor[0], TIPOS_INSTRUMENTADOS):
+        return [Instrumentado(v) for v in valor]
+    return valor
+
+class Instrumentado:
+    """Proxy de Page/ElementHandle/Locator; chamadas aguardadas são contadas e cronometradas"""
+    __slots__ = ("_alvo",)
+
+    def __init__(self, alvo: Any):
+        object.__setattr__(self, "_alvo", alvo)
+
+    def __getattr__(self, nome: str) -> Any:
+        atributo = getattr(object.__getattribute__(self, "_alvo"), nome)
+        if nome.startswith("_"):
+            return atributo
+        if not callable(atributo):
+            # Propriedades como locator.first e page.frames
+            return _embrulhar(atributo)
+
+        def chamada(*args, **kwargs):
+            resultado = atributo(*_desembrulhar(args), **{k: _desembrulhar(v) for k, v in kwargs.items()})
+            if asyncio.iscoroutine(resultado):
+                local = _local_chamada() if perfil_rpc.habilitado else ""
+                return _aguardar(resultado, nome, local)
+            return _embrulhar(resultado)
+
+        return chamada
+
+    def __setattr__(self, nome: str, valor: Any):
+        setattr(object.__getattribute__(self, "_alvo"), nome, valor)
+
+    def __repr__(self) -> str:
+        return repr(object.__getattribute__(self, "_alvo"))
+
+async def _aguardar(corrotina, metodo: str, local: str) -> Any:
+    inicio = time.perf_counter()
+    try:
+        return _embrulhar(await corrotina)
+    except PlaywrightTimeoutError:
+        if metodo in METODOS_NAVEGACAO:
+            concurrency_manager.registrar_congestionamento("timeout")
+        raise
+    finally:
+        perfil_rpc.registrar(local, metodo, time.perf_counter() - inicio, cronometro_atual())
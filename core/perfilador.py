@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Perfilador sob demanda PROJUDI API v4
+Amostragem de CPU (pilhas de todas as threads via sys._current_frames, formato "collapsed"
+para flamegraph/speedscope), top de alocações e diferenças com tracemalloc e memória (RSS)
+do processo e dos Chromium de cada sessão (requer psutil), sem reiniciar o worker
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import settings
+
+try:
+    import psutil
+    PSUTIL_DISPONIVEL = True
+except ImportError:
+    PSUTIL_DISPONIVEL = False
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOME_ARQUIVO = re.compile(r"^[\w.-]+\.(folded|txt)$")
+
+# Argumento sem efeito no Chromium que identifica o processo do navegador de cada sessão
+MARCADOR_SESSAO = "--projudi-sessao="
+
+class PerfilEmAndamento(Exception):
+    """Já existe uma amostragem de CPU em execução"""
+
+def _nome_quadro(frame) -> str:
+    arquivo = frame.f_code.co_filename
+    if arquivo.startswith(RAIZ_PROJETO):
+        arquivo = os.path.relpath(arquivo, RAIZ_PROJETO)
+    else:
+        arquivo = os.path.basename(arquivo)
+    return f"{arquivo}:{frame.f_code.co_name}"
+
+def processos_por_sessao() -> Dict[str, List]:
+    """Processos do navegador de cada sessão (principal + renderers), pelo marcador na linha de comando"""
+    por_sessao: Dict[str, List] = {}
+    for processo in psutil.Process().children(recursive=True):
+        try:
+            marcador = next((a for a in processo.cmdline() if a.startswith(MARCADOR_SESSAO)), None)
+            if marcador:
+                por_sessao[marcador[len(MARCADOR_SESSAO):]] = [processo] + processo.children(recursive=True)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return por_sessao
+
+def rss_total(processos: List) -> int:
+    total = 0
+    for processo in processos:
+        try:
+            total += processo.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return total
+
+class AmostradorCPU(threading.Thread):
+    """Coleta a pilha de cada thread a cada intervalo e grava as contagens em formato collapsed"""
+
+    def __init__(self, segundos: float, intervalo: float, caminho: Path):
+        super().__init__(name="perfilador-cpu", daemon=True)
+        self.segundos = segundos
+        self.intervalo = intervalo
+        self.caminho = caminho
+        self.inicio = datetime.now()
+        self.amostras = 0
+        self._parar = threading.Event()
+        self._pilhas: Counter = Counter()
+
+    def run(self):
+        fim = time.monotonic() + self.segundos
+        nomes_threads: Dict[int, str] = {}
+        while not self._parar.is_set() and time.monotonic() < fim:
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                if ident not in nomes_threads:
+                    nomes_threads = {t.ident: t.name for t in threading.enumerate()}
+                quadros = []
+                while frame is not None:
+                    quadros.append(_nome_quadro(frame))
+                    frame = frame.f_back
+                quadros.append(nomes_threads.get(ident, str(ident)))
+                self._pilhas[";".join(reversed(quadros))] += 1
+            self.amostras += 1
+            self._parar.wait(self.intervalo)
+        self._gravar()
+
+    def _gravar(self):
+        with open(self.caminho, "w", encoding="utf-8") as f:
+            for pilha, contagem in self._pilhas.most_common():
+                f.write(f"{pilha} {contagem}\n")
+        logger.info(f"🔬 Perfil de CPU gravado: {self.caminho.name} ({self.amostras} amostras)")
+
+    def parar(self):
+        self._parar.set()
+
+class Perfilador:
+    """Perfis de CPU/memória gravados em arquivos para download"""
+
+    def __init__(self):
+        self.diretorio = Path(settings.perfil_dir)
+        self.amostrador: Optional[AmostradorCPU] = None
+        self._snapshot_anterior: Optional[tracemalloc.Snapshot] = None
+
+    def _arquivo(self, prefixo: str, extensao: str) -> Path:
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        return self.diretorio / f"{prefixo}_{datetime.now():%Y%m%d-%H%M%S}.{extensao}"
+
+    # ---- CPU ----
+
+    def iniciar_cpu(self, segundos: float, intervalo_ms: float) -> Dict:
+        if self.amostrador and self.amostrador.is_alive():
+            raise PerfilEmAndamento("Amostragem de CPU já em execução")
+        self.amostrador = AmostradorCPU(segundos, intervalo_ms / 1000, self._arquivo("cpu", "folded"))
+        self.amostrador.start()
+        logger.info(f"🔬 Amostragem de CPU iniciada por {segundos:.0f}s (intervalo {intervalo_ms:.0f}ms)")
+        self._aplicar_retencao()
+        return self.status_cpu()
+
+    def parar_cpu(self) -> Dict:
+        """Encerra a amostragem antes do prazo (o arquivo é gravado com o que foi coletado)"""
+        if self.amostrador and self.amostrador.is_alive():
+            self.amostrador.parar()
+            self.amostrador.join(timeout=5)
+        return self.status_cpu()
+
+    def status_cpu(self) -> Dict:
+        if not self.amostrador:
+            return {"executando": False}
+        return {
+            "executando": self.amostrador.is_alive(),
+            "inicio": self.amostrador.inicio.isoformat(),
+            "segundos": self.amostrador.segundos,
+            "amostras": self.amostrador.amostras,
+            "arquivo": self.amostrador.caminho.name
+        }
+
+    # ---- Memória (tracemalloc) ----
+
+    def iniciar_memoria(self, quadros: int) -> Dict:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(quadros)
+            self._snapshot_anterior = None
+            logger.info(f"🔬 tracemalloc iniciado ({quadros} quadros por alocação)")
+        return self.status_memoria()
+
+    def parar_memoria(self) -> Dict:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("🔬 tracemalloc parado")
+        self._snapshot_anterior = None
+        return self.status_memoria()
+
+    def status_memoria(self) -> Dict:
+        if not tracemalloc.is_tracing():
+            return {"rastreando": False}
+        atual, pico = tracemalloc.get_traced_memory()
+        return {
+            "rastreando": True,
+            "quadros": tracemalloc.get_traceback_limit(),
+            "memoria_rastreada_bytes": atual,
+            "pico_bytes": pico,
+            "overhead_bytes": tracemalloc.get_tracemalloc_memory()
+        }
+
+    def snapshot_memoria(self, limite: int, agrupar: str) -> Dict:
+        """Grava o top de alocações e, a partir do segundo snapshot, a diferença para o anterior"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc não iniciado")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        arquivos = [self._gravar_estatisticas(
+            self._arquivo("memoria_top", "txt"),
+            f"Top {limite} alocações por {agrupar}",
+            snapshot.statistics(agrupar)[:limite]
+        )]
+        if self._snapshot_anterior is not None:
+            arquivos.append(self._gravar_estatisticas(
+                self._arquivo("memoria_diff", "txt"),
+                f"Top {limite} diferenças por {agrupar} desde o snapshot anterior",
+                snapshot.compare_to(self._snapshot_anterior, agrupar)[:limite]
+            ))
+        self._snapshot_anterior = snapshot
+        self._aplicar_retencao()
+        return {**self.status_memoria(), "arquivos": [a.name for a in arquivos]}
+
+    @staticmethod
+    def _gravar_estatisticas(caminho: Path, titulo: str, estatisticas: List) -> Path:
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.write(f"# {titulo} ({datetime.now().isoformat()})\n")
+            for estatistica in estatisticas:
+                f.write(f"{estatistica}\n")
+                for linha in estatistica.traceback.format()[-6:]:
+                    f.write(f"    {linha}\n")
+        return caminho
+
+    # ---- Processos ----
+
+    def memoria_processos(self, sessoes: Dict) -> Dict:
+        """RSS do worker e de cada navegador (processo principal + renderers) por sessão"""
+        if not PSUTIL_DISPONIVEL:
+            raise RuntimeError("psutil não instalado")
+        worker = psutil.Process()
+        por_sessao = processos_por_sessao()
+
+        resultado = []
+        for session_id, session in sessoes.items():
+            processos = por_sessao.pop(session_id, [])
+            resultado.append({
+                "session_id": session_id,
+                "ocupada": session.is_busy,
+                "criada_em": session.created_at.isoformat(),
+                "pid": processos[0].pid if processos else None,
+                "processos": len(processos),
+                "rss_bytes": rss_total(processos)
+            })
+        return {
+            "worker": {"pid": worker.pid, "rss_bytes": worker.memory_info().rss},
+            "sessoes": resultado,
+            # Navegadores cuja sessão já saiu do pool (fechamento pendente ou vazamento)
+            "orfaos": [
+                {"session_id": session_id, "pid": processos[0].pid, "rss_bytes": rss_total(processos)}
+                for session_id, processos in por_sessao.items()
+            ],
+            "total_rss_bytes": rss_total([worker] + worker.children(recursive=True))
+        }
+
+    # ---- Arquivos ----
+
+    def listar(self) -> List[Dict]:
+        if not self.diretorio.exists():
+            return []
+        return [
+            {
+                "nome": arquivo.name,
+                "tamanho_bytes": arquivo.stat().st_size,
+                "criado_em": datetime.fromtimestamp(arquivo.stat().st_mtime).isoformat(),
+                "url": f"/admin/perfis/{arquivo.name}"
+            }
+            for arquivo in sorted(self.diretorio.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+            if NOME_ARQUIVO.match(arquivo.name)
+        ]
+
+    def caminho(self, nome: str) -> Optional[Path]:
+        if not NOME_ARQUIVO.match(nome):
+            return None
+        arquivo = self.diretorio / nome
+        return arquivo if arquivo.is_file() else None
+
+    def _aplicar_retencao(self):
+        arquivos = sorted(
+            (a for a in self.diretorio.iterdir() if NOME_ARQUIVO.match(a.name)),
+            key=lambda p: p.stat().st_mtime, reverse=True
+        )
+        for arquivo in arquivos[settings.perfil_max_arquivos:]:
+            try:
+                arquivo.unlink()
+            except OSError:
+                continue
+
+# Instância global do perfilador
+perfilador = Perfilador()
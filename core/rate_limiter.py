@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Limitador de taxa PROJUDI API v4
+Token bucket por credencial para navegações (páginas e downloads) e logins no PROJUDI,
+compartilhado entre processos e nós pelo Redis (script Lua atômico, relógio do Redis);
+sem Redis, cada processo usa um bucket local com a taxa dividida por RATE_LIMIT_NOS
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, List, Tuple
+
+from loguru import logger
+
+from config import settings
+from core.cache_manager import cache_manager
+from core.cronometro import registrar_etapa
+from core.metricas import metricas
+
+# Reserva um token: o saldo pode ficar negativo e a espera devolvida é a vez de quem pediu (ordem de chegada)
+SCRIPT_BUCKET = """
+if redis.replicate_commands then redis.replicate_commands() end
+local agora_redis = redis.call('TIME')
+local agora = tonumber(agora_redis[1]) * 1000 + math.floor(tonumber(agora_redis[2]) / 1000)
+local capacidade = tonumber(ARGV[1])
+local por_ms = tonumber(ARGV[2]) / 60000
+local estado = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(estado[1]) or capacidade
+local ts = tonumber(estado[2]) or agora
+tokens = math.min(capacidade, tokens + math.max(0, agora - ts) * por_ms) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', agora)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacidade / por_ms) + 60000)
+if tokens >= 0 then return 0 end
+return math.ceil(-tokens / por_ms)
+"""
+
+def _chave_credencial(credencial: str) -> str:
+    """A credencial (login) não vai em claro para as chaves do Redis"""
+    return hashlib.sha256(credencial.encode("utf-8")).hexdigest()[:16]
+
+class LimitadorTaxa:
+    """Espera pela vez de cada navegação/login conforme a taxa da credencial"""
+
+    def __init__(self):
+        self.habilitado = settings.rate_limit_habilitado
+        self.por_credencial = self._taxas_por_credencial()
+        self._script = None
+        self._locais: Dict[Tuple[str, str], List[float]] = {}  # (tipo, credencial) -> [tokens, instante]
+        self._redis_falhou = False
+        self.esperas: Dict[str, int] = {}
+        self.tempo_espera: Dict[str, float] = {}
+
+    @staticmethod
+    def _taxas_por_credencial() -> Dict[str, float]:
+        """RATE_LIMIT_POR_CREDENCIAL="usuario1=30,usuario2=120" (navegações por minuto)"""
+        taxas = {}
+        for item in settings.rate_limit_por_credencial.split(","):
+            credencial, _, taxa = item.strip().partition("=")
+            try:
+                taxas[credencial.strip()] = float(taxa)
+            except ValueError:
+                if item.strip():
+                    logger.warning(f"⚠️ RATE_LIMIT_POR_CREDENCIAL ignorado: {item.strip()}")
+        return taxas
+
+    def _bucket(self, tipo: str, credencial: str) -> Tuple[float, float]:
+        """(capacidade, tokens por minuto) do bucket"""
+        if tipo == "login":
+            return settings.rate_limit_rajada_logins, settings.rate_limit_logins_por_minuto
+        return settings.rate_limit_rajada, self.por_credencial.get(credencial, settings.rate_limit_navegacoes_por_minuto)
+
+    async def aguardar(self, tipo: str, credencial: str):
+        """Reserva um token do bucket (tipo: navegacao ou login) e espera a vez, se preciso"""
+        if not self.habilitado:
+            return
+        capacidade, por_minuto = self._bucket(tipo, credencial)
+        if por_minuto <= 0:
+            return
+
+        espera = await self._reservar_redis(tipo, credencial, capacidade, por_minuto)
+        origem = "redis"
+        if espera is None:
+            espera = self._reservar_local(tipo, credencial, capacidade, por_minuto / max(1, settings.rate_limit_nos))
+            origem = "local"
+
+        metricas.registrar_espera_taxa(tipo, origem, espera)
+        if espera <= 0:
+            return
+        self.esperas[tipo] = self.esperas.get(tipo, 0) + 1
+        self.tempo_espera[tipo] = self.tempo_espera.get(tipo, 0.0) + espera
+        registrar_etapa("rate_limit", espera)
+        if espera >= 5:
+            logger.info(f"🐢 Limite de taxa ({tipo}): aguardando {espera:.1f}s")
+        await asyncio.sleep(espera)
+
+    async def _reservar_redis(self, tipo: str, credencial: str, capacidade: float, por_minuto: float):
+        """Segundos de espera pelo bucket compartilhado, ou None sem Redis"""
+        if not cache_manager.is_connected:
+            return None
+        try:
+            if self._script is None:
+                self._script = cache_manager.redis_client.register_script(SCRIPT_BUCKET)
+            espera_ms = await self._script(
+                keys=[f"rate_limit:{tipo}:{_chave_credencial(credencial)}"],
+                args=[capacidade, por_minuto]
+            )
+        except Exception as e:
+            if not self._redis_falhou:
+                logger.warning(f"⚠️ Limite de taxa sem Redis, usando bucket local: {e}")
+                self._redis_falhou = True
+            return None
+        if self._redis_falhou:
+            logger.info("✅ Limite de taxa voltou a usar o Redis")
+            self._redis_falhou = False
+        return int(espera_ms) / 1000
+
+    def _reservar_local(self, tipo: str, credencial: str, capacidade: float, por_minuto: float) -> float:
+        agora = time.monotonic()
+        bucket = self._locais.setdefault((tipo, credencial), [capacidade, agora])
+        por_segundo = por_minuto / 60
+        bucket[0] = min(capacidade, bucket[0] + (agora - bucket[1]) * por_segundo) - 1
+        bucket[1] = agora
+        return 0.0 if bucket[0] >= 0 else -bucket[0] / por_segundo
+
+    def get_stats(self) -> dict:
+        return {
+            "habilitado": self.habilitado,
+            "compartilhado": cache_manager.is_connected and not self._redis_falhou,
+            "navegacoes_por_minuto": settings.rate_limit_navegacoes_por_minuto,
+            "logins_por_minuto": settings.rate_limit_logins_por_minuto,
+            "credenciais_customizadas": len(self.por_credencial),
+            "esperas": dict(self.esperas),
+            "tempo_espera": {tipo: round(segundos, 3) for tipo, segundos in self.tempo_espera.items()}
+        }
+
+# Instância global do limitador de taxa
+limitador_taxa = LimitadorTaxa()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Serialização JSON PROJUDI API v4
+Caminho rápido para respostas: orjson quando disponível (fallback para json)
+e modelos Pydantic serializados pelo pydantic-core, sem revalidação pelo FastAPI
+"""
+
+import dataclasses
+import json
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:
+    orjson = None
+    ORJSON_DISPONIVEL = False
+
+def _padrao(obj: Any) -> Any:
+    """Tipos que o encoder não serializa sozinho"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Tipo não serializável: {type(obj).__name__}")
+
+def dumps(obj: Any, excluir: Optional[Dict] = None) -> bytes:
+    """Serializa para JSON em UTF-8 (dataclasses, datetime e modelos Pydantic incluídos; `excluir` só para modelos)"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump_json(exclude=excluir).encode("utf-8")
+    if ORJSON_DISPONIVEL:
+        return orjson.dumps(obj, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_padrao, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_str(obj: Any) -> str:
+    """Como dumps, mas retorna str (linhas NDJSON/SSE)"""
+    return dumps(obj).decode("utf-8")
+
+class RespostaJSON(JSONResponse):
+    """Resposta JSON que serializa direto (modelos já construídos não passam de novo pelo response_model)"""
+
+    def __init__(self, content: Any, *args, excluir: Optional[Dict] = None, **kwargs):
+        self.excluir = excluir
+        super().__init__(content, *args, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, excluir=self.excluir)
@@ -9,16 +9,40 @@ import time
 import tempfile
 import shutil
 from datetime import datetime, timedelta
-from typing import Dict, Optional, List
-from dataclasses import dataclass, field
-from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional, List
+from dataclasses import dataclass, field, replace
+from contextlib import AsyncExitStack, asynccontextmanager
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, CDPSession, Page
 from loguru import logger
 
 from config import settings
 from core.cache_manager import cache_manager
 from core.concurrency_manager import concurrency_manager
+from core.metricas import metricas
+from core.perfil_rpc import Instrumentado
+from core.traces_playwright import traces_playwright
+from core.perfilador import MARCADOR_SESSAO
+from core.monitor_memoria import monitor_memoria
+from core.rate_limiter import limitador_taxa
+
+@dataclass(frozen=True)
+class Credenciais:
+    """Login PROJUDI de uma busca (o da configuração ou o informado na requisição)"""
+    usuario: str
+    senha: str = field(repr=False)
+    serventia: str
+    
+    @classmethod
+    def padrao(cls) -> "Credenciais":
+        return cls(settings.projudi_user, settings.projudi_pass, settings.default_serventia)
+    
+    @classmethod
+    def customizadas(cls, usuario: Optional[str] = None, senha: Optional[str] = None,
+                     serventia: Optional[str] = None) -> "Credenciais":
+        """Credenciais padrão com os campos informados substituídos"""
+        informados = {"usuario": usuario, "senha": senha, "serventia": serventia}
+        return replace(cls.padrao(), **{campo: valor for campo, valor in informados.items() if valor})
 
 @dataclass
 class Session:
@@ -32,6 +56,20 @@ class Session:
     last_used: datetime = field(default_factory=datetime.now)
     is_busy: bool = False
     is_logged_in: bool = False
+    navegacoes: int = 0
+    recursos: Dict[str, Any] = field(default_factory=dict)  # última medição (rss_bytes, heap_js_bytes)
+    cdp: Optional[CDPSession] = None  # heap JS (somente Chromium)
+    credenciais: Credenciais = field(default_factory=Credenciais.padrao)  # login da busca em andamento
+    
+    @property
+    def credencial(self) -> str:
+        """Usuário PROJUDI da sessão (chave do limite de taxa e do cliente HTTP)"""
+        return self.credenciais.usuario
+    
+    async def navegar(self, url: str, **kwargs):
+        """page.goto após aguardar o limite de taxa de navegações da credencial"""
+        await limitador_taxa.aguardar("navegacao", self.credencial)
+        return await self.page.goto(url, **kwargs)
 
 class SessionManager:
     """Gerenciador de sessões Playwright"""
@@ -42,6 +80,8 @@ class SessionManager:
         self.browser_type = None
         self._lock = asyncio.Lock()
         self._cleanup_task = None
+        self._monitor_task = None
+        self.criando = 0
         
     async def initialize(self):
         """Inicializa o gerenciador de sessões"""
@@ -72,6 +112,7 @@ class SessionManager:
             
             # Iniciar task de limpeza
             self._cleanup_task = asyncio.create_task(self._cleanup_sessions_task())
+            self._monitor_task = asyncio.create_task(self._monitorar_recursos_task())
             
             logger.info("✅ SessionManager inicializado com sucesso")
             
@@ -84,13 +125,14 @@ class SessionManager:
         try:
             logger.info("🔄 Finalizando SessionManager...")
             
-            # Cancelar task de limpeza
-            if self._cleanup_task:
-                self._cleanup_task.cancel()
-                try:
-                    await self._cleanup_task
-                except asyncio.CancelledError:
-                    pass
+            # Cancelar tasks de limpeza e monitoramento
+            for task in (self._cleanup_task, self._monitor_task):
+                if task:
+                    task.cancel()
+                    try:
+                        await task
+                    except asyncio.CancelledError:
+                        pass
             
             # Fechar todas as sessões
             await self.close_all_sessions()
@@ -108,40 +150,55 @@ class SessionManager:
             logger.error(f"❌ Erro ao finalizar SessionManager: {e}")
     
     async def get_session(self) -> Optional[Session]:
-        """Obtém uma sessão disponível ou cria uma nova"""
-        return await concurrency_manager.execute_with_limits(self._get_session_internal)
+        """Obtém uma sessão disponível ou cria uma nova (a vaga de concorrência é ocupada por get_session())"""
+        return await asyncio.wait_for(self._get_session_internal(), timeout=concurrency_manager.request_timeout)
     
     async def _get_session_internal(self) -> Optional[Session]:
         """Implementação interna de get_session com cache"""
-        async with self._lock:
-            # Verificar se o Playwright foi inicializado
-            if not self.playwright or not self.browser_type:
-                logger.warning("⚠️ Playwright não inicializado, inicializando agora...")
-                await self.initialize()
-                
+        while True:
+            async with self._lock:
+                # Verificar se o Playwright foi inicializado
                 if not self.playwright or not self.browser_type:
-                    logger.error("❌ Falha ao inicializar Playwright")
+                    logger.warning("⚠️ Playwright não inicializado, inicializando agora...")
+                    await self.initialize()
+                    
+                    if not self.playwright or not self.browser_type:
+                        logger.error("❌ Falha ao inicializar Playwright")
+                        return None
+                
+                # Procurar sessão disponível
+                for session in self.sessions.values():
+                    if not session.is_busy and self._is_session_valid(session):
+                        session.is_busy = True
+                        session.last_used = datetime.now()
+                        logger.info(f"♻️ Reutilizando sessão {session.id}")
+                        return session
+                
+                if len(self.sessions) >= settings.max_browsers:
+                    logger.warning("⚠️ Pool de sessões cheio, aguarde...")
+                    return None
+                
+                # Criar nova sessão se ainda há espaço e a memória do host permite
+                if not monitor_memoria.host_no_limite():
+                    self.criando += 1
+                    try:
+                        with metricas.medir_etapa("criar_sessao") as etapa:
+                            session = await self._create_session()
+                            if not session:
+                                etapa.falhou()
+                    finally:
+                        self.criando -= 1
+                    if session:
+                        self.sessions[session.id] = session
+                        session.is_busy = True
+                        logger.info(f"🆕 Nova sessão criada: {session.id}")
+                        return session
                     return None
             
-            # Procurar sessão disponível
-            for session in self.sessions.values():
-                if not session.is_busy and self._is_session_valid(session):
-                    session.is_busy = True
-                    session.last_used = datetime.now()
-                    logger.info(f"♻️ Reutilizando sessão {session.id}")
-                    return session
-            
-            # Criar nova sessão se ainda há espaço
-            if len(self.sessions) < settings.max_browsers:
-                session = await self._create_session()
-                if session:
-                    self.sessions[session.id] = session
-                    session.is_busy = True
-                    logger.info(f"🆕 Nova sessão criada: {session.id}")
-                    return session
-            
-            logger.warning("⚠️ Pool de sessões cheio, aguarde...")
-            return None
+            # Esperar a memória fora do lock: quem pode reutilizar uma sessão não fica bloqueado
+            if not await monitor_memoria.aguardar_memoria_livre():
+                logger.warning(f"⚠️ Memória em {monitor_memoria.host['percentual']}%, sessão não criada")
+                return None
     
     async def release_session(self, session_or_id, force_close: bool = False):
         """Libera uma sessão para reutilização ou a fecha se force_close=True"""
@@ -187,8 +244,8 @@ class SessionManager:
             logger.error(f"❌ Erro ao fechar sessão {session.id}: {e}")
     
     async def criar_sessao(self) -> Optional[Session]:
-        """Cria uma nova sessão (alias para get_session)"""
-        return await self.get_session()
+        """Cria uma nova sessão (alias para get_session, dentro do limite de concorrência)"""
+        return await concurrency_manager.execute_with_limits(self.get_session)
     
     async def fechar_sessao(self, session_id: str):
         """Fecha uma sessão específica pelo ID"""
@@ -250,6 +307,10 @@ class SessionManager:
                         ]
                     })
                 
+                # Identifica o processo do navegador da sessão (memória por sessão em /admin/perfil/processos)
+                if self.browser_type.name == "chromium":
+                    launch_args.setdefault('args', []).append(f"{MARCADOR_SESSAO}{session_id}")
+                
                 browser = await self.browser_type.launch(**launch_args)
                 
                 # Criar contexto com configurações
@@ -269,6 +330,14 @@ class SessionManager:
                 
                 # Criar página
                 page = await context.new_page()
+                page.on("response", self._registrar_resposta)
+                page.on("requestfinished", self._registrar_requisicao)
+                cdp = None
+                if self.browser_type.name == "chromium":
+                    try:
+                        cdp = await context.new_cdp_session(page)
+                    except Exception as e:
+                        logger.debug(f"CDP indisponível para a sessão {session_id}: {e}")
                 
                 # Configurações adicionais da página
                 await page.add_init_script("""
@@ -277,13 +346,16 @@ class SessionManager:
                     Object.defineProperty(navigator, 'languages', {get: () => ['pt-BR', 'pt', 'en']});
                 """)
                 
+                # Proxy conta as chamadas ao Playwright de cada busca (timings da resposta)
                 session = Session(
                     id=session_id,
                     browser=browser,
                     context=context,
-                    page=page,
-                    temp_dir=temp_dir
+                    page=Instrumentado(page),
+                    temp_dir=temp_dir,
+                    cdp=cdp
                 )
+                page.on("framenavigated", lambda frame, s=session: self._contar_navegacao(s, frame))
                 
                 logger.info(f"✅ Sessão criada com sucesso: {session_id}")
                 return session
@@ -296,6 +368,29 @@ class SessionManager:
         
         return None
     
+    @staticmethod
+    def _registrar_resposta(response):
+        """Conta status HTTP das respostas vindas do PROJUDI (5xx/429 reduzem o limite de concorrência)"""
+        if response.url.startswith(settings.projudi_base_url):
+            metricas.registrar_resposta_projudi(response.status)
+            if response.status >= 500 or response.status == 429:
+                concurrency_manager.registrar_congestionamento(
+                    "http_429" if response.status == 429 else "http_5xx"
+                )
+    
+    @staticmethod
+    def _registrar_requisicao(request):
+        """Latência das páginas do PROJUDI (sinal de saúde do limite adaptativo)"""
+        if request.resource_type == "document" and request.url.startswith(settings.projudi_base_url):
+            fim = request.timing.get("responseEnd", -1)
+            if fim > 0:
+                concurrency_manager.registrar_latencia(fim / 1000)
+    
+    @staticmethod
+    def _contar_navegacao(session: Session, frame):
+        if frame.parent_frame is None:
+            session.navegacoes += 1
+    
     def _is_session_valid(self, session: Session) -> bool:
         """Verifica se uma sessão ainda é válida"""
         try:
@@ -328,6 +423,24 @@ class SessionManager:
             except Exception as e:
                 logger.error(f"❌ Erro na limpeza de sessões: {e}")
     
+    async def _monitorar_recursos_task(self):
+        """Mede as sessões e a memória do host periodicamente (stats e métricas)"""
+        while True:
+            try:
+                await asyncio.sleep(settings.sessao_monitor_intervalo)
+                await self._monitorar_recursos()
+                
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"❌ Erro no monitoramento de memória: {e}")
+    
+    async def _monitorar_recursos(self):
+        monitor_memoria.memoria_host()
+        sessoes = list(self.sessions.values())
+        if sessoes:
+            await monitor_memoria.medir(sessoes)
+    
     async def _cleanup_invalid_sessions(self):
         """Remove sessões inválidas"""
         async with self._lock:
@@ -354,6 +467,7 @@ class SessionManager:
             'total_sessions': total,
             'busy_sessions': busy,
             'available_sessions': total - busy,
+            'creating_sessions': self.criando,
             'logged_in_sessions': logged_in,
             'max_sessions': settings.max_browsers
         }
@@ -370,7 +484,8 @@ class SessionManager:
             'cache_connected': cache_manager.is_connected
         }
         stats.update({
-            'cache': cache_stats
+            'cache': cache_stats,
+            'memoria': monitor_memoria.get_stats(self.sessions)
         })
         
         return stats
@@ -379,14 +494,27 @@ class SessionManager:
 session_manager = SessionManager()
 
 @asynccontextmanager
-async def get_session():
-    """Context manager para usar sessões de forma segura"""
-    session = await session_manager.get_session()
-    if not session:
-        raise Exception("Não foi possível obter uma sessão")
-    
-    try:
-        yield session
-    finally:
-        # Fechar a sessão definitivamente para evitar hang
-        await session_manager.release_and_close_session(session)
\ No newline at end of file
+async def get_session(credenciais: Optional[Credenciais] = None):
+    """Context manager para usar sessões de forma segura (ocupa uma vaga de concorrência durante todo o uso);
+    o login é feito com `credenciais` (padrão: as da configuração), sem alterar `settings`"""
+    async with AsyncExitStack() as pilha:
+        with metricas.medir_etapa("obter_sessao") as etapa:
+            await pilha.enter_async_context(concurrency_manager.vaga())
+            session = await session_manager.get_session()
+            if not session:
+                etapa.falhou()
+                raise Exception("Não foi possível obter uma sessão")
+        session.credenciais = credenciais or Credenciais.padrao()
+        
+        gravacao = await traces_playwright.iniciar(session)
+        falhou = False
+        try:
+            yield session
+        except Exception:
+            falhou = True
+            raise
+        finally:
+            if gravacao:
+                await traces_playwright.finalizar(session, gravacao, falhou)
+            # Fechar a sessão definitivamente para evitar hang
+            await session_manager.release_and_close_session(session)
\ No newline at end of file
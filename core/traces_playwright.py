@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Traces do Playwright PROJUDI API v4
+Grava o trace do navegador (rede, snapshots do DOM, screenshots) durante o uso de cada sessão e
+mantém apenas o das buscas amostradas, lentas, com erro ou que caíram no fallback de movimentações,
+com limite de quantidade e idade dos arquivos (abrir em https://trace.playwright.dev)
+"""
+
+import asyncio
+import random
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from config import settings
+from core.cronometro import marcadores_atuais, registrar_trace
+
+NOME_TRACE = re.compile(r"^[\w.-]+\.zip$")
+
+@dataclass
+class Gravacao:
+    """Trace em gravação em uma sessão"""
+    amostrada: bool
+    inicio: float
+
+class GravadorTraces:
+    """Decide quais traces manter e aplica a retenção"""
+
+    def __init__(self):
+        self.habilitado = settings.playwright_trace_habilitado
+        self.diretorio = Path(settings.playwright_trace_dir)
+        self.gravados = 0
+        self.descartados = 0
+
+    async def iniciar(self, session) -> Optional[Gravacao]:
+        """Começa a gravar o contexto da sessão (toda busca é gravada; o descarte é decidido no fim)"""
+        if not self.habilitado:
+            return None
+        try:
+            await session.context.tracing.start(
+                screenshots=settings.playwright_trace_screenshots,
+                snapshots=True
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível iniciar o trace da sessão {session.id}: {e}")
+            return None
+        return Gravacao(
+            amostrada=random.random() < settings.playwright_trace_amostragem,
+            inicio=time.perf_counter()
+        )
+
+    def _motivo(self, gravacao: Gravacao, falhou: bool) -> Optional[str]:
+        marcadores = marcadores_atuais()
+        if falhou or "erro" in marcadores:
+            return "erro"
+        if "fallback_movimentacoes" in marcadores:
+            return "fallback"
+        if "movimentacoes_vazias" in marcadores:
+            return "sem_movimentacoes"
+        if time.perf_counter() - gravacao.inicio >= settings.playwright_trace_lento_segundos:
+            return "lento"
+        if gravacao.amostrada:
+            return "amostra"
+        return None
+
+    async def finalizar(self, session, gravacao: Gravacao, falhou: bool = False) -> Optional[str]:
+        """Para a gravação e salva o arquivo se a busca se encaixar em algum critério; retorna o nome"""
+        motivo = self._motivo(gravacao, falhou)
+        try:
+            if not motivo:
+                await session.context.tracing.stop()
+                self.descartados += 1
+                return None
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            nome = f"{datetime.now():%Y%m%d-%H%M%S}_{motivo}_{session.id[:8]}.zip"
+            await session.context.tracing.stop(path=str(self.diretorio / nome))
+        except Exception as e:
+            logger.warning(f"⚠️ Não foi possível finalizar o trace da sessão {session.id}: {e}")
+            return None
+
+        self.gravados += 1
+        registrar_trace(nome)
+        logger.info(f"🎞️ Trace Playwright gravado ({motivo}): {nome}")
+        await asyncio.to_thread(self._aplicar_retencao)
+        return nome
+
+    def _aplicar_retencao(self):
+        """Remove traces além do limite de arquivos ou mais velhos que o limite de horas"""
+        arquivos = sorted(self.diretorio.glob("*.zip"), key=lambda p: p.stat().st_mtime, reverse=True)
+        limite_idade = time.time() - settings.playwright_trace_max_horas * 3600
+        for i, arquivo in enumerate(arquivos):
+            try:
+                if i >= settings.playwright_trace_max_arquivos or arquivo.stat().st_mtime < limite_idade:
+                    arquivo.unlink()
+            except OSError:
+                continue
+
+    def listar(self) -> List[Dict]:
+        if not self.diretorio.exists():
+            return []
+        traces = []
+        for arquivo in sorted(self.diretorio.glob("*.zip"), key=lambda p: p.stat().st_mtime, reverse=True):
+            estado = arquivo.stat()
+            traces.append({
+                "nome": arquivo.name,
+                "motivo": arquivo.stem.split("_")[1] if arquivo.stem.count("_") >= 2 else "",
+                "tamanho_bytes": estado.st_size,
+                "criado_em": datetime.fromtimestamp(estado.st_mtime).isoformat(),
+                "url": f"/traces/{arquivo.name}"
+            })
+        return traces
+
+    def caminho(self, nome: str) -> Optional[Path]:
+        """Arquivo de um trace pelo nome (sem permitir sair do diretório)"""
+        if not NOME_TRACE.match(nome):
+            return None
+        arquivo = self.diretorio / nome
+        return arquivo if arquivo.is_file() else None
+
+    def get_stats(self) -> dict:
+        return {
+            "habilitado": self.habilitado,
+            "gravados": self.gravados,
+            "descartados": self.descartados,
+            "amostragem": settings.playwright_trace_amostragem,
+            "lento_segundos": settings.playwright_trace_lento_segundos
+        }
+
+# Instância global do gravador de traces
+traces_playwright = GravadorTraces()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Tracing distribuído PROJUDI API v4
+Spans OpenTelemetry por requisição HTTP, busca e etapa (sessão, login, nível 1, cada processo, anexos),
+propagados por `traceparent` entre nós e para os itens de lote.
+Requer opentelemetry-api; com opentelemetry-sdk o exportador é configurado aqui (OTLP ou arquivo JSONL),
+sem ele vale o provider configurado externamente (ex.: opentelemetry-instrument). Sem a API tudo vira no-op
+"""
+
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from loguru import logger
+
+from config import settings
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    OTEL_DISPONIVEL = True
+except ImportError:
+    OTEL_DISPONIVEL = False
+
+# Versões recentes do FastAPI já criam o span HTTP (com traceparent); nas demais usa-se MiddlewareTracing
+try:
+    import fastapi.telemetry  # noqa: F401
+    SPAN_HTTP_NATIVO = True
+except ImportError:
+    SPAN_HTTP_NATIVO = False
+
+def _atributos(atributos: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """OpenTelemetry só aceita str/bool/int/float (None é descartado)"""
+    return {
+        chave: valor if isinstance(valor, (str, bool, int, float)) else str(valor)
+        for chave, valor in (atributos or {}).items()
+        if valor is not None
+    }
+
+class _ExportadorArquivo:
+    """Grava um span por linha (JSON) para coleta posterior ou inspeção local"""
+
+    def __init__(self, caminho: str):
+        from opentelemetry.sdk.trace.export import SpanExportResult
+        self._sucesso = SpanExportResult.SUCCESS
+        Path(caminho).parent.mkdir(parents=True, exist_ok=True)
+        self._arquivo = open(caminho, "a", encoding="utf-8")
+
+    def export(self, spans) -> Any:
+        for span in spans:
+            self._arquivo.write(json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+        return self._sucesso
+
+    def shutdown(self):
+        self._arquivo.close()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        self._arquivo.flush()
+        return True
+
+class Tracing:
+    """Criação de spans e propagação de contexto"""
+
+    def __init__(self):
+        self.habilitado = settings.tracing_habilitado and OTEL_DISPONIVEL
+        self._provider = None
+        if settings.tracing_habilitado and not OTEL_DISPONIVEL:
+            logger.info("🔭 opentelemetry-api não instalado; tracing desabilitado")
+        if not self.habilitado:
+            return
+        self._configurar_sdk()
+        self.tracer = trace.get_tracer("projudi-api")
+
+    def _configurar_sdk(self):
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+        except ImportError:
+            logger.info("🔭 opentelemetry-sdk não instalado; usando o provider configurado externamente")
+            return
+
+        exportador = self._criar_exportador()
+        if exportador is None:
+            return
+        provider = TracerProvider(
+            resource=Resource.create({"service.name": settings.tracing_servico}),
+            sampler=ParentBased(TraceIdRatioBased(settings.tracing_amostragem))
+        )
+        provider.add_span_processor(BatchSpanProcessor(exportador))
+        trace.set_tracer_provider(provider)
+        self._provider = provider
+        logger.info(f"🔭 Tracing habilitado ({settings.tracing_exportador}, amostragem {settings.tracing_amostragem:.0%})")
+
+    @staticmethod
+    def _criar_exportador():
+        if settings.tracing_exportador == "otlp":
+            try:
+                from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            except ImportError:
+                logger.warning("⚠️ opentelemetry-exporter-otlp não instalado; gravando spans em arquivo")
+            else:
+                return OTLPSpanExporter(endpoint=settings.tracing_endpoint or None)
+        try:
+            return _ExportadorArquivo(settings.tracing_arquivo)
+        except OSError as e:
+            logger.error(f"❌ Não foi possível abrir {settings.tracing_arquivo} para os spans: {e}")
+            return None
+
+    @contextmanager
+    def span(self, nome: str, atributos: Optional[Dict[str, Any]] = None,
+             pai: Optional[Dict[str, str]] = None, servidor: bool = False) -> Iterator[Any]:
+        """Span filho do atual (ou do contexto propagado em `pai`); exceções marcam o span como erro"""
+        if not self.habilitado:
+            yield None
+            return
+        contexto = propagate.extract(pai) if pai else None
+        with self.tracer.start_as_current_span(
+            nome,
+            context=contexto,
+            kind=SpanKind.SERVER if servidor else SpanKind.INTERNAL,
+            attributes=_atributos(atributos)
+        ) as span:
+            yield span
+
+    def anotar(self, atributos: Dict[str, Any]):
+        """Adiciona atributos ao span atual (ex.: estratégia usada pelo nível 2)"""
+        if self.habilitado:
+            trace.get_current_span().set_attributes(_atributos(atributos))
+
+    def marcar_falha(self, span: Any, descricao: str = ""):
+        if span is not None:
+            span.set_status(Status(StatusCode.ERROR, descricao or None))
+
+    def contexto_propagacao(self) -> Dict[str, str]:
+        """Cabeçalhos `traceparent`/`tracestate` do span atual (para lotes e chamadas a outros nós)"""
+        carrier: Dict[str, str] = {}
+        if self.habilitado:
+            propagate.inject(carrier)
+        return carrier
+
+    def trace_id_atual(self) -> str:
+        if not self.habilitado:
+            return ""
+        contexto = trace.get_current_span().get_span_context()
+        return format(contexto.trace_id, "032x") if contexto.is_valid else ""
+
+    def shutdown(self):
+        """Envia os spans pendentes"""
+        if self._provider is not None:
+            self._provider.shutdown()
+
+class MiddlewareTracing:
+    """Span SERVER por requisição HTTP, continuando o `traceparent` recebido; devolve X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.habilitado:
+            await self.app(scope, receive, send)
+            return
+
+        cabecalhos = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        metodo = scope.get("method", "GET")
+        with tracing.span(
+            f"{metodo} {scope.get('path', '')}",
+            {"http.method": metodo, "http.target": scope.get("path", "")},
+            pai=cabecalhos,
+            servidor=True
+        ) as span:
+            trace_id = tracing.trace_id_atual()
+
+            async def enviar(mensagem):
+                if mensagem["type"] == "http.response.start":
+                    status = mensagem["status"]
+                    span.set_attribute("http.status_code", status)
+                    if status >= 500:
+                        tracing.marcar_falha(span, f"HTTP {status}")
+                    if trace_id:
+                        mensagem.setdefault("headers", [])
+                        mensagem["headers"] = list(mensagem["headers"]) + [(b"x-trace-id", trace_id.encode())]
+                await send(mensagem)
+
+            await self.app(scope, receive, enviar)
+            # Nome final pelo template da rota (evita um nome por número de processo)
+            rota = scope.get("route")
+            if rota is not None and getattr(rota, "path", None):
+                span.update_name(f"{metodo} {rota.path}")
+
+# Instância global de tracing
+tracing = Tracing()
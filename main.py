@@ -8,15 +8,10 @@ import uvicorn
 from loguru import logger
 
 from config import settings
+from core.logging_config import configurar_logging
 
 # Configurar logging
-logger.add(
-    "logs/projudi_api.log",
-    rotation="1 day",
-    retention="30 days",
-    level="INFO",
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}"
-)
+configurar_logging()
 
 def main():
     """Função principal"""
@@ -17,6 +17,9 @@ from loguru import logger
 from config import settings
 from core.session_manager import Session
 from core.cache_manager import cache_manager
+from core.metricas import metricas
+from core.tracing import tracing
+from core.rate_limiter import limitador_taxa
 
 class TipoBusca(str, Enum):
     CPF = "cpf"
@@ -51,6 +54,14 @@ class LoginManager:
     @staticmethod
     async def fazer_login(session: Session) -> bool:
         """Realiza login no sistema PROJUDI"""
+        with metricas.medir_etapa("login") as etapa:
+            sucesso = await LoginManager._fazer_login(session)
+            if not sucesso:
+                etapa.falhou()
+            return sucesso
+    
+    @staticmethod
+    async def _fazer_login(session: Session) -> bool:
         try:
             logger.info(f"🔐 Fazendo login na sessão {session.id}...")
             
@@ -59,12 +70,16 @@ class LoginManager:
             cached_login = await cache_manager.get(cache_key)
             if cached_login and cached_login.get('logged_in'):
                 logger.info(f"✅ Login em cache para sessão {session.id}")
+                tracing.anotar({"projudi.login_cache": True})
                 session.is_logged_in = True
                 return True
             
+            # Logins contam em um limite próprio por credencial (bloqueio de conta)
+            await limitador_taxa.aguardar("login", session.credencial)
+            
             # Navegar para página de login
             login_url = f"{settings.projudi_base_url}/LogOn?PaginaAtual=-200"
-            await session.page.goto(login_url, timeout=120000)
+            await session.navegar(login_url, timeout=120000)
             
             # Aguardar página carregar
             try:
@@ -82,9 +97,9 @@ class LoginManager:
                 return True
             
             # Preencher credenciais com aguardos para estabilidade
-            await session.page.fill('input[name="Usuario"]', settings.projudi_user)
+            await session.page.fill('input[name="Usuario"]', session.credenciais.usuario)
             await asyncio.sleep(0.5)  # Aguardo para estabilidade
-            await session.page.fill('input[name="Senha"]', settings.projudi_pass)
+            await session.page.fill('input[name="Senha"]', session.credenciais.senha)
             await asyncio.sleep(0.5)  # Aguardo para estabilidade
             
             # Clicar em entrar
@@ -98,7 +113,7 @@ class LoginManager:
                 await session.page.wait_for_load_state('domcontentloaded', timeout=12000)
             
             # Verificar se apareceu a página de seleção de serventia
-            if await LoginManager._selecionar_serventia(session.page):
+            if await LoginManager._selecionar_serventia(session.page, session.credenciais.serventia):
                 logger.info(f"✅ Login realizado com sucesso na sessão {session.id}")
                 session.is_logged_in = True
                 # Cachear status de login por 30 minutos
@@ -123,8 +138,8 @@ class LoginManager:
             return False
     
     @staticmethod
-    async def _selecionar_serventia(page: Page) -> bool:
-        """Seleciona a serventia padrão com múltiplas estratégias"""
+    async def _selecionar_serventia(page: Page, serventia: str) -> bool:
+        """Seleciona a serventia da credencial com múltiplas estratégias"""
         try:
             # Aguardar página carregar
             await page.wait_for_load_state('domcontentloaded', timeout=15000)
@@ -135,7 +150,7 @@ class LoginManager:
                 
                 # Tentar múltiplas variações do nome da serventia
                 variacoes_serventia = [
-                    settings.default_serventia,
+                    serventia,
                     "Advogados",
                     "OAB",
                     "25348-N-GO"
@@ -271,7 +286,7 @@ class BuscaManager:
             
             # Navegar para página de busca correta (URL descoberta na análise)
             busca_url = f"{self.base_url}/BuscaProcesso"
-            await session.page.goto(busca_url, timeout=30000)
+            await session.navegar(busca_url, timeout=30000)
             try:
                 await session.page.wait_for_load_state('networkidle', timeout=30000)
             except Exception:
@@ -482,7 +497,7 @@ class BuscaManager:
                                 indice=len(processos) + 1
                             )
                             processos.append(processo)
-                            logger.info(f"✅ Processo extraído: {numero_processo}")
+                            logger.debug("✅ Processo extraído: {}", numero_processo)
                             
                 except Exception as e:
                     logger.warning(f"⚠️ Erro ao processar linha {i}: {e}")
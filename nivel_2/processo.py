@@ -16,6 +16,9 @@ from loguru import logger
 
 from config import settings
 from core.session_manager import Session
+from core.metricas import metricas
+from core.tracing import tracing
+from core.cronometro import marcar
 from nivel_1.busca import ProcessoEncontrado
 
 @dataclass
@@ -103,7 +106,7 @@ class ProcessoManager:
             
             # Se já estamos na página do processo (busca direta), não precisa clicar
             if processo.id_processo == "processo_direto":
-                logger.info("ℹ️ Já estamos na página do processo")
+                logger.debug("ℹ️ Já estamos na página do processo")
                 return True
             
             # Estratégia 1: Encontrar o processo correto na tabela pelo número
@@ -113,7 +116,7 @@ class ProcessoManager:
                 
                 # Procurar especificamente nas linhas do tbody
                 linhas = await session.page.query_selector_all('table#Tabela tbody tr')
-                logger.info(f"🔍 Analisando {len(linhas)} linhas da tabela")
+                logger.debug("🔍 Analisando {} linhas da tabela", len(linhas))
                 
                 for i, linha in enumerate(linhas):
                     try:
@@ -122,13 +125,13 @@ class ProcessoManager:
                             numero_na_linha = await colunas[2].inner_text()  # TD3 tem o número
                             numero_limpo = numero_na_linha.strip()
                             
-                            logger.debug(f"  Linha {i+1}: {numero_limpo}")
+                            logger.debug("  Linha {}: {}", i + 1, numero_limpo)
                             
                             if numero_limpo == processo.numero:
                                 # Encontrou a linha correta! Buscar botão na coluna 6 (TD6)
                                 btn_editar = await colunas[5].query_selector('button[name="formLocalizarimgEditar"]')
                                 if btn_editar:
-                                    logger.info(f"🎯 Processo encontrado na linha {i+1}, clicando no botão...")
+                                    logger.debug("🎯 Processo encontrado na linha {}, clicando no botão...", i + 1)
                                     await btn_editar.click()
                                     await session.page.wait_for_load_state('networkidle', timeout=15000)
                                     logger.info(f"✅ Processo {processo.numero} acessado via busca na tabela")
@@ -136,7 +139,7 @@ class ProcessoManager:
                                 else:
                                     logger.warning(f"⚠️ Linha encontrada mas botão não localizado na coluna 6")
                     except Exception as e:
-                        logger.debug(f"⚠️ Erro ao processar linha {i+1}: {e}")
+                        logger.debug("⚠️ Erro ao processar linha {}: {}", i + 1, e)
                         continue
                 
                 logger.warning(f"⚠️ Processo {processo.numero} não encontrado na tabela")
@@ -225,7 +228,8 @@ class ProcessoManager:
         """Extrai partes no novo modo detalhado (opcional)."""
         return await self._extrair_partes_navegacao_detalhada(session)
     
-    async def buscar_processo_especifico(self, session: Session, numero_processo: str, limite_movimentacoes: Optional[int] = None) -> Optional[DadosProcesso]:
+    async def buscar_processo_especifico(self, session: Session, numero_processo: str, limite_movimentacoes: Optional[int] = None,
+                                         extrair_movimentacoes: bool = True) -> Optional[DadosProcesso]:
         """Busca um processo específico diretamente no nível 2 (contorna nível 1)"""
         try:
             logger.info(f"🔍 Buscando processo específico: {numero_processo}")
@@ -238,7 +242,7 @@ class ProcessoManager:
             
             # Navegar para página de busca
             busca_url = f"{self.base_url}/BuscaProcesso"
-            await session.page.goto(busca_url, timeout=15000)
+            await session.navegar(busca_url, timeout=15000)
             await session.page.wait_for_load_state('networkidle', timeout=15000)
             
             # Preencher número do processo
@@ -265,7 +269,9 @@ class ProcessoManager:
                 )
                 
                 # Extrair dados completos com limite de movimentações
-                return await self.extrair_dados_processo(session, processo_temp, limite_movimentacoes)
+                return await self.extrair_dados_processo(
+                    session, processo_temp, limite_movimentacoes, extrair_movimentacoes=extrair_movimentacoes
+                )
             except Exception:
                 logger.warning(f"⚠️ Processo {numero_processo} não encontrado ou não acessível")
                 return None
@@ -274,8 +280,9 @@ class ProcessoManager:
             logger.error(f"❌ Erro ao buscar processo específico {numero_processo}: {e}")
             return None
     
-    async def extrair_dados_processo(self, session: Session, processo: ProcessoEncontrado, limite_movimentacoes: Optional[int] = None) -> DadosProcesso:
-        """Extrai dados completos de um processo"""
+    async def extrair_dados_processo(self, session: Session, processo: ProcessoEncontrado, limite_movimentacoes: Optional[int] = None,
+                                     extrair_movimentacoes: bool = True) -> DadosProcesso:
+        """Extrai dados completos de um processo (movimentações opcionais: exigem navegar à página de arquivos)"""
         try:
             logger.info(f"📋 Extraindo dados do processo {processo.numero}")
             
@@ -283,7 +290,10 @@ class ProcessoManager:
             dados_basicos = await self._extrair_dados_basicos(session.page)
             
             # Extrair movimentações
-            movimentacoes = await self._extrair_movimentacoes(session, limite_movimentacoes)
+            movimentacoes = []
+            if extrair_movimentacoes:
+                with metricas.medir_etapa("movimentacoes"):
+                    movimentacoes = await self._extrair_movimentacoes(session, limite_movimentacoes)
             
             # Adicionar número do processo a cada movimentação
             for mov in movimentacoes:
@@ -310,7 +320,7 @@ class ProcessoManager:
 
             # Retornar à página de busca para estabilizar a próxima iteração
             try:
-                await session.page.goto(f"{self.base_url}/BuscaProcesso", timeout=15000)
+                await session.navegar(f"{self.base_url}/BuscaProcesso", timeout=15000)
                 await session.page.wait_for_load_state('domcontentloaded', timeout=15000)
             except Exception:
                 pass
@@ -388,36 +398,40 @@ class ProcessoManager:
     async def _extrair_movimentacoes(self, session: Session, limite: Optional[int] = None) -> List[Movimentacao]:
         """Extrai movimentações navegando para página de arquivos (baseado na versão PLUS)"""
         try:
-            logger.info("📋 Extraindo movimentações - navegando para página de arquivos...")
+            logger.debug("📋 Extraindo movimentações - navegando para página de arquivos...")
             
             movimentacoes = []
+            estrategia = ""  # Estratégia que produziu as movimentações (atributo do span)
             
             # ESTRATÉGIA PRINCIPAL: Tentar extrair da página atual primeiro (mais eficiente)
-            logger.info("🔍 Tentando extrair movimentações da página atual...")
+            logger.debug("🔍 Tentando extrair movimentações da página atual...")
             
             # Verificar se já tem TabelaArquivos na página atual
             if await session.page.query_selector('table#TabelaArquivos'):
-                logger.info("🔍 TabelaArquivos encontrada na página atual")
+                logger.debug("🔍 TabelaArquivos encontrada na página atual")
                 movimentacoes = await self._extrair_movimentacoes_tabela_arquivos_inteligente(session.page)
+                estrategia = "tabela_arquivos"
                 
             # Se não conseguiu, tentar navegar para página de arquivos
             if not movimentacoes:
-                logger.info("🔍 Navegando para página de navegação de arquivos...")
+                logger.debug("🔍 Navegando para página de navegação de arquivos...")
                 navegacao_url = f"{self.base_url}/BuscaProcesso?PaginaAtual=9&PassoBusca=4"
                 
                 try:
-                    await session.page.goto(navegacao_url, timeout=30000)
+                    await session.navegar(navegacao_url, timeout=30000)
                     await session.page.wait_for_load_state('networkidle', timeout=30000)
-                    logger.info("✅ Página de navegação carregada")
+                    logger.debug("✅ Página de navegação carregada")
                     
                     # Verificar se chegou na página correta (estrutura HTML ou tabela)
                     content = await session.page.content()
                     if "menuNavegacao" in content and "Movimentações Processo" in content:
-                        logger.info("🔍 Página de navegação HTML encontrada - extraindo movimentações...")
+                        logger.debug("🔍 Página de navegação HTML encontrada - extraindo movimentações...")
                         movimentacoes = await self._extrair_movimentacoes_navegacao_html(session.page)
+                        estrategia = "navegacao_html"
                     elif await session.page.query_selector('table#TabelaArquivos'):
-                        logger.info("🔍 TabelaArquivos encontrada - extraindo movimentações...")
+                        logger.debug("🔍 TabelaArquivos encontrada - extraindo movimentações...")
                         movimentacoes = await self._extrair_movimentacoes_tabela_arquivos_inteligente(session.page)
+                        estrategia = "tabela_arquivos"
                     else:
                         logger.warning("⚠️ Nenhuma estrutura de movimentações encontrada na página de navegação")
                         
@@ -426,22 +440,28 @@ class ProcessoManager:
             
             # FALLBACK: Se não conseguiu pela navegação, tentar estratégias alternativas
             if not movimentacoes:
-                logger.info("🔍 Tentando estratégias de fallback...")
+                logger.debug("🔍 Tentando estratégias de fallback...")
                 
                 # Verificar se já tem TabelaArquivos na página atual
                 if await session.page.query_selector('table#TabelaArquivos'):
-                    logger.info("🔍 TabelaArquivos encontrada na página atual")
+                    logger.debug("🔍 TabelaArquivos encontrada na página atual")
                     movimentacoes = await self._extrair_movimentacoes_tabela_arquivos_inteligente(session.page)
+                    estrategia = "tabela_arquivos"
                 
                             # Se ainda não tem, tentar página principal com Playwright
             if not movimentacoes:
-                logger.info("🔍 Tentando página principal com Playwright")
+                logger.debug("🔍 Tentando página principal com Playwright")
                 movimentacoes = await self._extrair_movimentacoes_playwright(session)
+                estrategia = "pagina_principal"
             
             # Último recurso: análise geral
             if not movimentacoes:
-                logger.info("🔍 Análise geral como último recurso")
+                logger.debug("🔍 Análise geral como último recurso")
                 movimentacoes = await self._extrair_movimentacoes_fallback(session.page)
+                estrategia = "fallback"
+                marcar("fallback_movimentacoes")
+            
+            tracing.anotar({"projudi.movimentacoes_estrategia": estrategia or "nenhuma"})
             
             if movimentacoes:
                 # Limpar e melhorar dados extraídos
@@ -462,6 +482,7 @@ class ProcessoManager:
                 logger.info(f"✅ {len(movimentacoes)} movimentações extraídas com sucesso")
             else:
                 logger.warning("⚠️ Nenhuma movimentação encontrada")
+                marcar("movimentacoes_vazias")
             
             return movimentacoes
             
@@ -478,7 +499,7 @@ class ProcessoManager:
             
             # ESTRATÉGIA 1: Verificar se estamos na página de navegação HTML (formato PLUS)
             if "Movimentações Processo" in content and "menuNavegacao" in content:
-                logger.info("🔍 Página de navegação HTML detectada - usando extração especializada")
+                logger.debug("🔍 Página de navegação HTML detectada - usando extração especializada")
                 return await self._extrair_movimentacoes_navegacao_html(page)
             
             # ESTRATÉGIA 2: Tentar múltiplas estratégias para encontrar a tabela
@@ -520,7 +541,7 @@ class ProcessoManager:
             content = await page.content()
             soup = BeautifulSoup(content, 'html.parser')
             
-            logger.info("🔍 Extraindo movimentações da estrutura HTML de navegação")
+            logger.debug("🔍 Extraindo movimentações da estrutura HTML de navegação")
             
             # Encontrar o div de navegação
             navegacao_div = soup.find('div', {'id': 'menuNavegacao'})
@@ -1361,8 +1382,8 @@ class ProcessoManager:
             content_inicial = await session.page.content()
             
             # Verificação mais flexível - tentamos extrair independente da página
-            logger.info(f"🔍 URL atual: {url_atual}")
-            logger.info(f"🔍 Procurando partes na página atual...")
+            logger.debug("🔍 URL atual: {}", url_atual)
+            logger.debug("🔍 Procurando partes na página atual...")
             
             # Se não estamos em página específica, tentar extrair da página atual mesmo assim
             if "corpo_dados_processo" not in content_inicial and "ProcessoParte" not in url_atual:
@@ -1375,7 +1396,7 @@ class ProcessoManager:
             }
             
             # ESTRATÉGIA ROBUSTA: Extrair partes da página atual SEM navegar
-            logger.info("🔍 Extraindo partes da página atual...")
+            logger.debug("🔍 Extraindo partes da página atual...")
             partes = await self._extrair_partes_da_pagina(session.page)
             
             # Se não encontrou na página atual, tentar navegar (sem timeout longo)
@@ -1384,7 +1405,7 @@ class ProcessoManager:
                 try:
                     # URL mais direta e confiável
                     url_partes = f"{self.base_url}/ProcessoParte?PaginaAtual=2"
-                    await session.page.goto(url_partes, timeout=10000, wait_until='domcontentloaded')
+                    await session.navegar(url_partes, timeout=10000, wait_until='domcontentloaded')
                     await asyncio.sleep(1)  # Aguardar mínimo
                     
                     # Verificar se carregou
@@ -1423,12 +1444,12 @@ class ProcessoManager:
             }
             # Passo 1: página 6 e aguardo
             try:
-                await session.page.goto(f"{self.base_url}/ProcessoParte?PaginaAtual=6", timeout=15000, wait_until='domcontentloaded')
+                await session.navegar(f"{self.base_url}/ProcessoParte?PaginaAtual=6", timeout=15000, wait_until='domcontentloaded')
             except Exception as e:
                 logger.warning(f"⚠️ Falha ao abrir PaginaAtual=6: {e}")
             await asyncio.sleep(1)
             # Passo 2: página 2 para extração
-            await session.page.goto(f"{self.base_url}/ProcessoParte?PaginaAtual=2", timeout=15000, wait_until='domcontentloaded')
+            await session.navegar(f"{self.base_url}/ProcessoParte?PaginaAtual=2", timeout=15000, wait_until='domcontentloaded')
             await asyncio.sleep(1)
             fieldsets_config = {
                 'polo_ativo': 'fieldset.VisualizaDados:nth-child(6)',
@@ -1439,7 +1460,7 @@ class ProcessoManager:
                 try:
                     extraidas = await self._extrair_partes_fieldset_detalhado(session, tipo_parte)
                     partes[tipo_parte].extend(extraidas)
-                    logger.info(f"✅ {len(extraidas)} partes extraídas em {tipo_parte} (detalhado)")
+                    logger.debug("✅ {} partes extraídas em {} (detalhado)", len(extraidas), tipo_parte)
                 except Exception as e:
                     logger.warning(f"⚠️ Erro ao extrair {tipo_parte} (detalhado): {e}")
             logger.info(f"🎯 Extração detalhada concluída: {sum(len(v) for v in partes.values())} partes")
@@ -1477,7 +1498,7 @@ class ProcessoManager:
                     seletor_usado = candidato
                     break
             if not seletor_usado:
-                logger.info(f"ℹ️ Nenhum botão 'Editar' encontrado em {tipo_parte}")
+                logger.debug("ℹ️ Nenhum botão 'Editar' encontrado em {}", tipo_parte)
                 return partes_extraidas
             i = 0
             while True:
@@ -1568,12 +1589,12 @@ class ProcessoManager:
                 'outros': []
             }
             
-            logger.info("🔍 Iniciando extração inteligente de partes...")
+            logger.debug("🔍 Iniciando extração inteligente de partes...")
             
             # Estratégia 1: Fieldsets com legendas (mais comum)
             partes_fieldsets = self._extrair_partes_fieldsets(soup)
             if any(partes_fieldsets.values()):
-                logger.info(f"✅ Estratégia 1 (Fieldsets): Encontradas {sum(len(v) for v in partes_fieldsets.values())} partes")
+                logger.debug("✅ Estratégia 1 (Fieldsets): Encontradas {} partes", sum(len(v) for v in partes_fieldsets.values()))
                 for categoria, lista_partes in partes_fieldsets.items():
                     partes[categoria].extend(lista_partes)
             
@@ -1581,7 +1602,7 @@ class ProcessoManager:
             if not any(partes.values()):
                 partes_tabelas = self._extrair_partes_tabelas(soup)
                 if any(partes_tabelas.values()):
-                    logger.info(f"✅ Estratégia 2 (Tabelas): Encontradas {sum(len(v) for v in partes_tabelas.values())} partes")
+                    logger.debug("✅ Estratégia 2 (Tabelas): Encontradas {} partes", sum(len(v) for v in partes_tabelas.values()))
                     for categoria, lista_partes in partes_tabelas.items():
                         partes[categoria].extend(lista_partes)
             
@@ -1589,7 +1610,7 @@ class ProcessoManager:
             if not any(partes.values()):
                 partes_divs = self._extrair_partes_divs(soup)
                 if any(partes_divs.values()):
-                    logger.info(f"✅ Estratégia 3 (Divs): Encontradas {sum(len(v) for v in partes_divs.values())} partes")
+                    logger.debug("✅ Estratégia 3 (Divs): Encontradas {} partes", sum(len(v) for v in partes_divs.values()))
                     for categoria, lista_partes in partes_divs.items():
                         partes[categoria].extend(lista_partes)
             
@@ -1597,7 +1618,7 @@ class ProcessoManager:
             if not any(partes.values()):
                 partes_texto = self._extrair_partes_texto_inteligente(soup)
                 if any(partes_texto.values()):
-                    logger.info(f"✅ Estratégia 4 (Texto): Encontradas {sum(len(v) for v in partes_texto.values())} partes")
+                    logger.debug("✅ Estratégia 4 (Texto): Encontradas {} partes", sum(len(v) for v in partes_texto.values()))
                     for categoria, lista_partes in partes_texto.items():
                         partes[categoria].extend(lista_partes)
             
@@ -1605,7 +1626,7 @@ class ProcessoManager:
             if not any(partes.values()):
                 partes_fallback = self._extrair_partes_fallback(soup)
                 if any(partes_fallback.values()):
-                    logger.info(f"✅ Estratégia 5 (Fallback): Encontradas {sum(len(v) for v in partes_fallback.values())} partes")
+                    logger.debug("✅ Estratégia 5 (Fallback): Encontradas {} partes", sum(len(v) for v in partes_fallback.values()))
                     for categoria, lista_partes in partes_fallback.items():
                         partes[categoria].extend(lista_partes)
             
@@ -2039,7 +2060,7 @@ class ProcessoManager:
             # ESTRATÉGIA CORRETA: Buscar APENAS por <span class="span1"> que contém os nomes reais
             spans_nomes = fieldset.find_all('span', {'class': 'span1'})
             
-            logger.info(f"🔍 Fieldset {tipo_polo}: {len(spans_nomes)} spans com nomes encontrados")
+            logger.debug("🔍 Fieldset {}: {} spans com nomes encontrados", tipo_polo, len(spans_nomes))
             
             for span in spans_nomes:
                 try:
@@ -2067,14 +2088,14 @@ class ProcessoManager:
                             )
                             
                             partes.append(parte)
-                            logger.debug(f"  ✅ Parte adicionada: {nome_limpo}")
+                            logger.debug("  ✅ Parte adicionada: {}", nome_limpo)
                         else:
-                            logger.debug(f"  ❌ Nome rejeitado pelo filtro: {nome_limpo}")
+                            logger.debug("  ❌ Nome rejeitado pelo filtro: {}", nome_limpo)
                     else:
                         if nome_limpo in nomes_unicos:
-                            logger.debug(f"  ❌ Nome duplicado: {nome_limpo}")
+                            logger.debug("  ❌ Nome duplicado: {}", nome_limpo)
                         else:
-                            logger.debug(f"  ❌ Nome inválido: {nome_limpo}")
+                            logger.debug("  ❌ Nome inválido: {}", nome_limpo)
                             
                 except Exception as e:
                     logger.warning(f"⚠️ Erro ao processar span: {e}")
@@ -2082,7 +2103,7 @@ class ProcessoManager:
             
             # FALLBACK: Se não encontrou spans, usar estratégia anterior (mais restritiva)
             if not partes:
-                logger.info(f"🔄 Fallback: Usando extração por texto para {tipo_polo}")
+                logger.debug("🔄 Fallback: Usando extração por texto para {}", tipo_polo)
                 
                 # Obter texto completo do fieldset, mas excluir divs de endereço
                 fieldset_copy = fieldset.__copy__()
@@ -2128,7 +2149,7 @@ class ProcessoManager:
                             
                             partes.append(parte)
             
-            logger.info(f"📋 Fieldset {tipo_polo}: {len(partes)} partes únicas extraídas")
+            logger.debug("📋 Fieldset {}: {} partes únicas extraídas", tipo_polo, len(partes))
             return partes
             
         except Exception as e:
@@ -10,7 +10,7 @@ import re
 import time
 import hashlib
 from typing import Dict, List, Optional, Any, Union
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError, Download
@@ -20,7 +20,12 @@ from loguru import logger
 
 from config import settings
 from core.session_manager import Session
+from core.http_client import http_client_manager, ResultadoDownload, DownloadExcedeuLimite
+from core.tracing import tracing
 from nivel_2.processo import Movimentacao
+from nivel_3.extrator_pdf import extrator_pdf
+from nivel_3.ocr import motor_ocr
+from nivel_3.armazenamento import armazem_anexos
 
 @dataclass
 class AnexoInfo:
@@ -32,6 +37,7 @@ class AnexoInfo:
     tamanho_bytes: int = 0
     movimentacao_numero: int = 0
     hash_conteudo: str = ""
+    numero_processo: str = ""
 
 @dataclass
 class AnexoProcessado:
@@ -45,32 +51,77 @@ class AnexoProcessado:
     erro_processamento: str = ""
     tempo_processamento: float = 0.0
 
+@dataclass
+class CapturaAnexo:
+    """Material bruto de um anexo lido do iframe, antes do download/extração"""
+    movimentacao: Movimentacao
+    tipo_arquivo: str  # PDF ou HTML
+    url_pdf: str = ""
+    credencial: str = ""  # login da sessão (cliente HTTP e limite de taxa do download)
+    cookies: List[Dict[str, Any]] = field(default_factory=list)
+    html_content: str = ""
+    inicio: float = 0.0
+
+# Coleta todos os links de arquivo da página de navegação com a movimentação a que pertencem
+SCRIPT_COLETAR_LINKS_ARQUIVOS = """
+() => {
+    const numeroDaLinha = (el) => {
+        let linha = el.closest('tr, li');
+        while (linha) {
+            const celula = linha.querySelector('td') || linha;
+            const match = (celula.textContent || '').trim().match(/^(\\d+)/);
+            if (match) return parseInt(match[1]);
+            linha = linha.previousElementSibling;
+        }
+        return null;
+    };
+    const links = [];
+    const vistos = new Set();
+    document.querySelectorAll('a[href*="Id_MovimentacaoArquivo"]').forEach((a) => {
+        const match = a.href.match(/Id_MovimentacaoArquivo=([^&]+)/);
+        if (!match || vistos.has(match[1])) return;
+        vistos.add(match[1]);
+        const drop = a.closest('[id_movi]');
+        links.push({
+            id_arquivo: match[1],
+            url: a.href,
+            nome: (a.textContent || '').trim(),
+            numero: numeroDaLinha(a),
+            id_movi: drop ? drop.getAttribute('id_movi') : ''
+        });
+    });
+    return links;
+}
+"""
+
 class PDFProcessor:
     """Processador de PDFs com múltiplas estratégias"""
     
     @staticmethod
-    async def extrair_texto_pdf(caminho_arquivo: str) -> tuple[str, str]:
-        """Extrai texto de PDF usando estratégia simplificada"""
+    async def extrair_texto_pdf(caminho_arquivo: str, hash_conteudo: str = "") -> tuple[str, str]:
+        """Extrai texto de PDF página a página no pool de processos"""
         try:
-            conteudo = ""
-            metodo = "erro"
+            if not os.path.exists(caminho_arquivo):
+                return "Arquivo PDF não encontrado", "erro"
 
-            # Estratégia simplificada: tentar extrair metadados básicos
-            try:
-                # Verificar se o arquivo existe e tem tamanho
-                if os.path.exists(caminho_arquivo):
-                    tamanho = os.path.getsize(caminho_arquivo)
-                    conteudo = f"PDF processado: {caminho_arquivo} (tamanho: {tamanho} bytes)"
-                    metodo = "metadados"
-                    logger.info(f"✅ PDF processado: {caminho_arquivo}")
-                    return conteudo, metodo
-                else:
-                    return "Arquivo PDF não encontrado", "erro"
+            resultado = await extrator_pdf.extrair(caminho_arquivo, hash_conteudo)
+            if resultado.erro:
+                return "", "erro"
 
-            except Exception as e:
-                logger.warning(f"⚠️ Erro ao processar PDF: {e}")
+            if resultado.texto.strip():
+                return resultado.texto, "pdf_texto"
 
-            return "Não foi possível extrair texto do PDF (funcionalidade de PDF removida)", "erro"
+            # Sem camada de texto: documento digitalizado, tentar OCR
+            logger.info("🖼️ PDF sem camada de texto, encaminhando para OCR...")
+            resultado_ocr = await motor_ocr.extrair(
+                caminho_arquivo,
+                resultado.paginas_total,
+                resultado.hash_conteudo
+            )
+            if resultado_ocr.texto:
+                return resultado_ocr.texto, "ocr"
+
+            return "", "erro"
 
         except Exception as e:
             logger.error(f"❌ Erro geral ao processar PDF: {e}")
@@ -107,7 +158,7 @@ class AnexosManager:
             resultado = await session.page.evaluate(script_outras)
             if resultado:
                 await asyncio.sleep(1)
-                logger.info("✅ Menu 'Outras' clicado")
+                logger.debug("✅ Menu 'Outras' clicado")
                 
                 # Script para clicar em "Solicitar Acesso"
                 script_solicitar = """
@@ -151,12 +202,12 @@ class AnexosManager:
             
             # URL da página de navegação (igual à versão PLUS)
             navegacao_url = f"{self.base_url}/BuscaProcesso?PaginaAtual=9&PassoBusca=4"
-            await session.page.goto(navegacao_url, timeout=30000)
+            await session.navegar(navegacao_url, timeout=30000)
             await session.page.wait_for_load_state('networkidle', timeout=30000)
             
             # Verificar se chegou na página correta
             if await session.page.query_selector('table#TabelaArquivos'):
-                logger.info("✅ Página de navegação carregada")
+                logger.debug("✅ Página de navegação carregada")
                 return True
             else:
                 logger.warning("⚠️ Página de navegação não carregou corretamente")
@@ -166,70 +217,409 @@ class AnexosManager:
             logger.error(f"❌ Erro ao acessar navegação: {e}")
             return False
     
-    async def extrair_anexos_movimentacoes(self, session: Session, movimentacoes: List[Movimentacao], limite: Optional[int] = None) -> List[AnexoProcessado]:
-        """Extrai anexos das movimentações"""
+    async def listar_anexos(self, session: Session, movimentacoes: List[Movimentacao], limite: Optional[int] = None) -> List[AnexoInfo]:
+        """Lista os descritores dos anexos (sem baixar nem extrair conteúdo)"""
         try:
-            logger.info(f"📎 Extraindo anexos de {len(movimentacoes)} movimentações...")
-            
-            # Filtrar movimentações que têm anexos
             movimentacoes_com_anexo = [m for m in movimentacoes if m.tem_anexo]
-            
+            if limite:
+                movimentacoes_com_anexo = movimentacoes_com_anexo[:limite]
             if not movimentacoes_com_anexo:
                 logger.info("ℹ️ Nenhuma movimentação com anexos encontrada")
                 return []
+
+            anexos = await self.coletar_anexos(session, movimentacoes_com_anexo)
+
+            # Movimentações sem URL identificada: descritor resolvido depois pelo fluxo do iframe
+            numeros_coletados = {a.movimentacao_numero for a in anexos}
+            for movimentacao in movimentacoes_com_anexo:
+                if movimentacao.numero not in numeros_coletados:
+                    anexos.append(AnexoInfo(
+                        id_arquivo=self.id_anexo_movimentacao(movimentacao.numero),
+                        nome_arquivo=f"anexo_mov_{movimentacao.numero}",
+                        url_anexo="",
+                        tipo_arquivo="",
+                        movimentacao_numero=movimentacao.numero,
+                        numero_processo=movimentacao.numero_processo
+                    ))
+
+            # Completar com o que o store já sabe (hash, tipo e tamanho)
+            for anexo in anexos:
+                registro = await armazem_anexos.buscar_por_arquivo(anexo.numero_processo, anexo.id_arquivo)
+                if registro:
+                    anexo.hash_conteudo = registro['hash']
+                    anexo.tipo_arquivo = registro.get('tipo_arquivo') or anexo.tipo_arquivo
+                    anexo.tamanho_bytes = registro.get('tamanho_bytes') or 0
+
+            logger.info(f"📎 {len(anexos)} anexos listados de {len(movimentacoes_com_anexo)} movimentações")
+            return anexos
+
+        except Exception as e:
+            logger.error(f"❌ Erro ao listar anexos: {e}")
+            return []
+
+    async def baixar_anexos(self, session: Session, movimentacoes: List[Movimentacao], anexos: List[AnexoInfo]) -> List[AnexoProcessado]:
+        """Baixa e extrai os anexos listados: os com URL por HTTP, concorrentes, enquanto o
+        navegador captura pelo iframe os sem URL (mov-N)"""
+        por_numero = {m.numero: m for m in movimentacoes}
+        com_url = [a for a in anexos if a.url_anexo]
+        via_iframe = [por_numero[a.movimentacao_numero] for a in anexos if not a.url_anexo and a.movimentacao_numero in por_numero]
+        resultados_http, resultados_iframe = await asyncio.gather(
+            self.processar_anexos_coletados(session, com_url),
+            self._extrair_anexos_via_iframe(session, via_iframe)
+        )
+        logger.info(f"✅ {len(resultados_http) + len(resultados_iframe)} de {len(anexos)} anexos processados")
+        return resultados_http + resultados_iframe
+
+    @staticmethod
+    def id_anexo_movimentacao(numero_movimentacao: int) -> str:
+        """Id sintético de anexo cuja URL só é obtida abrindo o iframe da movimentação"""
+        return f"mov-{numero_movimentacao}"
+
+    async def obter_anexo_armazenado(self, numero_processo: str, id_arquivo: str) -> Optional[AnexoProcessado]:
+        """Monta um anexo já processado a partir do store, restaurando o arquivo para leitura"""
+        registro = await armazem_anexos.buscar_por_arquivo(numero_processo, id_arquivo)
+        if not registro:
+            return None
+
+        hash_conteudo = registro['hash']
+        texto_armazenado = await armazem_anexos.obter_texto(hash_conteudo) or {}
+        caminho_arquivo = str(self.downloads_dir / f"anexo_cache_{hash_conteudo}")
+        if not os.path.exists(caminho_arquivo):
+            if not await armazem_anexos.restaurar_arquivo(hash_conteudo, caminho_arquivo):
+                caminho_arquivo = ""
+        if not texto_armazenado and not caminho_arquivo:
+            return None
+
+        conteudo = texto_armazenado.get('conteudo', '')
+        return AnexoProcessado(
+            anexo_info=AnexoInfo(
+                id_arquivo=id_arquivo,
+                nome_arquivo=registro.get('nome_arquivo') or id_arquivo,
+                url_anexo="",
+                tipo_arquivo=registro.get('tipo_arquivo') or texto_armazenado.get('tipo_arquivo', ''),
+                tamanho_bytes=registro.get('tamanho_bytes') or 0,
+                movimentacao_numero=registro['movimentacao_numero'],
+                hash_conteudo=hash_conteudo,
+                numero_processo=numero_processo
+            ),
+            conteudo_extraido=conteudo,
+            tamanho_conteudo=len(conteudo),
+            metodo_extracao=texto_armazenado.get('metodo', 'erro'),
+            arquivo_baixado=caminho_arquivo,
+            sucesso_processamento=len(conteudo) > 0
+        )
+
+    async def obter_anexo_sob_demanda(self, session: Session, movimentacoes: List[Movimentacao], id_arquivo: str) -> Optional[AnexoProcessado]:
+        """Baixa e extrai um único anexo do processo aberto na sessão"""
+        movimentacoes_com_anexo = [m for m in movimentacoes if m.tem_anexo]
+
+        if id_arquivo.startswith("mov-"):
+            numero = int(id_arquivo[4:]) if id_arquivo[4:].isdigit() else None
+            movimentacao = next((m for m in movimentacoes_com_anexo if m.numero == numero), None)
+            if not movimentacao:
+                return None
+            anexos = await self._extrair_anexos_movimentacao(session, movimentacao)
+            anexo = anexos[0] if anexos else None
+        else:
+            coletados = await self.coletar_anexos(session, movimentacoes_com_anexo, id_procurado=id_arquivo)
+            anexo_info = next((a for a in coletados if a.id_arquivo == id_arquivo), None)
+            if not anexo_info:
+                return None
+            anexo = (await self.processar_anexos_coletados(session, [anexo_info]) or [None])[0]
+
+        # Indexar também pelo id pedido, para a próxima consulta sair direto do store
+        if anexo and anexo.anexo_info.hash_conteudo and anexo.anexo_info.id_arquivo != id_arquivo:
+            info = anexo.anexo_info
+            await armazem_anexos.indexar(
+                info.numero_processo, info.movimentacao_numero, id_arquivo,
+                info.hash_conteudo, info.nome_arquivo, info.tipo_arquivo, info.tamanho_bytes
+            )
+            info.id_arquivo = id_arquivo
+        return anexo
+
+    async def coletar_anexos(self, session: Session, movimentacoes: List[Movimentacao], id_procurado: Optional[str] = None) -> List[AnexoInfo]:
+        """Fase 1: coleta URL e id de cada arquivo das movimentações selecionadas
+
+        Sem `id_procurado` (listagem) usa só os links já presentes na página; a consulta
+        por movimentação (buscarArquivosMovimentacaoJSON) fica para o anexo pedido sob demanda.
+        """
+        try:
+            # Garantir que estamos na página de navegação
+            if not await session.page.query_selector('table#TabelaArquivos'):
+                if not await self.acessar_navegacao_arquivos(session):
+                    return []
             
-            # Aplicar limite se especificado
-            if limite:
-                movimentacoes_com_anexo = movimentacoes_com_anexo[:limite]
-                
-            logger.info(f"📎 Processando {len(movimentacoes_com_anexo)} movimentações com anexos")
-            
-            anexos_processados = []
-            
-            for i, movimentacao in enumerate(movimentacoes_com_anexo, 1):
-                logger.info(f"📄 Processando anexos da movimentação {i}/{len(movimentacoes_com_anexo)}: {movimentacao.numero}")
-                
-                # Extrair anexos da movimentação
-                anexos_mov = await self._extrair_anexos_movimentacao(session, movimentacao)
-                anexos_processados.extend(anexos_mov)
-                
-                # Aguardar um pouco entre movimentações
-                await asyncio.sleep(1)
+            por_id_movi = {m.id_movimentacao: m for m in movimentacoes if m.id_movimentacao}
+            por_numero = {m.numero: m for m in movimentacoes}
+            anexos: Dict[str, AnexoInfo] = {}
+            
+            def registrar(links: List[Dict[str, Any]], movimentacao_padrao: Optional[Movimentacao] = None):
+                for link in links:
+                    if link['id_arquivo'] in anexos:
+                        continue
+                    movimentacao = (
+                        por_id_movi.get(link.get('id_movi') or '') or
+                        por_numero.get(link.get('numero')) or
+                        movimentacao_padrao
+                    )
+                    if not movimentacao:
+                        continue
+                    anexos[link['id_arquivo']] = AnexoInfo(
+                        id_arquivo=link['id_arquivo'],
+                        nome_arquivo=link.get('nome') or f"anexo_mov_{movimentacao.numero}",
+                        url_anexo=link['url'],
+                        tipo_arquivo="",
+                        movimentacao_numero=movimentacao.numero,
+                        numero_processo=movimentacao.numero_processo
+                    )
+            
+            # Links já presentes na página
+            registrar(await session.page.evaluate(SCRIPT_COLETAR_LINKS_ARQUIVOS))
+            
+            # Movimentações cujos arquivos só aparecem após buscarArquivosMovimentacaoJSON
+            numeros_coletados = {a.movimentacao_numero for a in anexos.values()}
+            a_consultar = movimentacoes if id_procurado else []
+            for movimentacao in a_consultar:
+                if id_procurado in anexos:
+                    break
+                if movimentacao.numero in numeros_coletados or not movimentacao.codigo_anexo:
+                    continue
+                try:
+                    await session.page.evaluate(
+                        "(codigo) => buscarArquivosMovimentacaoJSON(codigo, 'BuscaProcesso', 'Id_MovimentacaoArquivo', 6, 'false')",
+                        movimentacao.codigo_anexo
+                    )
+                    try:
+                        await session.page.wait_for_load_state('networkidle', timeout=5000)
+                    except PlaywrightTimeoutError:
+                        pass
+                    registrar(await session.page.evaluate(SCRIPT_COLETAR_LINKS_ARQUIVOS), movimentacao)
+                except Exception as e:
+                    logger.debug(f"⚠️ Falha ao listar arquivos da movimentação {movimentacao.numero}: {e}")
             
-            logger.info(f"✅ {len(anexos_processados)} anexos processados")
-            return anexos_processados
+            logger.info(f"🔗 {len(anexos)} arquivos coletados de {len(movimentacoes)} movimentações")
+            return list(anexos.values())
             
         except Exception as e:
-            logger.error(f"❌ Erro ao extrair anexos: {e}")
+            logger.error(f"❌ Erro ao coletar anexos: {e}")
             return []
     
+    async def processar_anexos_coletados(self, session: Session, anexos: List[AnexoInfo]) -> List[AnexoProcessado]:
+        """Fase 2: baixa e extrai os anexos coletados com número limitado de workers"""
+        if not anexos:
+            return []
+        
+        cookies = await session.context.cookies()
+        semaforo = asyncio.Semaphore(max(1, settings.anexos_workers))
+        
+        async def processar(anexo_info: AnexoInfo) -> Optional[AnexoProcessado]:
+            async with semaforo:
+                with tracing.span("anexo", {
+                    "projudi.anexo": anexo_info.id_arquivo,
+                    "projudi.movimentacao": anexo_info.movimentacao_numero,
+                    "projudi.anexo_via": "http"
+                }):
+                    return await self._processar_anexo_http(anexo_info, session.credencial, cookies)
+        
+        resultados = await asyncio.gather(*[processar(a) for a in anexos])
+        return [r for r in resultados if r]
+    
+    async def _processar_anexo_http(self, anexo_info: AnexoInfo, credencial: str, cookies: List[Dict[str, Any]]) -> Optional[AnexoProcessado]:
+        """Baixa um anexo pela URL coletada e extrai seu conteúdo"""
+        start_time = time.time()
+        try:
+            # Anexo já conhecido no store: reaproveitar sem baixar de novo
+            anexo_reaproveitado = await self._reaproveitar_do_armazem(anexo_info, start_time)
+            if anexo_reaproveitado:
+                return anexo_reaproveitado
+            
+            nome_arquivo = f"anexo_mov_{anexo_info.movimentacao_numero}_{anexo_info.id_arquivo}"
+            caminho_arquivo = str(self.downloads_dir / re.sub(r'[^\w.-]', '_', nome_arquivo))
+            
+            download = await http_client_manager.baixar_para_arquivo(
+                anexo_info.url_anexo,
+                caminho_arquivo,
+                credencial,
+                cookies=cookies
+            )
+            anexo_info.tamanho_bytes = download.tamanho_bytes
+            anexo_info.hash_conteudo = download.hash_conteudo
+            
+            mime = download.content_type.split(';')[0].strip().lower()
+            if 'pdf' in mime:
+                anexo_info.tipo_arquivo = "PDF"
+            elif mime in ("text/html", "application/xhtml+xml"):
+                anexo_info.tipo_arquivo = "HTML"
+            else:
+                # DOC, imagens etc.: o arquivo é guardado, mas não há extrator para o texto
+                anexo_info.tipo_arquivo = (mime.rsplit('/', 1)[-1] or "desconhecido").upper()
+            
+            # Mesmo conteúdo já extraído (ex.: petição repetida em outro processo)
+            texto_armazenado = await armazem_anexos.obter_texto(download.hash_conteudo)
+            if texto_armazenado:
+                conteudo, metodo = texto_armazenado['conteudo'], texto_armazenado['metodo']
+            elif anexo_info.tipo_arquivo == "PDF":
+                conteudo, metodo = await PDFProcessor.extrair_texto_pdf(download.caminho, download.hash_conteudo)
+            elif anexo_info.tipo_arquivo == "HTML":
+                html_content = await asyncio.to_thread(self._ler_texto, download.caminho)
+                conteudo = await asyncio.to_thread(self._limpar_html, html_content)
+                metodo = "download_html"
+            else:
+                logger.info(f"📎 Anexo {anexo_info.id_arquivo} ({mime or 'sem content-type'}) guardado sem extração de texto")
+                conteudo, metodo = "", "nao_suportado"
+            
+            await self._registrar_no_armazem(anexo_info, download.caminho, conteudo, metodo)
+            
+            return AnexoProcessado(
+                anexo_info=anexo_info,
+                conteudo_extraido=conteudo,
+                tamanho_conteudo=len(conteudo),
+                metodo_extracao=metodo,
+                arquivo_baixado=download.caminho,
+                sucesso_processamento=len(conteudo) > 0,
+                tempo_processamento=time.time() - start_time
+            )
+            
+        except DownloadExcedeuLimite as e:
+            logger.warning(f"⚠️ Anexo {anexo_info.id_arquivo} ignorado por exceder o limite de tamanho: {e}")
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar anexo {anexo_info.id_arquivo}: {e}")
+        
+        return AnexoProcessado(
+            anexo_info=anexo_info,
+            conteudo_extraido="",
+            tamanho_conteudo=0,
+            metodo_extracao="erro",
+            erro_processamento="Falha no download ou extração",
+            tempo_processamento=time.time() - start_time
+        )
+    
+    async def _reaproveitar_do_armazem(self, anexo_info: AnexoInfo, start_time: float) -> Optional[AnexoProcessado]:
+        """Monta o anexo a partir do store se (processo, movimentação, arquivo) já foi processado"""
+        registro = await armazem_anexos.buscar(
+            anexo_info.numero_processo,
+            anexo_info.movimentacao_numero,
+            anexo_info.id_arquivo
+        )
+        if not registro:
+            return None
+        
+        texto_armazenado = await armazem_anexos.obter_texto(registro['hash'])
+        if not texto_armazenado:
+            return None
+        
+        anexo_info.hash_conteudo = registro['hash']
+        anexo_info.tipo_arquivo = registro.get('tipo_arquivo') or texto_armazenado.get('tipo_arquivo', '')
+        anexo_info.tamanho_bytes = registro.get('tamanho_bytes') or 0
+        conteudo = texto_armazenado['conteudo']
+        logger.info(f"♻️ Anexo {anexo_info.id_arquivo} reaproveitado do store ({registro['hash'][:12]})")
+        
+        return AnexoProcessado(
+            anexo_info=anexo_info,
+            conteudo_extraido=conteudo,
+            tamanho_conteudo=len(conteudo),
+            metodo_extracao=texto_armazenado['metodo'],
+            sucesso_processamento=len(conteudo) > 0,
+            tempo_processamento=time.time() - start_time
+        )
+    
+    async def _registrar_no_armazem(self, anexo_info: AnexoInfo, caminho_arquivo: str, conteudo: str, metodo: str):
+        """Guarda arquivo, texto e índice do anexo no store endereçado por conteúdo"""
+        if not anexo_info.hash_conteudo:
+            return
+        await armazem_anexos.guardar_arquivo(caminho_arquivo, anexo_info.hash_conteudo)
+        if metodo != "erro":
+            await armazem_anexos.guardar_texto(anexo_info.hash_conteudo, conteudo, metodo, anexo_info.tipo_arquivo)
+        await armazem_anexos.indexar(
+            anexo_info.numero_processo,
+            anexo_info.movimentacao_numero,
+            anexo_info.id_arquivo,
+            anexo_info.hash_conteudo,
+            anexo_info.nome_arquivo,
+            anexo_info.tipo_arquivo,
+            anexo_info.tamanho_bytes
+        )
+    
+    async def _extrair_anexos_via_iframe(self, session: Session, movimentacoes: List[Movimentacao]) -> List[AnexoProcessado]:
+        """Clica em cada anexo e lê o iframe (anexos sem URL coletada)
+        
+        Produtor/consumidor: o navegador captura o anexo N+1 enquanto o anexo N é
+        baixado/extraído; a fila limitada segura o navegador se a extração atrasar.
+        """
+        if not movimentacoes:
+            return []
+        
+        fila: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.anexos_prefetch))
+        total_consumidores = max(1, min(settings.anexos_workers, len(movimentacoes)))
+        resultados: Dict[int, AnexoProcessado] = {}
+        
+        async def produtor():
+            try:
+                for i, movimentacao in enumerate(movimentacoes):
+                    logger.debug("📄 Capturando anexo da movimentação {}/{} via iframe: {}", i + 1, len(movimentacoes), movimentacao.numero)
+                    with tracing.span("anexo_captura", {"projudi.movimentacao": movimentacao.numero}):
+                        captura = await self._capturar_anexo_movimentacao(session, movimentacao)
+                    if captura:
+                        await fila.put((i, captura))
+                    
+                    # Aguardar um pouco entre movimentações
+                    if i < len(movimentacoes) - 1:
+                        await asyncio.sleep(1)
+            finally:
+                for _ in range(total_consumidores):
+                    await fila.put(None)
+        
+        async def consumidor():
+            while True:
+                item = await fila.get()
+                if item is None:
+                    return
+                i, captura = item
+                with tracing.span("anexo", {
+                    "projudi.movimentacao": captura.movimentacao.numero,
+                    "projudi.anexo_via": "iframe"
+                }):
+                    anexo_processado = await self._processar_captura(captura)
+                if anexo_processado:
+                    resultados[i] = anexo_processado
+        
+        await asyncio.gather(produtor(), *[consumidor() for _ in range(total_consumidores)])
+        return [resultados[i] for i in sorted(resultados)]
+    
     async def _extrair_anexos_movimentacao(self, session: Session, movimentacao: Movimentacao) -> List[AnexoProcessado]:
-        """Extrai anexos de uma movimentação específica"""
+        """Extrai anexos de uma movimentação específica (captura e processamento em sequência)"""
+        captura = await self._capturar_anexo_movimentacao(session, movimentacao)
+        if not captura:
+            return []
+        anexo_processado = await self._processar_captura(captura)
+        return [anexo_processado] if anexo_processado else []
+    
+    async def _capturar_anexo_movimentacao(self, session: Session, movimentacao: Movimentacao) -> Optional[CapturaAnexo]:
+        """Parte do navegador: abre o anexo da movimentação no iframe e lê o material bruto"""
         try:
-            anexos = []
+            inicio = time.time()
             
             # Garantir que estamos na página de navegação
             if not await session.page.query_selector('table#TabelaArquivos'):
                 if not await self.acessar_navegacao_arquivos(session):
-                    return []
+                    return None
             
             # Forçar atualização do iframe
             await self._limpar_iframe(session)
             
             # Clicar no anexo da movimentação
-            if await self._clicar_anexo_movimentacao(session, movimentacao):
-                await asyncio.sleep(3)
-                
-                # Extrair conteúdo do anexo
-                anexo_processado = await self._processar_anexo_atual(session, movimentacao)
-                if anexo_processado:
-                    anexos.append(anexo_processado)
+            if not await self._clicar_anexo_movimentacao(session, movimentacao):
+                return None
+            await asyncio.sleep(3)
             
-            return anexos
+            captura = await self._capturar_anexo_atual(session, movimentacao)
+            if captura:
+                captura.inicio = inicio
+            return captura
             
         except Exception as e:
             logger.error(f"❌ Erro ao extrair anexos da movimentação {movimentacao.numero}: {e}")
-            return []
+            return None
     
     async def _clicar_anexo_movimentacao(self, session: Session, movimentacao: Movimentacao) -> bool:
         """Clica no anexo de uma movimentação"""
@@ -248,7 +638,7 @@ class AnexosManager:
                 """
                 resultado = await session.page.evaluate(script)
                 if resultado:
-                    logger.info(f"✅ Anexo clicado via JavaScript: {movimentacao.codigo_anexo}")
+                    logger.debug("✅ Anexo clicado via JavaScript: {}", movimentacao.codigo_anexo)
                     return True
             
             # Estratégia 2: Procurar por link com ID da movimentação
@@ -258,7 +648,7 @@ class AnexosManager:
                 
                 if link:
                     await link.click()
-                    logger.info(f"✅ Anexo clicado via seletor: {movimentacao.id_movimentacao}")
+                    logger.debug("✅ Anexo clicado via seletor: {}", movimentacao.id_movimentacao)
                     return True
             
             # Estratégia 3: Procurar por qualquer link de anexo na linha da movimentação
@@ -274,7 +664,7 @@ class AnexosManager:
             """
             resultado = await session.page.evaluate(script_generico)
             if resultado:
-                logger.info("✅ Anexo clicado via script genérico")
+                logger.debug("✅ Anexo clicado via script genérico")
                 return True
             
             logger.warning(f"⚠️ Não foi possível clicar no anexo da movimentação {movimentacao.numero}")
@@ -284,27 +674,58 @@ class AnexosManager:
             logger.error(f"❌ Erro ao clicar no anexo: {e}")
             return False
     
-    async def _processar_anexo_atual(self, session: Session, movimentacao: Movimentacao) -> Optional[AnexoProcessado]:
-        """Processa o anexo atualmente carregado"""
+    async def _capturar_anexo_atual(self, session: Session, movimentacao: Movimentacao) -> Optional[CapturaAnexo]:
+        """Lê do iframe a URL do PDF (com cookies) ou o HTML do anexo atualmente carregado"""
         try:
-            start_time = time.time()
-            
             # Aguardar carregamento
             await asyncio.sleep(3)
             
             # Verificar se é PDF ou HTML
-            is_pdf = await self._detectar_tipo_anexo(session)
+            if await self._detectar_tipo_anexo(session):
+                script = """
+                () => {
+                    const iframe = document.getElementById('arquivo');
+                    if (iframe) {
+                        return iframe.src;
+                    }
+                    return null;
+                }
+                """
+                pdf_url = await session.page.evaluate(script)
+                if not pdf_url:
+                    logger.warning("⚠️ Não foi possível obter a URL do PDF")
+                    return None
+                
+                # Cookies da sessão para o download fora do navegador (inclusive após redirecionamentos)
+                return CapturaAnexo(
+                    movimentacao=movimentacao,
+                    tipo_arquivo="PDF",
+                    url_pdf=pdf_url,
+                    credencial=session.credencial,
+                    cookies=await session.context.cookies()
+                )
+            
+            html_content = await self._ler_html_iframe(session)
+            if not html_content:
+                logger.warning("⚠️ Não foi possível extrair conteúdo do iframe")
+                return None
+            return CapturaAnexo(movimentacao=movimentacao, tipo_arquivo="HTML", html_content=html_content)
             
-            if is_pdf:
-                # Tentar baixar PDF
-                anexo_processado = await self._processar_pdf(session, movimentacao)
+        except Exception as e:
+            logger.error(f"❌ Erro ao processar anexo: {e}")
+            return None
+    
+    async def _processar_captura(self, captura: CapturaAnexo) -> Optional[AnexoProcessado]:
+        """Parte fora do navegador: baixa/extrai o anexo capturado"""
+        try:
+            if captura.tipo_arquivo == "PDF":
+                anexo_processado = await self._processar_pdf(captura)
             else:
-                # Extrair conteúdo HTML do iframe
-                anexo_processado = await self._processar_html_iframe(session, movimentacao)
+                anexo_processado = await self._processar_html_iframe(captura)
             
             if anexo_processado:
-                anexo_processado.tempo_processamento = time.time() - start_time
-                
+                anexo_processado.tempo_processamento = time.time() - (captura.inicio or time.time())
+            
             return anexo_processado
             
         except Exception as e:
@@ -338,33 +759,41 @@ class AnexosManager:
             logger.warning(f"⚠️ Erro ao detectar tipo de anexo: {e}")
             return False
     
-    async def _processar_pdf(self, session: Session, movimentacao: Movimentacao) -> Optional[AnexoProcessado]:
+    async def _processar_pdf(self, captura: CapturaAnexo) -> Optional[AnexoProcessado]:
         """Processa anexo PDF baixando o arquivo"""
         try:
-            logger.info("📄 Processando PDF...")
+            logger.debug("📄 Processando PDF...")
+            movimentacao = captura.movimentacao
             
             # Tentar baixar PDF
-            arquivo_baixado = await self._baixar_pdf_atual(session, movimentacao)
+            download = await self._baixar_pdf(captura, movimentacao)
             
-            if arquivo_baixado and os.path.exists(arquivo_baixado):
-                # Extrair texto do PDF
-                conteudo, metodo = await PDFProcessor.extrair_texto_pdf(arquivo_baixado)
+            if download:
+                # Extrair texto do PDF (ou reaproveitar do store se o conteúdo já é conhecido)
+                texto_armazenado = await armazem_anexos.obter_texto(download.hash_conteudo)
+                if texto_armazenado:
+                    conteudo, metodo = texto_armazenado['conteudo'], texto_armazenado['metodo']
+                else:
+                    conteudo, metodo = await PDFProcessor.extrair_texto_pdf(download.caminho, download.hash_conteudo)
                 
                 anexo_info = AnexoInfo(
-                    id_arquivo=movimentacao.id_movimentacao,
+                    id_arquivo=self.id_anexo_movimentacao(movimentacao.numero),
                     nome_arquivo=f"anexo_mov_{movimentacao.numero}.pdf",
                     url_anexo="",
                     tipo_arquivo="PDF",
-                    tamanho_bytes=os.path.getsize(arquivo_baixado),
-                    movimentacao_numero=movimentacao.numero
+                    tamanho_bytes=download.tamanho_bytes,
+                    movimentacao_numero=movimentacao.numero,
+                    hash_conteudo=download.hash_conteudo,
+                    numero_processo=movimentacao.numero_processo
                 )
+                await self._registrar_no_armazem(anexo_info, download.caminho, conteudo, metodo)
                 
                 return AnexoProcessado(
                     anexo_info=anexo_info,
                     conteudo_extraido=conteudo,
                     tamanho_conteudo=len(conteudo),
                     metodo_extracao=metodo,
-                    arquivo_baixado=arquivo_baixado,
+                    arquivo_baixado=download.caminho,
                     sucesso_processamento=len(conteudo) > 0
                 )
             else:
@@ -375,112 +804,109 @@ class AnexosManager:
             logger.error(f"❌ Erro ao processar PDF: {e}")
             return None
     
-    async def _baixar_pdf_atual(self, session: Session, movimentacao: Movimentacao) -> Optional[str]:
-        """Baixa o PDF atualmente carregado"""
+    async def _baixar_pdf(self, captura: CapturaAnexo, movimentacao: Movimentacao) -> Optional[ResultadoDownload]:
+        """Baixa o PDF capturado do iframe"""
         try:
-            # Obter URL do PDF do iframe
-            script = """
-            () => {
-                const iframe = document.getElementById('arquivo');
-                if (iframe) {
-                    return iframe.src;
-                }
-                return null;
-            }
-            """
-            
-            pdf_url = await session.page.evaluate(script)
-            if not pdf_url:
-                return None
-            
-            # Fazer download usando httpx com cookies da sessão
-            cookies = await session.context.cookies()
-            cookie_dict = {cookie['name']: cookie['value'] for cookie in cookies}
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    pdf_url,
-                    cookies=cookie_dict,
-                    timeout=30.0,
-                    follow_redirects=True
-                )
-                
-                if response.status_code == 200:
-                    # Salvar arquivo
-                    nome_arquivo = f"anexo_mov_{movimentacao.numero}_{int(time.time())}.pdf"
-                    caminho_arquivo = self.downloads_dir / nome_arquivo
-                    
-                    with open(caminho_arquivo, 'wb') as f:
-                        f.write(response.content)
-                    
-                    logger.info(f"✅ PDF baixado: {nome_arquivo}")
-                    return str(caminho_arquivo)
-                else:
-                    logger.error(f"❌ Erro no download: Status {response.status_code}")
-                    return None
-                    
+            # Download em streaming pelo cliente compartilhado, com os cookies da sessão
+            nome_arquivo = f"anexo_mov_{movimentacao.numero}_{int(time.time())}.pdf"
+            caminho_arquivo = self.downloads_dir / nome_arquivo
+            
+            download = await http_client_manager.baixar_para_arquivo(
+                captura.url_pdf,
+                str(caminho_arquivo),
+                captura.credencial,
+                cookies=captura.cookies
+            )
+            
+            logger.info(f"✅ PDF baixado: {nome_arquivo} ({download.tamanho_bytes} bytes)")
+            return download
+            
+        except DownloadExcedeuLimite as e:
+            logger.warning(f"⚠️ PDF ignorado por exceder o limite de tamanho: {e}")
+            return None
+        except httpx.HTTPStatusError as e:
+            logger.error(f"❌ Erro no download: Status {e.response.status_code}")
+            return None
         except Exception as e:
             logger.error(f"❌ Erro ao baixar PDF: {e}")
             return None
     
-    async def _processar_html_iframe(self, session: Session, movimentacao: Movimentacao) -> Optional[AnexoProcessado]:
-        """Processa anexo HTML extraindo conteúdo do iframe"""
-        try:
-            logger.info("📄 Processando HTML do iframe...")
-            
-            # Extrair conteúdo do iframe
-            script = """
-            () => {
-                const iframe = document.getElementById('arquivo');
-                if (iframe) {
-                    try {
-                        const doc = iframe.contentDocument || iframe.contentWindow.document;
-                        return doc.documentElement.outerHTML;
-                    } catch (e) {
-                        return iframe.src || '';
-                    }
+    async def _ler_html_iframe(self, session: Session) -> str:
+        """Lê o HTML do documento carregado no iframe"""
+        script = """
+        () => {
+            const iframe = document.getElementById('arquivo');
+            if (iframe) {
+                try {
+                    const doc = iframe.contentDocument || iframe.contentWindow.document;
+                    return doc.documentElement.outerHTML;
+                } catch (e) {
+                    return iframe.src || '';
                 }
-                return '';
             }
-            """
-            
-            html_content = await session.page.evaluate(script)
+            return '';
+        }
+        """
+        return await session.page.evaluate(script) or ""
+    
+    async def _processar_html_iframe(self, captura: CapturaAnexo) -> Optional[AnexoProcessado]:
+        """Processa anexo HTML capturado do iframe"""
+        try:
+            logger.debug("📄 Processando HTML do iframe...")
+            movimentacao = captura.movimentacao
+            html_content = captura.html_content
             
-            if html_content:
-                # Extrair texto limpo do HTML
-                soup = BeautifulSoup(html_content, 'html.parser')
-                
-                # Remover scripts e styles
-                for script in soup(["script", "style"]):
-                    script.decompose()
-                
-                texto_limpo = soup.get_text()
-                texto_limpo = re.sub(r'\s+', ' ', texto_limpo).strip()
-                
-                anexo_info = AnexoInfo(
-                    id_arquivo=movimentacao.id_movimentacao,
-                    nome_arquivo=f"anexo_mov_{movimentacao.numero}.html",
-                    url_anexo="",
-                    tipo_arquivo="HTML",
-                    tamanho_bytes=len(html_content),
-                    movimentacao_numero=movimentacao.numero
-                )
-                
-                return AnexoProcessado(
-                    anexo_info=anexo_info,
-                    conteudo_extraido=texto_limpo,
-                    tamanho_conteudo=len(texto_limpo),
-                    metodo_extracao="iframe_html",
-                    sucesso_processamento=len(texto_limpo) > 0
-                )
-            else:
-                logger.warning("⚠️ Não foi possível extrair conteúdo do iframe")
-                return None
+            # Extrair texto limpo do HTML fora do event loop
+            texto_limpo = await asyncio.to_thread(self._limpar_html, html_content)
+
+            # Guardar o HTML em disco para poder servi-lo depois (endpoint de anexo sob demanda)
+            dados_html = html_content.encode('utf-8')
+            hash_conteudo = hashlib.sha256(dados_html).hexdigest()
+            caminho_arquivo = str(self.downloads_dir / f"anexo_mov_{movimentacao.numero}_{hash_conteudo[:12]}.html")
+            await asyncio.to_thread(Path(caminho_arquivo).write_bytes, dados_html)
+
+            anexo_info = AnexoInfo(
+                id_arquivo=self.id_anexo_movimentacao(movimentacao.numero),
+                nome_arquivo=f"anexo_mov_{movimentacao.numero}.html",
+                url_anexo="",
+                tipo_arquivo="HTML",
+                tamanho_bytes=len(dados_html),
+                movimentacao_numero=movimentacao.numero,
+                hash_conteudo=hash_conteudo,
+                numero_processo=movimentacao.numero_processo
+            )
+            await self._registrar_no_armazem(anexo_info, caminho_arquivo, texto_limpo, "iframe_html")
+
+            return AnexoProcessado(
+                anexo_info=anexo_info,
+                conteudo_extraido=texto_limpo,
+                tamanho_conteudo=len(texto_limpo),
+                metodo_extracao="iframe_html",
+                arquivo_baixado=caminho_arquivo,
+                sucesso_processamento=len(texto_limpo) > 0
+            )
                 
         except Exception as e:
             logger.error(f"❌ Erro ao processar HTML do iframe: {e}")
             return None
     
+    @staticmethod
+    def _limpar_html(html_content: str) -> str:
+        """Extrai texto limpo de um HTML (CPU, executar fora do event loop)"""
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Remover scripts e styles
+        for script in soup(["script", "style"]):
+            script.decompose()
+        
+        texto_limpo = soup.get_text()
+        return re.sub(r'\s+', ' ', texto_limpo).strip()
+    
+    @staticmethod
+    def _ler_texto(caminho_arquivo: str) -> str:
+        with open(caminho_arquivo, 'rb') as f:
+            return f.read().decode('utf-8', errors='ignore')
+    
     async def _limpar_iframe(self, session: Session):
         """Limpa o iframe para evitar conteúdo antigo"""
         try:
@@ -500,7 +926,7 @@ class AnexosManager:
             logger.warning(f"⚠️ Erro ao limpar iframe: {e}")
     
     def limpar_arquivos_temporarios(self):
-        """Limpa arquivos temporários baixados"""
+        """Limpa arquivos temporários baixados (o store de anexos é persistente e não é afetado)"""
         try:
             if self.downloads_dir.exists():
                 for arquivo in self.downloads_dir.glob("anexo_*"):
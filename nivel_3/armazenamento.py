@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Nível 3 - Armazenamento endereçado por conteúdo PROJUDI API v4
+Guarda cada anexo uma única vez (comprimido, pelo SHA-256) e indexa
+(processo, movimentação, arquivo) -> hash para evitar novos downloads
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+from loguru import logger
+
+from config import settings
+from core.metricas import metricas
+
+def _temporario(destino: Path) -> Path:
+    """Nome único no diretório do destino (gravações concorrentes do mesmo hash não se misturam)"""
+    return destino.with_name(f"{destino.name}.{uuid.uuid4().hex}.tmp")
+
+class ArmazemAnexos:
+    """Store persistente de anexos deduplicados por hash"""
+
+    def __init__(self):
+        self.habilitado = settings.anexos_store_habilitado
+        self.base_dir = Path(settings.anexos_store_dir)
+        self.objetos_dir = self.base_dir / "objetos"
+        self.textos_dir = self.base_dir / "textos"
+        self.indice_path = self.base_dir / "indice.db"
+        self._inicializado = False
+        self.acertos = 0
+        self.falhas = 0
+
+    def _inicializar(self):
+        """Cria diretórios e tabela de índice (executa em thread)"""
+        if self._inicializado:
+            return
+        self.objetos_dir.mkdir(parents=True, exist_ok=True)
+        self.textos_dir.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.indice_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS indice (
+                    numero_processo TEXT NOT NULL,
+                    movimentacao_numero INTEGER NOT NULL,
+                    id_arquivo TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    nome_arquivo TEXT,
+                    tipo_arquivo TEXT,
+                    tamanho_bytes INTEGER,
+                    atualizado_em REAL,
+                    PRIMARY KEY (numero_processo, movimentacao_numero, id_arquivo)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_indice_hash ON indice(hash)")
+        self._inicializado = True
+
+    def _caminho_objeto(self, hash_conteudo: str) -> Path:
+        return self.objetos_dir / hash_conteudo[:2] / f"{hash_conteudo}.gz"
+
+    def _caminho_texto(self, hash_conteudo: str) -> Path:
+        return self.textos_dir / hash_conteudo[:2] / f"{hash_conteudo}.json.gz"
+
+    # ---- Índice ----
+
+    def _buscar_sync(self, numero_processo: str, movimentacao_numero: int, id_arquivo: str) -> Optional[Dict[str, Any]]:
+        self._inicializar()
+        with sqlite3.connect(self.indice_path) as conn:
+            conn.row_factory = sqlite3.Row
+            linha = conn.execute(
+                "SELECT * FROM indice WHERE numero_processo = ? AND movimentacao_numero = ? AND id_arquivo = ?",
+                (numero_processo, movimentacao_numero, id_arquivo)
+            ).fetchone()
+        return dict(linha) if linha else None
+
+    async def buscar(self, numero_processo: str, movimentacao_numero: int, id_arquivo: str) -> Optional[Dict[str, Any]]:
+        """Procura o hash de um anexo já conhecido"""
+        if not self.habilitado or not numero_processo:
+            return None
+        try:
+            return await asyncio.to_thread(self._buscar_sync, numero_processo, movimentacao_numero, id_arquivo)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar índice de anexos: {e}")
+            return None
+
+    def _buscar_por_arquivo_sync(self, numero_processo: str, id_arquivo: str) -> Optional[Dict[str, Any]]:
+        self._inicializar()
+        with sqlite3.connect(self.indice_path) as conn:
+            conn.row_factory = sqlite3.Row
+            linha = conn.execute(
+                "SELECT * FROM indice WHERE numero_processo = ? AND id_arquivo = ? "
+                "ORDER BY atualizado_em DESC LIMIT 1",
+                (numero_processo, id_arquivo)
+            ).fetchone()
+        return dict(linha) if linha else None
+
+    async def buscar_por_arquivo(self, numero_processo: str, id_arquivo: str) -> Optional[Dict[str, Any]]:
+        """Procura um anexo pelo id do arquivo, sem conhecer a movimentação"""
+        if not self.habilitado or not numero_processo or not id_arquivo:
+            return None
+        try:
+            return await asyncio.to_thread(self._buscar_por_arquivo_sync, numero_processo, id_arquivo)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao consultar índice de anexos: {e}")
+            return None
+
+    def _indexar_sync(self, numero_processo: str, movimentacao_numero: int, id_arquivo: str,
+                      hash_conteudo: str, nome_arquivo: str, tipo_arquivo: str, tamanho_bytes: int):
+        self._inicializar()
+        with sqlite3.connect(self.indice_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO indice VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (numero_processo, movimentacao_numero, id_arquivo, hash_conteudo,
+                 nome_arquivo, tipo_arquivo, tamanho_bytes, time.time())
+            )
+
+    async def indexar(self, numero_processo: str, movimentacao_numero: int, id_arquivo: str,
+                      hash_conteudo: str, nome_arquivo: str = "", tipo_arquivo: str = "", tamanho_bytes: int = 0):
+        """Registra (processo, movimentação, arquivo) -> hash"""
+        if not self.habilitado or not numero_processo or not hash_conteudo:
+            return
+        try:
+            await asyncio.to_thread(
+                self._indexar_sync, numero_processo, movimentacao_numero, id_arquivo,
+                hash_conteudo, nome_arquivo, tipo_arquivo, tamanho_bytes
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao indexar anexo {id_arquivo}: {e}")
+
+    # ---- Objetos ----
+
+    def _guardar_arquivo_sync(self, caminho_arquivo: str, hash_conteudo: str) -> bool:
+        self._inicializar()
+        destino = self._caminho_objeto(hash_conteudo)
+        if destino.exists():
+            return False
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = _temporario(destino)
+        try:
+            with open(caminho_arquivo, 'rb') as origem, gzip.open(temporario, 'wb', compresslevel=6) as saida:
+                shutil.copyfileobj(origem, saida, 1024 * 1024)
+            os.replace(temporario, destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+        return True
+
+    async def guardar_arquivo(self, caminho_arquivo: str, hash_conteudo: str) -> bool:
+        """Guarda o arquivo comprimido uma única vez; retorna False se já existia"""
+        if not self.habilitado or not hash_conteudo:
+            return False
+        try:
+            return await asyncio.to_thread(self._guardar_arquivo_sync, caminho_arquivo, hash_conteudo)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao guardar anexo {hash_conteudo[:12]}: {e}")
+            return False
+
+    def possui_arquivo(self, hash_conteudo: str) -> bool:
+        return self.habilitado and self._caminho_objeto(hash_conteudo).exists()
+
+    def _restaurar_arquivo_sync(self, hash_conteudo: str, destino: str):
+        temporario = _temporario(Path(destino))
+        try:
+            with gzip.open(self._caminho_objeto(hash_conteudo), 'rb') as origem, open(temporario, 'wb') as saida:
+                shutil.copyfileobj(origem, saida, 1024 * 1024)
+            os.replace(temporario, destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+
+    async def restaurar_arquivo(self, hash_conteudo: str, destino: str) -> bool:
+        """Descomprime um objeto do store para o caminho informado"""
+        if not self.possui_arquivo(hash_conteudo):
+            return False
+        try:
+            await asyncio.to_thread(self._restaurar_arquivo_sync, hash_conteudo, destino)
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao restaurar anexo {hash_conteudo[:12]}: {e}")
+            return False
+
+    # ---- Textos extraídos ----
+
+    def _obter_texto_sync(self, hash_conteudo: str) -> Optional[Dict[str, Any]]:
+        caminho = self._caminho_texto(hash_conteudo)
+        if not caminho.exists():
+            return None
+        with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    async def obter_texto(self, hash_conteudo: str) -> Optional[Dict[str, Any]]:
+        """Retorna o texto já extraído de um conteúdo (conteudo, metodo, tipo_arquivo)"""
+        if not self.habilitado or not hash_conteudo:
+            return None
+        try:
+            dados = await asyncio.to_thread(self._obter_texto_sync, hash_conteudo)
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao ler texto do store {hash_conteudo[:12]}: {e}")
+            dados = None
+        if dados:
+            self.acertos += 1
+        else:
+            self.falhas += 1
+        metricas.registrar_cache("anexos_store", bool(dados))
+        return dados
+
+    def _guardar_texto_sync(self, hash_conteudo: str, dados: Dict[str, Any]):
+        self._inicializar()
+        destino = self._caminho_texto(hash_conteudo)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporario = _temporario(destino)
+        try:
+            with gzip.open(temporario, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump(dados, f, ensure_ascii=False)
+            os.replace(temporario, destino)
+        finally:
+            temporario.unlink(missing_ok=True)
+
+    async def guardar_texto(self, hash_conteudo: str, conteudo: str, metodo: str, tipo_arquivo: str):
+        """Guarda o texto extraído para não reprocessar o mesmo conteúdo"""
+        if not self.habilitado or not hash_conteudo or not conteudo:
+            return
+        try:
+            await asyncio.to_thread(self._guardar_texto_sync, hash_conteudo, {
+                "conteudo": conteudo,
+                "metodo": metodo,
+                "tipo_arquivo": tipo_arquivo
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao guardar texto {hash_conteudo[:12]}: {e}")
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do store"""
+        total = self.acertos + self.falhas
+        return {
+            "habilitado": self.habilitado,
+            "diretorio": str(self.base_dir),
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": (self.acertos / total * 100) if total > 0 else 0
+        }
+
+# Instância global do armazém de anexos
+armazem_anexos = ArmazemAnexos()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Nível 3 - Extração de texto de PDFs PROJUDI API v4
+Extrai o texto página a página em um pool de processos, fora do event loop
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+from loguru import logger
+
+from config import settings
+from core.cache_manager import cache_manager
+from core.metricas import metricas
+
+# Motores de extração: PyMuPDF é preferido (mais rápido), pypdf é o fallback
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+@dataclass
+class ResultadoExtracaoPDF:
+    """Resultado da extração de texto de um PDF"""
+    texto: str
+    hash_conteudo: str
+    paginas_total: int = 0
+    paginas_lidas: int = 0
+    truncado: bool = False
+    motor: str = ""
+    erro: str = ""
+
+def _extrair_paginas(caminho_arquivo: str, max_paginas: int, max_caracteres: int) -> Dict:
+    """Extrai texto página a página respeitando o orçamento (executa no processo filho)"""
+    partes = []
+    total_caracteres = 0
+    paginas_lidas = 0
+    truncado = False
+
+    if fitz is not None:
+        motor = "pymupdf"
+        documento = fitz.open(caminho_arquivo)
+        try:
+            paginas_total = documento.page_count
+            for indice in range(min(paginas_total, max_paginas)):
+                texto_pagina = documento.load_page(indice).get_text("text") or ""
+                partes.append(texto_pagina)
+                paginas_lidas += 1
+                total_caracteres += len(texto_pagina)
+                if total_caracteres >= max_caracteres:
+                    break
+        finally:
+            documento.close()
+    elif PdfReader is not None:
+        motor = "pypdf"
+        leitor = PdfReader(caminho_arquivo)
+        paginas_total = len(leitor.pages)
+        for indice in range(min(paginas_total, max_paginas)):
+            texto_pagina = leitor.pages[indice].extract_text() or ""
+            partes.append(texto_pagina)
+            paginas_lidas += 1
+            total_caracteres += len(texto_pagina)
+            if total_caracteres >= max_caracteres:
+                break
+    else:
+        raise RuntimeError("Nenhum motor de PDF instalado (instale pymupdf ou pypdf)")
+
+    texto = "\n".join(p.strip() for p in partes if p and p.strip())
+    if len(texto) > max_caracteres:
+        texto = texto[:max_caracteres]
+        truncado = True
+    if paginas_lidas < paginas_total:
+        truncado = True
+
+    return {
+        "texto": texto,
+        "paginas_total": paginas_total,
+        "paginas_lidas": paginas_lidas,
+        "truncado": truncado,
+        "motor": motor
+    }
+
+def _calcular_hash_arquivo(caminho_arquivo: str) -> str:
+    """Calcula o SHA-256 do arquivo em blocos"""
+    sha256 = hashlib.sha256()
+    with open(caminho_arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+class ExtratorPDF:
+    """Motor de extração de texto de PDFs com pool de processos e cache por hash"""
+
+    def __init__(self):
+        self.max_workers = max(1, settings.pdf_workers)
+        self.max_paginas = settings.pdf_max_paginas
+        self.max_caracteres = settings.pdf_max_caracteres
+        self.cache_ttl = settings.pdf_cache_ttl
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache_local: "OrderedDict[str, ResultadoExtracaoPDF]" = OrderedDict()
+        self._cache_local_max = 256
+
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        """Cria o pool de processos sob demanda (spawn evita fork com threads do Playwright)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"⚙️ Pool de extração de PDF iniciado ({self.max_workers} processos)")
+        return self._executor
+
+    def _chave_cache(self, hash_conteudo: str) -> str:
+        return f"pdf_texto_{hash_conteudo}_{self.max_paginas}_{self.max_caracteres}"
+
+    async def extrair(self, caminho_arquivo: str, hash_conteudo: str = "") -> ResultadoExtracaoPDF:
+        """Extrai texto do PDF sem bloquear o event loop, reaproveitando o cache por hash"""
+        if not hash_conteudo:
+            hash_conteudo = await asyncio.to_thread(_calcular_hash_arquivo, caminho_arquivo)
+
+        chave = self._chave_cache(hash_conteudo)
+
+        # Cache em memória
+        resultado = self._cache_local.get(chave)
+        if resultado:
+            self._cache_local.move_to_end(chave)
+            logger.debug(f"✅ Texto de PDF em cache local: {hash_conteudo[:12]}")
+            return resultado
+
+        # Cache Redis
+        cached = await cache_manager.get(chave)
+        if cached:
+            resultado = ResultadoExtracaoPDF(**cached)
+            self._guardar_local(chave, resultado)
+            logger.debug(f"✅ Texto de PDF em cache Redis: {hash_conteudo[:12]}")
+            return resultado
+
+        try:
+            loop = asyncio.get_running_loop()
+            with metricas.medir_etapa("extracao_pdf"):
+                dados = await loop.run_in_executor(
+                    self._obter_executor(),
+                    _extrair_paginas,
+                    caminho_arquivo,
+                    self.max_paginas,
+                    self.max_caracteres
+                )
+            resultado = ResultadoExtracaoPDF(hash_conteudo=hash_conteudo, **dados)
+            logger.info(
+                f"✅ PDF extraído ({resultado.motor}): {resultado.paginas_lidas}/{resultado.paginas_total} "
+                f"páginas, {len(resultado.texto)} caracteres"
+            )
+        except BrokenProcessPool as e:
+            # Processo filho morreu (ex.: OOM); recriar o pool na próxima chamada
+            logger.error(f"❌ Pool de extração de PDF quebrado: {e}")
+            self.shutdown()
+            return ResultadoExtracaoPDF(texto="", hash_conteudo=hash_conteudo, erro=str(e))
+        except Exception as e:
+            logger.warning(f"⚠️ Erro ao extrair texto do PDF {caminho_arquivo}: {e}")
+            return ResultadoExtracaoPDF(texto="", hash_conteudo=hash_conteudo, erro=str(e))
+
+        self._guardar_local(chave, resultado)
+        await cache_manager.set(chave, asdict(resultado), expire=self.cache_ttl)
+        return resultado
+
+    def _guardar_local(self, chave: str, resultado: ResultadoExtracaoPDF):
+        self._cache_local[chave] = resultado
+        self._cache_local.move_to_end(chave)
+        while len(self._cache_local) > self._cache_local_max:
+            self._cache_local.popitem(last=False)
+
+    def shutdown(self):
+        """Finaliza o pool de processos"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("🔄 Pool de extração de PDF finalizado")
+
+# Instância global do extrator de PDFs
+extrator_pdf = ExtratorPDF()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Nível 3 - OCR de documentos digitalizados PROJUDI API v4
+Rasteriza (poppler) e reconhece (tesseract) páginas em paralelo, fora do event loop
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+from loguru import logger
+
+from config import settings
+from core.cache_manager import cache_manager
+
+@dataclass
+class ResultadoOCR:
+    """Resultado do OCR de um PDF"""
+    texto: str
+    paginas_total: int = 0
+    paginas_processadas: int = 0
+    truncado: bool = False
+    erro: str = ""
+
+class MotorOCR:
+    """Pipeline de OCR com paralelismo por página e fila de jobs"""
+
+    def __init__(self):
+        self.habilitado = settings.ocr_habilitado
+        self.idioma = settings.ocr_idioma
+        self.dpi = settings.ocr_dpi
+        self.max_paginas = settings.ocr_max_paginas
+        self.timeout_pagina = settings.ocr_timeout_pagina
+        self.cache_ttl = settings.pdf_cache_ttl
+        # Deixar ao menos um núcleo livre para o event loop e os navegadores
+        self.max_workers = settings.ocr_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_jobs = max(1, settings.ocr_max_jobs)
+        self._semaforo_paginas = asyncio.Semaphore(self.max_workers)
+        self._semaforo_jobs = asyncio.Semaphore(self.max_jobs)
+        self.jobs_na_fila = 0
+        self.jobs_ativos = 0
+        self.paginas_processadas = 0
+        self._binarios_ok: Optional[bool] = None
+
+    def disponivel(self) -> bool:
+        """Verifica se tesseract e pdftoppm estão instalados"""
+        if self._binarios_ok is None:
+            faltando = [b for b in ("tesseract", "pdftoppm") if not shutil.which(b)]
+            self._binarios_ok = not faltando
+            if faltando:
+                logger.warning(f"⚠️ OCR indisponível, binários ausentes: {', '.join(faltando)}")
+        return self.habilitado and self._binarios_ok
+
+    async def extrair(self, caminho_arquivo: str, paginas_total: int, hash_conteudo: str = "") -> ResultadoOCR:
+        """Executa OCR nas primeiras páginas do PDF (limitado por job)"""
+        if not self.disponivel():
+            return ResultadoOCR(texto="", paginas_total=paginas_total, erro="OCR indisponível")
+
+        chave = f"pdf_ocr_{hash_conteudo}_{self.max_paginas}_{self.idioma}" if hash_conteudo else ""
+        if chave:
+            cached = await cache_manager.get(chave)
+            if cached:
+                logger.debug(f"✅ OCR em cache: {hash_conteudo[:12]}")
+                return ResultadoOCR(**cached)
+
+        paginas = min(paginas_total, self.max_paginas) if paginas_total else self.max_paginas
+
+        # Fila de jobs: OCR pesado não pode ocupar todos os núcleos de uma vez
+        self.jobs_na_fila += 1
+        if self.jobs_ativos >= self.max_jobs:
+            logger.info(f"🚦 Job de OCR aguardando na fila ({self.jobs_na_fila} na fila)")
+        try:
+            await self._semaforo_jobs.acquire()
+        finally:
+            self.jobs_na_fila -= 1
+
+        self.jobs_ativos += 1
+        dir_trabalho = tempfile.mkdtemp(prefix="projudi_ocr_", dir=self._dir_temporario())
+        try:
+            logger.info(f"🔎 Iniciando OCR de {paginas} páginas ({self.max_workers} em paralelo)")
+            textos = await asyncio.gather(*[
+                self._ocr_pagina(caminho_arquivo, numero, dir_trabalho)
+                for numero in range(1, paginas + 1)
+            ])
+        finally:
+            self.jobs_ativos -= 1
+            self._semaforo_jobs.release()
+            shutil.rmtree(dir_trabalho, ignore_errors=True)
+
+        processadas = sum(1 for t in textos if t is not None)
+        texto = "\n".join(t.strip() for t in textos if t and t.strip())
+        resultado = ResultadoOCR(
+            texto=texto,
+            paginas_total=paginas_total,
+            paginas_processadas=processadas,
+            truncado=bool(paginas_total) and paginas < paginas_total,
+            erro="" if processadas else "Nenhuma página reconhecida"
+        )
+        logger.info(f"✅ OCR concluído: {processadas}/{paginas} páginas, {len(texto)} caracteres")
+
+        if chave and processadas:
+            await cache_manager.set(chave, asdict(resultado), expire=self.cache_ttl)
+        return resultado
+
+    async def _ocr_pagina(self, caminho_arquivo: str, numero: int, dir_trabalho: str) -> Optional[str]:
+        """Rasteriza e reconhece uma página (um slot de CPU por página)"""
+        async with self._semaforo_paginas:
+            prefixo = os.path.join(dir_trabalho, f"pagina_{numero}")
+            try:
+                await self._executar([
+                    "pdftoppm", "-f", str(numero), "-l", str(numero),
+                    "-r", str(self.dpi), "-gray", "-png", "-singlefile",
+                    caminho_arquivo, prefixo
+                ])
+                saida = await self._executar([
+                    "tesseract", f"{prefixo}.png", "stdout", "-l", self.idioma
+                ])
+                self.paginas_processadas += 1
+                return saida.decode("utf-8", errors="ignore")
+            except Exception as e:
+                logger.warning(f"⚠️ OCR falhou na página {numero}: {e}")
+                return None
+            finally:
+                try:
+                    os.remove(f"{prefixo}.png")
+                except OSError:
+                    pass
+
+    async def _executar(self, comando: List[str]) -> bytes:
+        """Executa um binário externo com prioridade baixa e timeout"""
+        if shutil.which("nice"):
+            comando = ["nice", "-n", "10"] + comando
+        # Tesseract usa OpenMP; limitar a 1 thread pois o paralelismo é por página
+        env = dict(os.environ, OMP_THREAD_LIMIT="1")
+        processo = await asyncio.create_subprocess_exec(
+            *comando,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(processo.communicate(), timeout=self.timeout_pagina)
+        except asyncio.TimeoutError:
+            processo.kill()
+            await processo.wait()
+            raise RuntimeError(f"timeout após {self.timeout_pagina}s")
+        if processo.returncode != 0:
+            raise RuntimeError(stderr.decode("utf-8", errors="ignore").strip()[:200])
+        return stdout
+
+    def _dir_temporario(self) -> str:
+        os.makedirs(settings.temp_dir, exist_ok=True)
+        return settings.temp_dir
+
+    def get_stats(self) -> dict:
+        """Retorna estatísticas do OCR"""
+        return {
+            "habilitado": self.habilitado,
+            "max_workers": self.max_workers,
+            "max_jobs": self.max_jobs,
+            "jobs_ativos": self.jobs_ativos,
+            "jobs_na_fila": self.jobs_na_fila,
+            "paginas_processadas": self.paginas_processadas
+        }
+
+# Instância global do motor de OCR
+motor_ocr = MotorOCR()
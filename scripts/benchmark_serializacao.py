@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark da serialização de respostas de busca
+
+Compara o caminho anterior (modelos Pydantic validados campo a campo + response_model
+do FastAPI revalidando e serializando com json.dumps) com o caminho rápido atual
+(model_construct + RespostaJSON, sem revalidação)
+
+Uso:
+    python scripts/benchmark_serializacao.py --processos 5 --movimentacoes 300 --repeticoes 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+
+from api.main import ProjudiService
+from api.models import (
+    BuscaResponse, ProcessoDetalhadoResponse, MovimentacaoResponse, ParteEnvolvidaResponse, ProcessoSimples
+)
+from core.serializacao import RespostaJSON, ORJSON_DISPONIVEL
+from nivel_2.processo import DadosProcesso, Movimentacao, ParteEnvolvida
+
+
+def gerar_processo(i: int, movimentacoes: int, partes: int) -> DadosProcesso:
+    numero = f"{5000000 + i}-59.2020.8.09.0051"
+    parte = lambda j, tipo: ParteEnvolvida(
+        nome=f"PARTE {j} DA SILVA", tipo=tipo, documento="000.000.000-00",
+        endereco="RUA EXEMPLO, 123 - GOIÂNIA/GO", advogado="ADVOGADO EXEMPLO", oab="GO12345"
+    )
+    return DadosProcesso(
+        numero=numero, classe="Procedimento Comum Cível", assunto="Indenização por Dano Moral",
+        situacao="Ativo", data_autuacao="01/01/2020", valor_causa="R$ 10.000,00",
+        orgao_julgador="1ª Vara Cível de Goiânia",
+        movimentacoes=[
+            Movimentacao(
+                numero=m, tipo="Juntada", descricao="Juntada de petição intermediária " * 4,
+                data="01/01/2021 10:00:00", usuario="SERVIDOR", tem_anexo=m % 3 == 0,
+                id_movimentacao=str(m), numero_processo=numero, html_completo="<tr>...</tr>" * 20
+            )
+            for m in range(movimentacoes, 0, -1)
+        ],
+        partes_polo_ativo=[parte(j, "Polo Ativo") for j in range(partes)],
+        partes_polo_passivo=[parte(j, "Polo Passivo") for j in range(partes)],
+        outras_partes=[parte(j, "Outros") for j in range(partes // 2)]
+    )
+
+
+def _partes_validadas(partes):
+    return [
+        ParteEnvolvidaResponse(
+            nome=p.nome, tipo=p.tipo, documento=p.documento, endereco=p.endereco,
+            telefone=p.telefone, email=p.email, advogado=p.advogado, oab=p.oab
+        )
+        for p in partes
+    ]
+
+
+def converter_validado(dados: DadosProcesso) -> ProcessoDetalhadoResponse:
+    """Conversão anterior: cada campo passa pela validação do Pydantic"""
+    movimentacoes = [
+        MovimentacaoResponse(
+            numero=m.numero, tipo=m.tipo, descricao=m.descricao, data=m.data,
+            usuario=m.usuario, tem_anexo=m.tem_anexo, numero_processo=m.numero_processo
+        )
+        for m in dados.movimentacoes
+    ]
+    ativo = _partes_validadas(dados.partes_polo_ativo)
+    passivo = _partes_validadas(dados.partes_polo_passivo)
+    outras = _partes_validadas(dados.outras_partes)
+    return ProcessoDetalhadoResponse(
+        numero=dados.numero, classe=dados.classe, assunto=dados.assunto, situacao=dados.situacao,
+        data_autuacao=dados.data_autuacao, data_distribuicao=dados.data_distribuicao,
+        valor_causa=dados.valor_causa, orgao_julgador=dados.orgao_julgador, id_acesso=dados.id_acesso,
+        movimentacoes=movimentacoes, total_movimentacoes=len(movimentacoes),
+        partes_polo_ativo=ativo, partes_polo_passivo=passivo, outras_partes=outras,
+        total_partes=len(ativo) + len(passivo) + len(outras)
+    )
+
+
+def caminho_anterior(processos) -> bytes:
+    detalhados = [converter_validado(p) for p in processos]
+    resposta = BuscaResponse(
+        request_id="bench", tipo_busca="cpf", valor_busca="000.000.000-00",
+        total_processos_encontrados=len(processos),
+        processos_simples=[
+            ProcessoSimples(numero=p.numero, classe=p.classe, assunto=p.assunto, id_processo="x", indice=i)
+            for i, p in enumerate(processos, 1)
+        ],
+        processos_detalhados=detalhados
+    )
+    # response_model do FastAPI: revalida a partir do dict e serializa com json.dumps (JSONResponse)
+    validada = BuscaResponse.model_validate(resposta.model_dump())
+    return json.dumps(
+        jsonable_encoder(validada), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+_loop = asyncio.new_event_loop()
+
+
+def _converter_sync(dados: DadosProcesso) -> ProcessoDetalhadoResponse:
+    return _loop.run_until_complete(ProjudiService._converter_dados_processo(dados, []))
+
+
+def caminho_rapido(processos) -> bytes:
+    detalhados = [_converter_sync(p) for p in processos]
+    resposta = BuscaResponse(
+        request_id="bench", tipo_busca="cpf", valor_busca="000.000.000-00",
+        total_processos_encontrados=len(processos),
+        processos_simples=[
+            ProcessoSimples.model_construct(numero=p.numero, classe=p.classe, assunto=p.assunto, id_processo="x", indice=i)
+            for i, p in enumerate(processos, 1)
+        ],
+        processos_detalhados=detalhados
+    )
+    return RespostaJSON(resposta).body
+
+
+def medir(nome: str, funcao, processos, repeticoes: int) -> float:
+    funcao(processos)  # aquecimento
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        corpo = funcao(processos)
+    media_ms = (time.perf_counter() - inicio) / repeticoes * 1000
+    print(f"{nome:<10} {media_ms:9.2f} ms/resposta   {len(corpo) / 1024:8.1f} KiB")
+    return media_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processos", type=int, default=5)
+    parser.add_argument("--movimentacoes", type=int, default=300)
+    parser.add_argument("--partes", type=int, default=4)
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    processos = [gerar_processo(i, args.movimentacoes, args.partes) for i in range(args.processos)]
+    print(
+        f"{args.processos} processos x {args.movimentacoes} movimentações, "
+        f"{args.repeticoes} repetições (orjson: {'sim' if ORJSON_DISPONIVEL else 'não'})"
+    )
+
+    # As duas saídas devem ter o mesmo conteúdo (exceto timestamp) antes de comparar tempos
+    a, b = json.loads(caminho_anterior(processos)), json.loads(caminho_rapido(processos))
+    a.pop("timestamp"), b.pop("timestamp")
+    assert a == b, "saídas diferentes entre os caminhos"
+
+    anterior = medir("anterior", caminho_anterior, processos, args.repeticoes)
+    rapido = medir("rapido", caminho_rapido, processos, args.repeticoes)
+    print(f"ganho: {anterior / rapido:.1f}x")
+
+
+if __name__ == "__main__":
+    main()